@@ -0,0 +1,235 @@
+"""
+JSON API of garage under /api
+* lists are paginated by key (?after=<last id>&limit=<n>), so deep pages cost the same as the first one and
+  pages do not shift when bikes are added meanwhile, "next" of the response links the following page
+* ?fields=name,geometry,components.fork returns only these parts of bike (layout of bike_data_format.json),
+  sub-trees which are not asked for are not read from the store at all
+* ?format=ndjson (or Accept: application/x-ndjson) streams the list as one JSON object per line, generated lazily
+  chunk by chunk from the store, so export of whole garage takes constant memory
+* /api/search?q=<typed text>&kind=component answers search as you type from in-process SearchIndex (set by app),
+  hits of components carry bike_id and slot instead of url
+
+    GET /api/bikes  /api/bikes/<id>  /api/bikes/<id>/components  /api/bikes/<id>/rides  /api/rides  /api/search
+"""
+import datetime
+import itertools
+import json
+
+from flask import Blueprint, Response, request, url_for
+from werkzeug.exceptions import BadRequest, HTTPException, NotFound
+
+import bike_codec
+from bike_data import Bike
+from bike_store import SUBTREES
+from ride_log import RideLog
+
+NDJSON = "application/x-ndjson"
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 1000
+MAX_HITS = 50
+CHUNK_SIZE = 500  # rows read from store at once when streaming
+BUFFER_SIZE = 64 * 1024  # streamed lines are sent in blocks of about this many bytes
+
+BIKE_KEYS = tuple(bike_codec.to_dict(Bike()))
+RIDE_KEYS = ("bike_id", "start", "ride_type", "distance", "duration", "elevation")
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, separators=(",", ":"))
+
+
+def project(data: dict, paths) -> dict:
+    """Returns copy of data with only given dotted paths (e.g. "components.fork.brand") which exist in it"""
+    result = {}
+    for path in paths:
+        *parents, leaf = path.split(".")
+        source, target = data, result
+        for name in parents:
+            source = source.get(name)
+            if not isinstance(source, dict):
+                break
+            target = target.setdefault(name, {})
+        else:
+            if leaf in source:
+                target[leaf] = source[leaf]
+    return result
+
+
+def _paths(allowed=None) -> list:
+    """Dotted paths of fields argument, top level names have to be in allowed (when given)"""
+    value = request.args.get("fields")
+    if not value:
+        return []
+    paths = [path.strip() for path in value.split(",") if path.strip()]
+    if allowed is not None:
+        unknown = sorted({path.split(".")[0] for path in paths} - set(allowed))
+        if unknown:
+            raise BadRequest("unknown fields {}, available are {}".format(", ".join(unknown), ", ".join(allowed)))
+    return paths
+
+
+def _integer(name, default, minimum=0, maximum=None):
+    value = request.args.get(name)
+    if value is None:
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise BadRequest("{} has to be integer".format(name))
+    if value < minimum:
+        raise BadRequest("{} has to be at least {}".format(name, minimum))
+    if maximum is not None and value > maximum:
+        raise BadRequest("{} has to be at most {}".format(name, maximum))
+    return value
+
+
+def _streamed() -> bool:
+    if "format" in request.args:
+        return request.args["format"] == "ndjson"
+    return request.accept_mimetypes.best_match(["application/json", NDJSON]) == NDJSON
+
+
+def _ndjson(records):
+    """Yields lines of records joined into blocks, so every object does not cost separate write"""
+    block = []
+    size = 0
+    for record in records:
+        line = _dumps(record)
+        block.append(line)
+        size += len(line) + 1
+        if size >= BUFFER_SIZE:
+            yield "\n".join(block) + "\n"
+            block = []
+            size = 0
+    if block:
+        yield "\n".join(block) + "\n"
+
+
+class Api:
+    def __init__(self, app=None, store=None, rides: RideLog = None, search_index=None):
+        self.store = store
+        self.rides = rides if rides is not None else RideLog()
+        self.search_index = search_index
+        self.blueprint = Blueprint("api", __name__, url_prefix="/api")
+        self.blueprint.add_url_rule("/bikes", "bikes", self.bikes)
+        self.blueprint.add_url_rule("/bikes/<int:bike_id>", "bike", self.bike)
+        self.blueprint.add_url_rule("/bikes/<int:bike_id>/components", "components", self.components)
+        self.blueprint.add_url_rule("/bikes/<int:bike_id>/rides", "bike_rides", self.bike_rides)
+        self.blueprint.add_url_rule("/rides", "rides", self.all_rides)
+        self.blueprint.add_url_rule("/search", "search", self.search)
+        self.blueprint.register_error_handler(HTTPException, self._error)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.register_blueprint(self.blueprint)
+
+    @staticmethod
+    def _error(error):
+        return Response(_dumps({"error": error.description}), status=error.code, mimetype="application/json")
+
+    @staticmethod
+    def _json(value):
+        return Response(_dumps(value), mimetype="application/json")
+
+    def _list(self, records, first=0):
+        """
+        records(after, limit) yields (key, record) ordered by key, response is NDJSON stream or page with link
+        to next one, without after argument the list starts after key first
+        """
+        after = _integer("after", first, minimum=first)
+        if _streamed():
+            limit = _integer("limit", None, minimum=1)
+            return Response(_ndjson(record for _, record in records(after, limit)), mimetype=NDJSON)
+        limit = _integer("limit", DEFAULT_LIMIT, minimum=1, maximum=MAX_LIMIT)
+        page = list(records(after, limit + 1))
+        next_url = None
+        if len(page) > limit:
+            page = page[:limit]
+            arguments = dict(request.view_args, **request.args.to_dict())
+            arguments.update(after=page[-1][0], limit=limit)
+            next_url = url_for(request.endpoint, **arguments)
+        return self._json({"items": [record for _, record in page], "next": next_url})
+
+    def _bike_encoder(self):
+        """Returns (sub-trees to load, function making record of bike) for fields of request"""
+        paths = _paths(BIKE_KEYS)
+        if not paths:
+            return SUBTREES, lambda bike: dict(id=bike.bike_id, **bike_codec.to_dict(bike))
+        keys = {path.split(".")[0] for path in paths}
+        subtrees = tuple(name for name in SUBTREES if name in keys)
+
+        def encode(bike):
+            return dict(id=bike.bike_id, **project(bike_codec.to_dict(bike, keys), paths))
+        return subtrees, encode
+
+    def bikes(self):
+        subtrees, encode = self._bike_encoder()
+
+        def records(after, limit):
+            chunk_size = CHUNK_SIZE if limit is None else min(limit, CHUNK_SIZE)
+            bikes = self.store.scan(after, chunk_size, subtrees)
+            for bike in itertools.islice(bikes, limit):
+                yield bike.bike_id, encode(bike)
+        return self._list(records)
+
+    def _get(self, bike_id):
+        bike = self.store.get(bike_id)
+        if bike is None:
+            raise NotFound("there is no bike {}".format(bike_id))
+        return bike
+
+    def bike(self, bike_id):
+        _, encode = self._bike_encoder()
+        return self._json(encode(self._get(bike_id)))
+
+    def components(self, bike_id):
+        """Component tree of bike, fields select parts of the tree (e.g. fork,wheels.front)"""
+        tree = bike_codec.to_dict(self._get(bike_id), ["components"])["components"] or {}
+        paths = _paths()
+        return self._json(project(tree, paths) if paths else tree)
+
+    def _ride_records(self, bike_id):
+        paths = _paths(RIDE_KEYS)
+        bike_ids = self.rides.columns["bike_id"]
+
+        def records(after, limit):
+            for ride_id, ride in self.rides.rides(bike_id, after, limit):
+                record = {"bike_id": bike_ids[ride_id],
+                          "start": datetime.datetime.fromtimestamp(ride.start).isoformat(),
+                          "ride_type": ride.ride_type,
+                          "distance": round(ride.distance, 3),
+                          "duration": round(ride.duration, 3),
+                          "elevation": round(ride.elevation, 3)}
+                yield ride_id, dict(id=ride_id, **(project(record, paths) if paths else record))
+        return records
+
+    # ride id is its position in RideLog, so the first one has id 0 and list starts after -1
+
+    def bike_rides(self, bike_id):
+        self._get(bike_id)
+        return self._list(self._ride_records(bike_id), first=-1)
+
+    def all_rides(self):
+        return self._list(self._ride_records(_integer("bike_id", None, minimum=1)), first=-1)
+
+    def search(self):
+        """Hits for query q ranked by score, kind arguments (component, wishlist, catalog) filter them"""
+        from search_index import KINDS
+
+        if self.search_index is None:
+            raise NotFound("search is not available")
+        query = request.args.get("q", "")
+        limit = _integer("limit", 10, minimum=1, maximum=MAX_HITS)
+        kinds = request.args.getlist("kind") or None
+        unknown = sorted(set(kinds or ()) - set(KINDS))
+        if unknown:
+            raise BadRequest("unknown kinds {}, available are {}".format(", ".join(unknown), ", ".join(KINDS)))
+        hits = []
+        for hit in self.search_index.search(query, limit, kinds):
+            record = {"kind": hit.kind, "title": hit.title, "detail": hit.detail, "url": hit.url,
+                      "score": round(hit.score, 4)}
+            if hit.kind == "component":
+                _, record["bike_id"], record["slot"] = hit.key
+            hits.append(record)
+        return self._json({"query": query, "hits": hits})
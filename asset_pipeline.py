@@ -0,0 +1,194 @@
+"""
+Static assets of web gui
+* vendor scripts and styles are concatenated into bundles, page includes "common" bundle and only bundles
+  it asks for (template sets page_bundles, e.g. {% set page_bundles = ["charts"] %})
+* bundles and files referenced from css (fonts) get content hash in their name, so they can be cached forever
+* gzip (and brotli, when brotli package is installed) variants are made at build time and served as they are
+* without built manifest (development) the original files from static folder are linked instead
+
+    python asset_pipeline.py  # builds static/dist
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+
+from flask import abort, request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+DIST_FOLDER = os.path.join(STATIC_FOLDER, "dist")
+MANIFEST = "manifest.json"
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+COMPRESSED_TYPES = (".js", ".css", ".svg", ".ttf", ".eot", ".json")
+
+# bundle -> kind -> files relative to static folder, tinymce is not bundled (it loads its plugins relative
+# to its own url), page which needs it has to link it directly
+BUNDLES = {
+    "common": {
+        "css": ["assets/vendor/bootstrap/css/bootstrap.min.css", "assets/vendor/bootstrap-icons/bootstrap-icons.css",
+                "assets/css/style.css"],
+        "js": ["assets/vendor/bootstrap/js/bootstrap.bundle.min.js", "assets/js/main.js"],
+    },
+    "charts": {"js": ["assets/vendor/apexcharts/apexcharts.min.js"]},
+    "editors": {
+        "css": ["assets/vendor/quill/quill.snow.css", "assets/vendor/quill/quill.bubble.css"],
+        "js": ["assets/vendor/quill/quill.min.js"],
+    },
+    "datatables": {
+        "css": ["assets/vendor/simple-datatables/style.css"],
+        "js": ["assets/vendor/simple-datatables/simple-datatables.js"],
+    },
+    "forms": {"js": ["assets/vendor/php-email-form/validate.js"]},
+    "icons": {"css": ["assets/vendor/remixicon/remixicon.css", "assets/vendor/boxicons/css/boxicons.min.css"]},
+}
+
+CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+
+
+def _hashed_name(name, content: bytes):
+    stem, extension = os.path.splitext(os.path.basename(name))
+    return "{}.{}{}".format(stem, hashlib.sha256(content).hexdigest()[:12], extension)
+
+
+def _write(folder, name, content: bytes):
+    with open(os.path.join(folder, name), "wb") as f:
+        f.write(content)
+    if name.endswith(COMPRESSED_TYPES):
+        with open(os.path.join(folder, name + ".gz"), "wb") as f:
+            f.write(gzip.compress(content, compresslevel=9, mtime=0))
+        if brotli is not None:
+            with open(os.path.join(folder, name + ".br"), "wb") as f:
+                f.write(brotli.compress(content))
+
+
+class _Build:
+    def __init__(self, static_folder, dist_folder):
+        self.static_folder = static_folder
+        self.dist_folder = dist_folder
+        self.written = set()
+
+    def emit(self, name, content: bytes) -> str:
+        hashed = _hashed_name(name, content)
+        if hashed not in self.written:
+            _write(self.dist_folder, hashed, content)
+            self.written.add(hashed)
+        return hashed
+
+    def _rewrite_url(self, source, match):
+        url = match.group(2)
+        if url.startswith(("data:", "http:", "https:", "//", "/", "#")):
+            return match.group(0)
+        path, _, fragment = url.partition("#")
+        path = path.split("?")[0]
+        with open(os.path.normpath(os.path.join(os.path.dirname(source), path)), "rb") as f:
+            hashed = self.emit(path, f.read())
+        return 'url("{}{}")'.format(hashed, "#" + fragment if fragment else "")
+
+    def read(self, name, kind) -> bytes:
+        source = os.path.join(self.static_folder, name)
+        with open(source, "rb") as f:
+            content = f.read()
+        if kind == "css":
+            # referenced files are copied next to bundle, so urls stay relative
+            text = CSS_URL.sub(lambda match: self._rewrite_url(source, match), content.decode("utf-8"))
+            content = text.encode("utf-8")
+        return content
+
+
+def build(static_folder=STATIC_FOLDER, dist_folder=DIST_FOLDER, bundles=None) -> dict:
+    """Builds all bundles into dist_folder (previous build is removed), returns manifest"""
+    if os.path.isdir(dist_folder):
+        shutil.rmtree(dist_folder)
+    os.makedirs(dist_folder)
+    current = _Build(static_folder, dist_folder)
+    manifest = {}
+    for bundle, kinds in (bundles or BUNDLES).items():
+        for kind, names in kinds.items():
+            # new line and semicolon keep scripts without trailing one apart
+            separator = b";\n" if kind == "js" else b"\n"
+            content = separator.join(current.read(name, kind) for name in names)
+            manifest["{}.{}".format(bundle, kind)] = current.emit("{}.{}".format(bundle, kind), content)
+    with open(os.path.join(dist_folder, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest(dist_folder=DIST_FOLDER):
+    try:
+        with open(os.path.join(dist_folder, MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+class Assets:
+    def __init__(self, app=None, dist_folder=DIST_FOLDER, bundles=None):
+        self.dist_folder = dist_folder
+        self.bundles = bundles or BUNDLES
+        self.manifest = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.manifest = load_manifest(self.dist_folder)
+        app.add_url_rule("/assets/<path:filename>", "assets", self.send)
+        app.jinja_env.globals["asset_urls"] = self.urls
+
+    def urls(self, kind, page_bundles=()) -> list:
+        """Urls of files of given kind ("css" or "js") which page with page_bundles has to link"""
+        urls = []
+        for bundle in ("common",) + tuple(page_bundles):
+            if self.manifest is not None:
+                name = self.manifest.get("{}.{}".format(bundle, kind))
+                if name is not None:
+                    urls.append(url_for("assets", filename=name))
+            else:
+                urls.extend(url_for("static", filename=name) for name in self.bundles.get(bundle, {}).get(kind, ()))
+        return urls
+
+    def send(self, filename):
+        """Serves built file, precompressed variant when client accepts it"""
+        if os.path.basename(filename) == MANIFEST or filename.endswith((".gz", ".br")):
+            abort(404)
+        encoding = None
+        for name, extension in (("br", ".br"), ("gzip", ".gz")):
+            # quality of encoding, 0 when it is missing or refused ("br;q=0")
+            accepted = request.accept_encodings[name] > 0
+            if accepted and os.path.isfile(os.path.join(self.dist_folder, filename + extension)):
+                encoding = name
+                break
+        mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        if encoding is None:
+            response = send_from_directory(self.dist_folder, filename, mimetype=mimetype)
+        else:
+            response = send_from_directory(self.dist_folder, filename + (".br" if encoding == "br" else ".gz"),
+                                           mimetype=mimetype)
+            response.headers["Content-Encoding"] = encoding
+        response.headers["Cache-Control"] = CACHE_CONTROL
+        response.headers["Vary"] = "Accept-Encoding"
+        return response
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--static", default=STATIC_FOLDER)
+    parser.add_argument("--dist", default=DIST_FOLDER)
+    args = parser.parse_args()
+    manifest = build(args.static, args.dist)
+    for bundle, name in sorted(manifest.items()):
+        size = os.path.getsize(os.path.join(args.dist, name))
+        compressed = os.path.getsize(os.path.join(args.dist, name + ".gz"))
+        print("{:<16} {:<36} {:>9} B {:>9} B gzip".format(bundle, name, size, compressed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Measures /api/bikes: NDJSON export of whole garage (throughput and peak of traced memory, which should not grow
+with number of bikes), first and deep keyset page and projected versus full records
+
+    python benchmarks/bench_api.py --bikes 20000
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask  # noqa: E402
+
+from api import Api  # noqa: E402
+from bike_builder import BikeBuilder  # noqa: E402
+from bike_store import BikeStore  # noqa: E402
+
+
+def read(client, url) -> int:
+    """Reads streamed response block by block, returns number of lines"""
+    response = client.get(url, buffered=False)
+    lines = 0
+    for block in response.response:
+        lines += block.count(b"\n") if isinstance(block, bytes) else block.count("\n")
+    response.close()
+    return lines
+
+
+def export(client, url):
+    """Returns (lines, seconds, peak of traced memory), tracing is slow, so it is measured in second run"""
+    start = time.perf_counter()
+    lines = read(client, url)
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    read(client, url)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return lines, seconds, peak
+
+
+def page_time(client, url, repeat=200):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        client.get(url)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--bikes", type=int, default=20000)
+    args = parser.parse_args()
+
+    store = BikeStore(":memory:")
+    bike = BikeBuilder().get_bike()
+    bike.components.fork.brand = "Fox"
+    with store.batch():
+        for _ in range(args.bikes):
+            store.put(bike)
+    app = Flask(__name__)
+    Api(app, store)
+    client = app.test_client()
+
+    for count in (args.bikes // 4, args.bikes):
+        for fields in ("", "&fields=name,geometry"):
+            lines, seconds, peak = export(client, "/api/bikes?format=ndjson&limit={}{}".format(count, fields))
+            print("export {:>6} bikes {:<22} {:>7.0f} bikes/s   peak memory {:>6.2f} MB".format(
+                lines, fields[1:] or "whole", lines / seconds, peak / 1e6))
+    for after in (0, args.bikes - 100):
+        for fields in ("", "&fields=geometry"):
+            seconds = page_time(client, "/api/bikes?limit=50&after={}{}".format(after, fields))
+            print("page of 50 after {:>6} {:<16} {:>7.2f} ms".format(after, fields[1:] or "whole", seconds * 1000))
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""
+Measures throughput of building skeleton bikes one by one and with BikeBuilder.build_many
+
+    python benchmarks/bench_bike_builder.py --bikes 10000 100000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bike_builder import BikeBuilder  # noqa: E402
+from bike_data import Bike  # noqa: E402
+
+
+def rate(label, function, count):
+    start = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - start
+    print("{:<36} {:>10.0f} bikes/s  ({:.2f} s)".format(label, count / elapsed, elapsed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--bikes", type=int, nargs="+", default=[10000, 100000])
+    args = parser.parse_args()
+
+    for count in args.bikes:
+        rate("BikeBuilder() x {}".format(count), lambda: [BikeBuilder().get_bike() for _ in range(count)], count)
+        rate("build_many({})".format(count), lambda: BikeBuilder.build_many(count), count)
+        rate("build_many(existing x {})".format(count),
+             lambda: BikeBuilder.build_many(Bike() for _ in range(count)), count)
+
+
+if __name__ == "__main__":
+    main()
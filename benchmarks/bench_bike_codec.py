@@ -0,0 +1,53 @@
+"""
+Measures throughput of generated bike codecs in bikes per second, compared to dataclasses.asdict
+
+    python benchmarks/bench_bike_codec.py --bikes 20000
+"""
+import argparse
+import dataclasses
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bike_builder import BikeBuilder  # noqa: E402
+from bike_codec import dump_jsonl, from_dict, load_jsonl, to_dict  # noqa: E402
+from bike_data import Bike, HeadsetStandard, WheelSize  # noqa: E402
+
+
+def make_bike(number):
+    bike = BikeBuilder(Bike(users_name="bike {}".format(number), brand="YT", model="Capra",
+                            model_year="2022")).get_bike()
+    bike.geometry.reach = 450 + number % 50
+    bike.components.headset.standard = HeadsetStandard.TAPERED
+    bike.components.wheels.size = WheelSize.TWENTY_NINE
+    return bike
+
+
+def rate(label, function, count):
+    start = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - start
+    print("{:<24} {:>10.0f} bikes/s".format(label, count / elapsed))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--bikes", type=int, default=20000)
+    args = parser.parse_args()
+
+    bikes = [make_bike(number) for number in range(args.bikes)]
+    rate("dataclasses.asdict", lambda: [dataclasses.asdict(bike) for bike in bikes], args.bikes)
+    encoded = rate("to_dict", lambda: [to_dict(bike) for bike in bikes], args.bikes)
+    rate("from_dict", lambda: [from_dict(data) for data in encoded], args.bikes)
+    buffer = io.StringIO()
+    rate("dump_jsonl", lambda: dump_jsonl(bikes, buffer), args.bikes)
+    buffer.seek(0)
+    rate("load_jsonl", lambda: sum(1 for _ in load_jsonl(buffer)), args.bikes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Builds similarity index of a generated catalog and measures top-k queries
+
+    python benchmarks/bench_bike_comparison.py --bikes 100000 --queries 200
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bike_builder import BikeBuilder  # noqa: E402
+from bike_comparison import SimilarityIndex  # noqa: E402
+from bike_data import BottomBracketStandard, WheelSize  # noqa: E402
+
+
+def make_bike(rng):
+    bike = BikeBuilder().get_bike()
+    bike.geometry.reach = rng.randint(400, 520)
+    bike.geometry.stack = rng.randint(590, 660)
+    bike.geometry.head_tube_angle = rng.choice([63, 63.5, 64, 64.5, 65, 66])
+    bike.geometry.chainstay_length = rng.randint(425, 455)
+    bike.components.frame.travel = rng.choice([100, 120, 140, 150, 160, 170, 200])
+    bike.components.fork.travel = bike.components.frame.travel + rng.choice([0, 10, 20])
+    bike.components.wheels.size = rng.choice([WheelSize.TWENTY_SEVEN, WheelSize.TWENTY_NINE, WheelSize.MULLET])
+    bike.components.bottom_bracket.standard = rng.choice(list(BottomBracketStandard))
+    return bike
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--bikes", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    bikes = [make_bike(rng) for _ in range(args.bikes)]
+    index = SimilarityIndex()
+    start = time.perf_counter()
+    index.add_many(enumerate(bikes))
+    elapsed = time.perf_counter() - start
+    print("indexed {} bikes: {:.2f} s ({:.0f} bikes/s)".format(args.bikes, elapsed, args.bikes / elapsed))
+
+    start = time.perf_counter()
+    for bike_id in range(args.queries):
+        index.most_similar(bike_id, k=args.k)
+    elapsed = time.perf_counter() - start
+    print("top-{} query: {:.2f} ms".format(args.k, elapsed / args.queries * 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Records long setup history of a bike and measures point-in-time queries with and without snapshots
+
+    python benchmarks/bench_bike_history.py --changes 20000 --queries 500
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bike_builder import BikeBuilder  # noqa: E402
+from bike_data import Fork, Pressure, SuspensionSetup  # noqa: E402
+from bike_history import BikeHistory  # noqa: E402
+
+
+def fill(history, changes, rng):
+    bike = BikeBuilder().get_bike()
+    bike.setup.fork = SuspensionSetup(pressure=Pressure(value=80), fast_compression=5)
+    start = datetime.datetime(2020, 1, 1)
+    history.record(1, bike, start)
+    for number in range(1, changes + 1):
+        if number % 500 == 0:
+            bike.components.fork = Fork(brand="Fox", model=str(rng.choice([34, 36, 38])))
+        else:
+            bike.setup.fork.pressure.value = rng.randint(60, 100)
+        history.record(1, bike, start + datetime.timedelta(hours=number))
+    return start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--changes", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    for snapshot_every in (args.changes * 2, 50):
+        history = BikeHistory(":memory:", snapshot_every=snapshot_every)
+        started = time.perf_counter()
+        start = fill(history, args.changes, random.Random(0))
+        elapsed = time.perf_counter() - started
+        rng = random.Random(1)
+        started = time.perf_counter()
+        for _ in range(args.queries):
+            history.state_at(1, start + datetime.timedelta(hours=rng.randint(0, args.changes)))
+        query = (time.perf_counter() - started) / args.queries
+        label = "no snapshots" if snapshot_every > args.changes else "snapshot every {}".format(snapshot_every)
+        print("{}: record {:.0f} changes/s, state_at {:.2f} ms".format(label, args.changes / elapsed, query * 1000))
+        history.close()
+
+
+if __name__ == "__main__":
+    main()
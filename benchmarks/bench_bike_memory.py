@@ -0,0 +1,66 @@
+"""
+Compares memory taken by fully built bikes using slotted bike_data classes
+with the same tree built from equivalent classes keeping per instance __dict__
+
+    python benchmarks/bench_bike_memory.py --bikes 10000
+"""
+import argparse
+import dataclasses
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bike_builder import BikeBuilder  # noqa: E402
+
+_twins = {}
+
+
+def dict_twin(cls):
+    """Returns dataclass with the same fields as cls, but without __slots__"""
+    if cls not in _twins:
+        namespace = {"__annotations__": {_field.name: _field.type for _field in dataclasses.fields(cls)}}
+        namespace.update({_field.name: None for _field in dataclasses.fields(cls)})
+        _twins[cls] = dataclasses.dataclass(type(cls.__name__, (), namespace))
+    return _twins[cls]
+
+
+def to_dict_layout(value):
+    if not dataclasses.is_dataclass(value) or isinstance(value, type):
+        return value
+    twin = dict_twin(type(value))
+    return twin(**{_field.name: to_dict_layout(getattr(value, _field.name))
+                   for _field in dataclasses.fields(value)})
+
+
+def count_instances(value):
+    if not dataclasses.is_dataclass(value) or isinstance(value, type):
+        return 0
+    return 1 + sum(count_instances(getattr(value, _field.name)) for _field in dataclasses.fields(value))
+
+
+def measure(label, build, count):
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    bikes = [build() for _ in range(count)]
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print("{:<12} {:>8.0f} bytes/bike  ({} dataclass instances per bike)".format(
+        label, (after - before) / count, count_instances(bikes[0])))
+    return (after - before) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--bikes", type=int, default=10000)
+    args = parser.parse_args()
+
+    slotted = measure("slots", lambda: BikeBuilder().get_bike(), args.bikes)
+    template = BikeBuilder().get_bike()
+    dicts = measure("__dict__", lambda: to_dict_layout(template), args.bikes)
+    print("saved {:.0f} bytes/bike ({:.0%})".format(dicts - slotted, 1 - slotted / dicts))
+
+
+if __name__ == "__main__":
+    main()
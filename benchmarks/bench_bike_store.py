@@ -0,0 +1,74 @@
+"""
+Loads bikes into BikeStore and measures latency of point lookups
+
+    python benchmarks/bench_bike_store.py --bikes 100000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bike_data import Bike, BikeComponents, Fork, Geometry, Hub, Usage, Wheel, Wheels  # noqa: E402
+from bike_store import BikeStore  # noqa: E402
+
+BRANDS = ["YT", "Canyon", "Specialized", "Trek", "Santa Cruz", "Commencal", "Nukeproof", "Orbea"]
+MODELS = ["Capra", "Jeffsy", "Spectral", "Enduro", "Slash", "Meta", "Mega", "Rallon"]
+HUBS = [("DT Swiss", "350"), ("DT Swiss", "240"), ("Hope", "Pro 4"), ("Shimano", "XT"), ("Industry Nine", "Hydra")]
+
+
+def make_bike(rng):
+    hub_brand, hub_model = rng.choice(HUBS)
+    wheels = Wheels(front_wheel=Wheel(hub=Hub(brand=hub_brand, model=hub_model)),
+                    rear_wheel=Wheel(hub=Hub(brand=hub_brand, model=hub_model)))
+    components = BikeComponents(fork=Fork(brand="Fox", model="36", travel=rng.choice([140, 150, 160, 170])),
+                                wheels=wheels)
+    return Bike(brand=rng.choice(BRANDS), model=rng.choice(MODELS), model_year=str(rng.randint(2015, 2023)),
+                total_usage=Usage(), geometry=Geometry(reach=rng.randint(420, 520)), components=components)
+
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def measure(label, function, arguments):
+    samples = []
+    for argument in arguments:
+        start = time.perf_counter_ns()
+        function(argument)
+        samples.append(time.perf_counter_ns() - start)
+    print("{:<28} p50 {:>9.1f} us   p99 {:>9.1f} us".format(
+        label, percentile(samples, 0.5) / 1000, percentile(samples, 0.99) / 1000))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--bikes", type=int, default=100000)
+    parser.add_argument("--lookups", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        store = BikeStore(os.path.join(directory, "bench.db"))
+        start = time.perf_counter()
+        with store.batch():
+            for _ in range(args.bikes):
+                store.put(make_bike(rng))
+        elapsed = time.perf_counter() - start
+        print("loaded {} bikes in {:.2f} s ({:.0f} bikes/s)".format(args.bikes, elapsed, args.bikes / elapsed))
+
+        ids = [rng.randint(1, args.bikes) for _ in range(args.lookups)]
+        measure("get(id)", store.get, ids)
+        measure("get(id).components", lambda bike_id: store.get(bike_id).components, ids)
+        measure("find_by_component", lambda hub: store.find_by_component(*hub),
+                [rng.choice(HUBS) for _ in range(args.lookups // 100 or 1)])
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Parses generated listing titles, cold (every title new) and warm (titles repeating, served from LRU cache)
+
+    python benchmarks/bench_component_parser.py --titles 50000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from component_parser import ComponentNameParser  # noqa: E402
+
+TEMPLATES = [
+    "{year} YT Capra 29 Core {number}",
+    "Fox 36 Factory Grip2 29\" {travel}mm 44mm offset boost fork",
+    "RockShox Super Deluxe Ultimate Coil {length}x65 shock",
+    "Maxxis Minion DHR II 29x2.{number} 3C MaxxGrip DoubleDown EXO+ tyre",
+    "Shimano XT M8100 12 speed cassette 10-5{number}t",
+    "Shimano RT-MT800 203mm centerlock rotor",
+    "Race Face Atlas 35 handlebar {width}mm 35mm",
+    "DT Swiss 350 boost {holes}h rear hub",
+    "Santa Cruz Nomad {number} {year} frame size L tapered",
+    "SRAM Code RSC disc brake {year}",
+]
+
+
+def make_titles(count, rng):
+    return [rng.choice(TEMPLATES).format(year=rng.randint(2015, 2024), number=rng.randint(1, 9),
+                                         travel=rng.choice(range(120, 190, 10)), length=rng.choice([205, 230, 250]),
+                                         width=rng.choice([760, 780, 800]), holes=rng.choice([28, 32]))
+            + " #{}".format(index) for index in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--titles", type=int, default=50000)
+    args = parser.parse_args()
+
+    titles = make_titles(args.titles, random.Random(0))
+    name_parser = ComponentNameParser(cache_size=args.titles)
+    start = time.perf_counter()
+    name_parser.parse_many(titles)
+    elapsed = time.perf_counter() - start
+    print("cold: {:.0f} titles/s".format(args.titles / elapsed))
+
+    start = time.perf_counter()
+    name_parser.parse_many(titles)
+    elapsed = time.perf_counter() - start
+    print("warm: {:.0f} titles/s".format(args.titles / elapsed))
+
+
+if __name__ == "__main__":
+    main()
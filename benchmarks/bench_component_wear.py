@@ -0,0 +1,48 @@
+"""
+Evaluates service rules over wear table of a large fleet
+
+    python benchmarks/bench_component_wear.py --bikes 10000 --rides 1000000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bike_builder import BikeBuilder  # noqa: E402
+from component_wear import WearTable  # noqa: E402
+
+
+def timed(label, function):
+    start = time.perf_counter()
+    result = function()
+    print("{:<28} {:>9.1f} ms".format(label, (time.perf_counter() - start) * 1000))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--bikes", type=int, default=10000)
+    parser.add_argument("--rides", type=int, default=1000000)
+    args = parser.parse_args()
+
+    table = WearTable(capacity=args.bikes * 40)
+    template = BikeBuilder().get_bike()
+    timed("add {} bikes".format(args.bikes), lambda: [table.add_bike(bike_id, template) for bike_id in range(args.bikes)])
+    print("{} components".format(len(table)))
+
+    rng = np.random.default_rng(0)
+    bike_ids = rng.integers(0, args.bikes, args.rides)
+    hours = rng.uniform(0.5, 4, args.rides)
+    distance = rng.uniform(5, 60, args.rides)
+    ride_types = rng.integers(0, len(table.ride_types), args.rides)
+    timed("add {} rides".format(args.rides), lambda: table.add_rides(bike_ids, hours, distance, ride_types))
+    notices = timed("evaluate service rules", table.due)
+    print("{} components due or soon due".format(len(notices)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Completes geometry of a generated catalog of frames, cold (empty memo) and warm
+
+    python benchmarks/bench_geometry_solver.py --frames 10000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import geometry_solver  # noqa: E402
+from bike_data import Geometry  # noqa: E402
+
+
+def make_catalog(count, rng):
+    catalog = []
+    for _ in range(count):
+        drop = rng.choice([20, 25, 30, {12, 30}])
+        catalog.append(Geometry(reach=rng.randint(400, 520), stack=rng.randint(590, 660),
+                                seat_tube_angle=rng.choice([76, 76.5, 77, 77.5, 78]),
+                                head_tube_angle=rng.choice([63, 63.5, 64, 64.5, 65, {64, 64.5}]),
+                                bottom_bracket_drop=drop, chainstay_length=rng.randint(425, 455)))
+    return catalog
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--frames", type=int, default=10000)
+    args = parser.parse_args()
+
+    for label in ("cold", "warm"):
+        if label == "cold":
+            geometry_solver.clear_cache()
+        catalog = make_catalog(args.frames, random.Random(0))
+        start = time.perf_counter()
+        geometry_solver.complete_many(catalog)
+        print("{} {} frames: {:.1f} ms".format(label, args.frames, (time.perf_counter() - start) * 1000))
+
+
+if __name__ == "__main__":
+    main()
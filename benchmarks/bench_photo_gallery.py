@@ -0,0 +1,84 @@
+"""
+Measures ingestion of photo gallery: thumbnails of full resolution photos on pool of 1 and --workers processes,
+ingestion of unchanged folder and of folder with copies of the photos (deduplicated), read of gallery as the page
+does it and serving of thumbnail (whole and range)
+
+    python benchmarks/bench_photo_gallery.py --photos 24 --size 4000x3000
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask  # noqa: E402
+
+from photo_gallery import Photos, PhotoStore  # noqa: E402
+
+
+def make_photos(folder, count, width, height):
+    """JPEG photos from camera like noise, which compresses about as badly as real photo"""
+    from PIL import Image
+
+    os.makedirs(folder)
+    for number in range(count):
+        bands = [Image.effect_noise((width, height), 40 + number % 20 + band) for band in range(3)]
+        Image.merge("RGB", bands).save(os.path.join(folder, "photo_{:04}.jpg".format(number)), quality=92)
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--photos", type=int, default=24)
+    parser.add_argument("--size", default="4000x3000")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+    width, height = (int(value) for value in args.size.split("x"))
+
+    directory = tempfile.mkdtemp(prefix="bench_photo_gallery_")
+    try:
+        folder = os.path.join(directory, "gallery")
+        _, seconds = timed(make_photos, folder, args.photos, width, height)
+        megabytes = sum(entry.stat().st_size for entry in os.scandir(folder)) / 1024 / 1024
+        print("{} photos {}x{}, {:.0f} MB, generated in {:.1f} s".format(args.photos, width, height, megabytes,
+                                                                       seconds))
+        for workers in sorted({1, args.workers}):
+            with PhotoStore(os.path.join(directory, "store_{}".format(workers)), max_workers=workers) as store:
+                report, seconds = timed(store.ingest_folder, folder)
+                print("ingest, {} workers: {:.2f} s, {:.0f} ms per photo, {} rendered".format(
+                    workers, seconds, seconds / args.photos * 1000, report.rendered))
+
+        copies = os.path.join(directory, "copies")
+        shutil.copytree(folder, copies)
+        report, seconds = timed(store.ingest_folder, folder)
+        print("ingest of unchanged folder: {:.1f} ms, {} rendered".format(seconds * 1000, report.rendered))
+        report, seconds = timed(store.ingest_folder, copies)
+        print("ingest of copies (hashed, not rendered): {:.2f} s, {} rendered".format(seconds, report.rendered))
+
+        runs = 1000
+        _, seconds = timed(lambda: [store.gallery(folder) for _ in range(runs)])
+        print("gallery of {} photos as page reads it: {:.1f} us".format(args.photos, seconds / runs * 1e6))
+
+        app = Flask(__name__)
+        Photos(app, store)
+        client = app.test_client()
+        with app.test_request_context():
+            url = Photos.url(report.photos[0], "medium")
+        for name, headers in (("whole", {}), ("range", {"Range": "bytes=0-65535"})):
+            _, seconds = timed(lambda: [client.get(url, headers=headers).get_data() for _ in range(runs)])
+            print("serve medium thumbnail, {}: {:.0f} us".format(name, seconds / runs * 1e6))
+        store.close()
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Imports several years of generated rides for a fleet of bikes and reports rides/s and peak memory
+
+    python benchmarks/bench_ride_log.py --bikes 50 --years 5
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bike_builder import BikeBuilder  # noqa: E402
+from ride_log import RIDE_TYPES, RideLog, ingest, read_file  # noqa: E402
+
+
+def write_rides(path, rng, years):
+    day = datetime.date(2023, 1, 1) - datetime.timedelta(days=365 * years)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("Date,Ride Type,Distance,Duration,Elevation Gain\n")
+        for _ in range(365 * years):
+            day += datetime.timedelta(days=1)
+            if rng.random() < 0.6:
+                f.write("{},{},{:.1f}km,{}:{:02d},{}m\n".format(
+                    day.strftime("%d. %m. %Y"), rng.choice(RIDE_TYPES), rng.uniform(5, 60),
+                    rng.randint(0, 4), rng.randint(0, 59), rng.randint(0, 1500)))
+
+
+def import_fleet(paths):
+    bikes = BikeBuilder.build_many(len(paths))
+    log = RideLog()
+    return sum(ingest(log, bike_id, bike, read_file(path)) for bike_id, (bike, path) in enumerate(zip(bikes, paths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--bikes", type=int, default=50)
+    parser.add_argument("--years", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as directory:
+        paths = []
+        for number in range(args.bikes):
+            paths.append(os.path.join(directory, "bike{}.csv".format(number)))
+            write_rides(paths[-1], rng, args.years)
+        start = time.perf_counter()
+        count = import_fleet(paths)
+        elapsed = time.perf_counter() - start
+        tracemalloc.start()
+        import_fleet(paths)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    print("imported {} rides in {:.2f} s ({:.0f} rides/s), peak {:.1f} MB traced".format(
+        count, elapsed, count / elapsed, peak / 2 ** 20))
+
+
+if __name__ == "__main__":
+    main()
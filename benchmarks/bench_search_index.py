@@ -0,0 +1,96 @@
+"""
+Measures SearchIndex on synthetic catalog of part entries: build time, memory, latency of search as you type
+(every prefix of queries, with typos) and of incremental updates
+
+    python benchmarks/bench_search_index.py --entries 1000000
+"""
+import argparse
+import os
+import random
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bike_codec import load_jsonl  # noqa: E402
+from search_index import Entry, SearchIndex  # noqa: E402
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "garage.jsonl")
+BRANDS = ["Shimano", "SRAM", "Fox", "RockShox", "DT Swiss", "Hope", "Maxxis", "Schwalbe", "Continental", "Renthal",
+          "Race Face", "OneUp", "Chris King", "Industry Nine", "Hayes", "Magura", "TRP", "Formula", "Ohlins",
+          "Cane Creek", "Marzocchi", "DVO", "EXT", "Push", "Stan's", "WTB", "Crankbrothers", "Ergon", "Deity", "Spank",
+          "Burgtec", "Santa Cruz", "Reserve", "Nukeproof", "Michelin", "Vittoria", "e*thirteen", "Wolf Tooth",
+          "Bike Yoke", "PNW"] + ["Brand{}".format(number) for number in range(160)]
+PARTS = ["fork", "shock", "hub", "rim", "tyre", "cassette", "chain", "derailleur", "brake", "rotor", "pads", "stem",
+         "handlebar", "grips", "saddle", "seatpost", "dropper", "pedals", "cranks", "chainring", "headset",
+         "bottom bracket", "wheelset", "spokes", "valve", "sealant"]
+SYLLABLES = ["ka", "ro", "mi", "tor", "flux", "zen", "dri", "vex", "lo", "na", "tra", "il", "gra", "vi", "ty", "sum",
+             "mit", "ex", "pert", "fac", "ul", "ti", "mate", "pro", "sel", "ect", "ele", "ment"]
+SHOPS = ["Bike24", "Chain Reaction", "Bike Discount", "CRC", "Probikeshop", "Alltricks", "Jenson", "Wiggle"]
+QUERIES = ["dt swiss 350", "shimano xt 12", "fox 36 factory", "rockshox lyrik", "maxxis assegai 2.5",
+           "chris king hub", "renthal fatbar", "race face atlas", "shimnao xt", "rokshox lyrik", "fox facotry"]
+
+
+def make_entries(count, seed=24):
+    rng = random.Random(seed)
+    models = ["".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) + rng.choice(["", "", str(number)])
+              for number in range(50000)]
+    models += ["36", "38", "Lyrik", "Zeb", "XT", "XTR", "SLX", "GX", "X01", "Eagle", "Assegai", "Minion", "350", "240",
+               "Atlas", "Tech 4", "Factory", "Ultimate", "Select", "Performance"]
+    for number in range(count):
+        brand = rng.choice(BRANDS)
+        title = "{} {} {} {}".format(brand, rng.choice(models), rng.choice(models), rng.choice(PARTS))
+        detail = "{} {} {}mm {}".format(rng.choice(SHOPS), rng.choice(["12", "11", "29", "27.5", "160", "170"]),
+                                        rng.randint(20, 800), rng.choice(["boost", "tapered", "black", "grey"]))
+        yield Entry(("catalog", number), "catalog", title, detail, "https://shop.example/{}".format(number))
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entries", type=int, default=1000000)
+    args = parser.parse_args()
+
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    index = SearchIndex()
+    start = time.perf_counter()
+    index.add_many(make_entries(args.entries))
+    with open(FIXTURE, encoding="utf-8") as fp:
+        bikes = list(load_jsonl(fp))
+    for bike_id, bike in enumerate(bikes, 1):
+        index.update_bike(bike_id, bike)
+    print("build {} entries: {:.1f} s, {} terms, +{:.0f} MB max RSS".format(
+        len(index), time.perf_counter() - start, len(index._vocabulary),
+        (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss) / 1024))
+
+    index.search("warm up")
+    typed = []
+    for query in QUERIES:
+        for end in range(1, len(query) + 1):
+            start = time.perf_counter()
+            hits = index.search(query[:end])
+            typed.append(time.perf_counter() - start)
+        print("{:<22} -> {}".format(query, hits[0].title if hits else "-"))
+    print("search as you type, {} queries: p50 {:.2f} ms, p90 {:.2f} ms, p99 {:.2f} ms, max {:.2f} ms".format(
+        len(typed), percentile(typed, 0.5) * 1000, percentile(typed, 0.9) * 1000, percentile(typed, 0.99) * 1000,
+        max(typed) * 1000))
+
+    bike = bikes[0]
+    updates = []
+    for number in range(200):
+        bike.components.fork.model = "36 Factory {}".format(number)
+        start = time.perf_counter()
+        index.update_bike(1, bike)
+        index.search("fox 36 fac")
+        updates.append(time.perf_counter() - start)
+    print("update bike + query: p50 {:.2f} ms, max {:.2f} ms".format(percentile(updates, 0.5) * 1000,
+                                                                     max(updates) * 1000))
+
+
+if __name__ == "__main__":
+    main()
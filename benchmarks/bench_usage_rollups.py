@@ -0,0 +1,67 @@
+"""
+Measures rollups of ride history: building them from RideLog, incremental add of one ride, and chart payload
+size and /usage render time for growing history, which should stay flat
+
+    python benchmarks/bench_usage_rollups.py --bikes 20 --rides-per-day 2
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault("BIKE_GARAGE_DB", ":memory:")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import web_gui  # noqa: E402
+from bike_builder import BikeBuilder  # noqa: E402
+from ride_log import RIDE_TYPES, Ride, RideLog  # noqa: E402
+from usage_rollups import UsageRollups  # noqa: E402
+
+
+def make_log(bikes, years, rides_per_day):
+    log = RideLog()
+    start = time.time() - years * 365 * 86400
+    for bike_id in range(1, bikes + 1):
+        count = int(years * 365 * rides_per_day)
+        log.append_many(bike_id, (Ride(start + index * 86400 / rides_per_day, random.choice(RIDE_TYPES),
+                                       random.uniform(5, 60), random.uniform(1800, 14400), random.uniform(0, 1500))
+                                  for index in range(count)))
+    return log
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--bikes", type=int, default=20)
+    parser.add_argument("--rides-per-day", type=float, default=2)
+    args = parser.parse_args()
+
+    client = web_gui.bike_garage.test_client()
+    web_gui.cache.enabled = False
+    bike_id = web_gui.garage.add(BikeBuilder().get_bike())  # rides of bike 1 are shown
+    for years in (1, 5, 20):
+        log = make_log(args.bikes, years, args.rides_per_day)
+        rollups = UsageRollups()
+        start = time.perf_counter()
+        last = rollups.add_ride_log(log)
+        built = time.perf_counter() - start
+        log.append_many(bike_id, [Ride(time.time(), "casual", 10, 3600, 100)])
+        start = time.perf_counter()
+        rollups.add_ride_log(log, after=last)
+        added = time.perf_counter() - start
+
+        web_gui.rollups = rollups
+        for period in ("day", "week"):
+            url = "/usage?bike_num={}&period={}".format(bike_id, period)
+            start = time.perf_counter()
+            for _ in range(50):
+                response = client.get(url)
+            render = (time.perf_counter() - start) / 50
+            points = len(rollups.series(bike_id, period, "distance")[0])
+            print("{:>2} years {:>7} rides: build {:>6.1f} ms, add 1 ride {:>5.2f} ms | {:<4} {:>5} points -> "
+                  "page {:>6} B, render {:>5.2f} ms".format(years, len(log), built * 1000, added * 1000, period,
+                                                             points, len(response.data), render * 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Measures parsing of saved Vital MTB search page, compared to full BeautifulSoup tree when bs4 is installed
+
+    python benchmarks/bench_vital_parse.py --repeat 200
+"""
+import argparse
+import os
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from web_scraper import BIKE_PRODUCT_SEPARATORS, parse_vital_results  # noqa: E402
+
+FIXTURE = os.path.join(ROOT, "testing", "test_html",
+                       "search?cat=Site&page=1&period=all_time&q=YT+CAPRA+2022&section=product")
+SEARCH_BY = ["YT", "CAPRA", "2022"]
+
+
+def parse_full_soup(html_page, search_by):
+    """Parsing as search_bike_vital did it before, kept for comparison"""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html_page, features="lxml")
+    found_items = [found_item.find("a") for found_item in soup.find_all(role="search-result")]
+    results = []
+    for item in found_items:
+        text = item.text
+        link = item["href"]
+        if any([x.lower() in text.lower() for x in search_by]):
+            for product_string in BIKE_PRODUCT_SEPARATORS:
+                if product_string in text:
+                    results.append([text.split(product_string)[0], link])
+                    break
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    with open(FIXTURE, encoding="utf-8") as f:
+        html_page = f.read()
+    parsers = [("parse_vital_results", parse_vital_results)]
+    try:
+        import bs4  # noqa: F401
+        parsers.append(("BeautifulSoup full tree", parse_full_soup))
+    except ImportError:
+        pass
+    expected = parse_vital_results(html_page, SEARCH_BY)
+    for label, parse in parsers:
+        assert parse(html_page, SEARCH_BY) == expected
+        seconds = timeit.timeit(lambda: parse(html_page, SEARCH_BY), number=args.repeat) / args.repeat
+        print("{:<26} {:>8.2f} ms/page".format(label, seconds * 1000))
+
+
+if __name__ == "__main__":
+    main()
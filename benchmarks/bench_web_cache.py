@@ -0,0 +1,49 @@
+"""
+Measures rendered page throughput of /components/, /usage and /setup/ through Flask test client:
+without cache, with warm cache and with conditional requests answered by 304
+
+    python benchmarks/bench_web_cache.py --requests 2000
+"""
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault("BIKE_GARAGE_DB", ":memory:")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import web_gui  # noqa: E402
+from bike_builder import BikeBuilder  # noqa: E402
+
+PAGES = ["/components/?bike_num={}", "/usage?bike_num={}", "/setup/?bike_num={}"]
+
+
+def measure(client, url, requests, headers=None):
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = client.get(url, headers=headers)
+    return requests / (time.perf_counter() - start), response
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    bike = BikeBuilder().get_bike()
+    bike.components.fork.brand = "Fox"
+    bike_id = web_gui.garage.add(bike)
+    client = web_gui.bike_garage.test_client()
+    for page in PAGES:
+        url = page.format(bike_id)
+        web_gui.cache.enabled = False
+        uncached, _ = measure(client, url, args.requests)
+        web_gui.cache.enabled = True
+        cached, response = measure(client, url, args.requests)
+        conditional, _ = measure(client, url, args.requests, {"If-None-Match": response.headers["ETag"]})
+        print("{:<24} no cache {:>6.0f} req/s   cached {:>6.0f} req/s   304 {:>6.0f} req/s".format(
+            url, uncached, cached, conditional))
+
+
+if __name__ == "__main__":
+    main()
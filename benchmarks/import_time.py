@@ -0,0 +1,82 @@
+"""
+Report of import time of the app modules, output of python -X importtime parsed into table
+* modules are imported in fresh interpreter, one per module, with BIKE_GARAGE_DB=:memory: unless it is set
+* rows are sorted by self or cumulative time, --by-package sums self time of modules of every top level package
+* BIKE_GARAGE_DEFERRED_STARTUP=1 in environment shows startup of the deferred mode
+
+    python benchmarks/import_time.py main web_scraper --top 20
+    python benchmarks/import_time.py main --by-package
+"""
+import argparse
+import collections
+import os
+import subprocess
+import sys
+from collections import namedtuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+Import = namedtuple("Import", "module self_us cumulative_us depth")
+
+
+def parse_importtime(stderr: str) -> list:
+    """Imports from stderr of python -X importtime in order of the output (nested imports first)"""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # header
+        name = fields[2].rstrip()
+        module = name.lstrip()
+        imports.append(Import(module, int(fields[0]), int(fields[1]), (len(name) - len(module) - 1) // 2))
+    return imports
+
+
+def measure(module, python=sys.executable) -> list:
+    environ = dict(os.environ)
+    environ.setdefault("BIKE_GARAGE_DB", ":memory:")
+    environ["PYTHONPATH"] = os.pathsep.join(filter(None, [ROOT, environ.get("PYTHONPATH")]))
+    completed = subprocess.run([python, "-X", "importtime", "-c", "import {}".format(module)], env=environ,
+                               cwd=ROOT, capture_output=True, text=True, check=True)
+    return parse_importtime(completed.stderr)
+
+
+def by_package(imports) -> list:
+    totals = collections.Counter()
+    for item in imports:
+        totals[item.module.split(".")[0]] += item.self_us
+    return [Import(package, total, total, 0) for package, total in totals.items()]
+
+
+def table(imports, sort="cumulative", top=25) -> str:
+    key = (lambda item: item.self_us) if sort == "self" else (lambda item: item.cumulative_us)
+    rows = sorted(imports, key=key, reverse=True)[:top]
+    lines = ["{:>10} {:>10}  module".format("self ms", "cumul. ms")]
+    for item in rows:
+        lines.append("{:>10.1f} {:>10.1f}  {}{}".format(item.self_us / 1000, item.cumulative_us / 1000,
+                                                      "  " * item.depth, item.module))
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", default=["main"])
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--sort", choices=("self", "cumulative"), default="cumulative")
+    parser.add_argument("--by-package", action="store_true")
+    args = parser.parse_args()
+
+    for module in args.modules:
+        imports = measure(module)
+        total = sum(item.self_us for item in imports)
+        print("import {}: {:.1f} ms, {} modules".format(module, total / 1000, len(imports)))
+        if args.by_package:
+            imports = by_package(imports)
+        print(table(imports, "self" if args.by_package else args.sort, args.top))
+        print()
+
+
+if __name__ == "__main__":
+    main()
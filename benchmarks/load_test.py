@@ -0,0 +1,89 @@
+"""
+Load test of running server: clients in separate processes send requests over keep-alive connections
+for given time and throughput and latency percentiles are reported
+
+    BIKE_GARAGE_WORKERS=4 python main.py &
+    python benchmarks/load_test.py --url http://127.0.0.1:5000/usage --clients 16 --seconds 10
+"""
+import argparse
+import http.client
+import multiprocessing
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+def client(url, paths, seconds, start_at, results):
+    """Sends requests in loop until deadline, puts (latencies in seconds, errors) to results"""
+    parts = urlsplit(url)
+    latencies = []
+    errors = 0
+    connection = None
+    while time.time() < start_at:
+        time.sleep(0.001)
+    deadline = time.perf_counter() + seconds
+    index = 0
+    while time.perf_counter() < deadline:
+        path = paths[index % len(paths)]
+        index += 1
+        if connection is None:
+            connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+        start = time.perf_counter()
+        try:
+            connection.request("GET", path)
+            response = connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            connection.close()
+            connection = None
+            continue
+        latencies.append(time.perf_counter() - start)
+        if response.status >= 400:
+            errors += 1
+        if response.will_close:
+            connection.close()
+            connection = None
+    results.put((latencies, errors))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", action="append", dest="urls",
+                        help="url to request, can be given more times (clients cycle through them)")
+    parser.add_argument("--clients", type=int, default=8, help="concurrent connections (processes)")
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+    urls = args.urls or ["http://127.0.0.1:5000/"]
+
+    paths = []
+    for url in urls:
+        parts = urlsplit(url)
+        paths.append(parts.path + ("?" + parts.query if parts.query else ""))
+    results = multiprocessing.Queue()
+    start_at = time.time() + 0.5  # all clients are started before the first request
+    processes = [multiprocessing.Process(target=client, args=(urls[0], paths, args.seconds, start_at, results))
+                 for _ in range(args.clients)]
+    for process in processes:
+        process.start()
+    collected = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    latencies = np.array([latency for client_latencies, _ in collected for latency in client_latencies])
+    errors = sum(client_errors for _, client_errors in collected)
+    print("{} requests in {:.1f} s with {} clients, {} errors".format(len(latencies), args.seconds, args.clients,
+                                                                    errors))
+    print("{:.0f} req/s".format(len(latencies) / args.seconds))
+    if len(latencies):
+        values = np.percentile(latencies, PERCENTILES) * 1000
+        print("latency " + "   ".join("p{:g} {:.2f} ms".format(percentile, value)
+                                      for percentile, value in zip(PERCENTILES, values))
+              + "   max {:.2f} ms".format(latencies.max() * 1000))
+
+
+if __name__ == "__main__":
+    main()
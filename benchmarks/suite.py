@@ -0,0 +1,260 @@
+"""
+Benchmark suite of hot paths of the app with regression gate, all inputs are fixtures committed in the repo
+* BikeBuilder construction, parse of saved Vital search page, bike serialization and rendering of every page
+  template through the Flask test client (page cache off)
+* every case is timed by timeit, best of --repeat runs is compared to benchmarks/baseline.json
+* with --calibrate baseline times are scaled by ratio of calibration loop measured here and with the baseline,
+  so baseline stored on other machine can be used (scaling adds noise of the loop, so it is off by default)
+* run fails (exit status 1) when a case is slower than baseline by more than --threshold
+
+    python benchmarks/suite.py                  # compare with baseline
+    python benchmarks/suite.py --update         # store results as new baseline
+    python benchmarks/suite.py -k render --threshold 0.5
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import timeit
+from collections import namedtuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, "benchmarks", "fixtures")
+BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+VITAL_SEARCH_PAGE = os.path.join(ROOT, "testing", "test_html",
+                                 "search?cat=Site&page=1&period=all_time&q=YT+CAPRA+2022&section=product")
+DEFAULT_THRESHOLD = 0.25
+
+os.environ.setdefault("BIKE_GARAGE_DB", ":memory:")
+sys.path.insert(0, ROOT)
+
+from bike_builder import BikeBuilder  # noqa: E402
+from bike_codec import dump_jsonl, dumps, from_dict, load_jsonl, loads, to_dict  # noqa: E402
+from bike_data import Bike  # noqa: E402
+from ride_log import RideLog, read_csv  # noqa: E402
+
+Case = namedtuple("Case", "name setup")
+Result = namedtuple("Result", "name seconds baseline change regression")
+
+CASES = []
+# template -> URL rendering it, bike 1 of the fixture garage is selected
+PAGES = {
+    "index.html": "/?bike_num=1",
+    "usage.html": "/usage?bike_num=1&period=week",
+    "components.html": "/components/?bike_num=1",
+    "setup.html": "/setup/?bike_num=1",
+    "wishlist.html": "/wishlist/",
+    "gallery.html": "/gallery/?bike_num=1",
+}
+
+
+def case(name):
+    """Registers setup function of case, it prepares inputs and returns function which is timed"""
+    def register(setup):
+        CASES.append(Case(name, setup))
+        return setup
+    return register
+
+
+def load_garage() -> list:
+    with open(os.path.join(FIXTURES, "garage.jsonl"), encoding="utf-8") as fp:
+        return list(load_jsonl(fp))
+
+
+def load_rides() -> RideLog:
+    rides = RideLog()
+    with open(os.path.join(FIXTURES, "rides.csv"), encoding="utf-8", newline="") as fp:
+        for chunk in read_csv(fp):
+            rides.append_many(1, chunk)
+    return rides
+
+
+@case("bike_builder new")
+def bike_builder_new():
+    return lambda: BikeBuilder().get_bike()
+
+
+@case("bike_builder fill")
+def bike_builder_fill():
+    return lambda: BikeBuilder(Bike(users_name="bike", brand="YT", model="Capra")).get_bike()
+
+
+@case("bike_builder build_many 1000")
+def bike_builder_build_many():
+    return lambda: BikeBuilder.build_many(1000)
+
+
+@case("vital parse")
+def vital_parse():
+    import web_scraper
+
+    with open(VITAL_SEARCH_PAGE, encoding="utf-8") as f:
+        html_page = f.read()
+    bike = Bike(brand="YT", model="CAPRA 2022")
+    original = web_scraper.get_page
+
+    def parse_saved_page():
+        # search_bike_vital looks get_page up in module globals, so it is replaced without overhead of mock
+        web_scraper.get_page = lambda url_link: html_page
+        try:
+            return web_scraper.search_bike_vital(bike)
+        finally:
+            web_scraper.get_page = original
+    return parse_saved_page
+
+
+@case("codec to_dict garage")
+def codec_to_dict():
+    bikes = load_garage()
+    return lambda: [to_dict(bike) for bike in bikes]
+
+
+@case("codec from_dict garage")
+def codec_from_dict():
+    encoded = [to_dict(bike) for bike in load_garage()]
+    return lambda: [from_dict(data) for data in encoded]
+
+
+@case("codec dumps/loads garage")
+def codec_dumps_loads():
+    bikes = load_garage()
+    return lambda: [loads(dumps(bike)) for bike in bikes]
+
+
+@case("codec dump_jsonl garage")
+def codec_dump_jsonl():
+    bikes = load_garage()
+    return lambda: dump_jsonl(bikes, io.StringIO())
+
+
+def web_client():
+    """Test client of the app with fixture garage and rides, page cache is off so templates are rendered"""
+    import web_gui
+    from usage_rollups import UsageRollups
+
+    if not web_gui.garage.version(1):
+        web_gui.garage.add_many(load_garage())
+        web_gui.rollups = UsageRollups()
+        web_gui.rollups.add_ride_log(load_rides())
+    web_gui.cache.enabled = False
+    return web_gui.bike_garage.test_client()
+
+
+def render_case(url):
+    def setup():
+        client = web_client()
+
+        def render():
+            response = client.get(url)
+            assert response.status_code == 200, (url, response.status_code)
+            return response
+        return render
+    return setup
+
+
+for _template, _url in PAGES.items():
+    CASES.append(Case("render " + _template, render_case(_url)))
+
+
+def calibration() -> float:
+    """Time of fixed pure python workload, ratio of it on two machines scales times of baseline"""
+    return min(timeit.repeat("sorted(str(i * 7919 % 10007) for i in range(20000))", number=2, repeat=20))
+
+
+def measure(function, repeat=5) -> float:
+    """Best seconds per call, number of calls in one run is chosen so that run takes at least 0.2 s"""
+    function()  # warm up caches of codecs, templates...
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def load_baseline(path) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(results: dict, baseline: dict, threshold=DEFAULT_THRESHOLD, scale=1.0) -> list:
+    """
+    Returns Result of each case, baseline seconds are multiplied by scale (calibration of this machine divided
+    by calibration of the baseline), cases missing in baseline are never regression
+    """
+    compared = []
+    for name, seconds in results.items():
+        expected = baseline.get("cases", {}).get(name)
+        if expected is None:
+            compared.append(Result(name, seconds, None, None, False))
+            continue
+        expected *= scale
+        change = seconds / expected - 1
+        compared.append(Result(name, seconds, expected, change, change > threshold))
+    return compared
+
+
+def _duration(seconds) -> str:
+    if seconds is None:
+        return "-"
+    if seconds < 0.001:
+        return "{:.1f} us".format(seconds * 1e6)
+    return "{:.2f} ms".format(seconds * 1000)
+
+
+def report(compared, threshold) -> str:
+    lines = ["{:<32} {:>12} {:>12} {:>8}".format("case", "time", "baseline", "change")]
+    for result in compared:
+        change = "new" if result.change is None else "{:+.1%}".format(result.change)
+        lines.append("{:<32} {:>12} {:>12} {:>8}{}".format(result.name, _duration(result.seconds),
+                                                          _duration(result.baseline), change,
+                                                          "  REGRESSION" if result.regression else ""))
+    regressions = sum(result.regression for result in compared)
+    lines.append("{} regressions over {:.0%} threshold".format(regressions, threshold))
+    return "\n".join(lines)
+
+
+def run(cases, repeat=5) -> dict:
+    return {name: measure(setup(), repeat) for name, setup in cases}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-k", dest="select", help="run only cases containing this text")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown against baseline, 0.25 is 25 %% (default %(default)s)")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--update", action="store_true", help="store results as baseline instead of comparing")
+    parser.add_argument("--calibrate", action="store_true", help="scale baseline to speed of this machine")
+    args = parser.parse_args(argv)
+
+    cases = [case for case in CASES if not args.select or args.select in case.name]
+    calibrated = calibration()
+    results = run(cases, args.repeat)
+    calibrated = min(calibrated, calibration())  # best of both, load of machine could change during the run
+    baseline = load_baseline(args.baseline)
+    if args.update:
+        stored = {}
+        if args.select and baseline:
+            # partial update keeps the other cases, new results are scaled to calibration of the stored ones
+            stored = baseline["cases"]
+            results = {name: seconds * baseline["calibration"] / calibrated for name, seconds in results.items()}
+            calibrated = baseline["calibration"]
+        stored.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"calibration": calibrated, "python": platform.python_version(), "machine": platform.machine(),
+                       "cases": dict(sorted(stored.items()))}, f, indent=2)
+            f.write("\n")
+        print(report(compare(results, {}), args.threshold))
+        print("baseline written to {}".format(args.baseline))
+        return 0
+    scale = calibrated / baseline["calibration"] if baseline and args.calibrate else 1.0
+    compared = compare(results, baseline, args.threshold, scale)
+    print(report(compared, args.threshold))
+    return 1 if any(result.regression for result in compared) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,58 +4,103 @@ This file represents classes for building bike objects (later hopefully probably
 Currently I am using pseudo-builder (not builder pattern), I am not sure how to do it properly at this moment.
 Hopefully it will be fixed later if I find time
 """
+import time
+import typing
+from dataclasses import fields
 
-from bike_data import *
+from bike_data import Bike, BikeComponents, BikeSetup, Wheel, Wheels
+from metrics import BUILD_SECONDS
+
+# fields which are filled with empty instance of their class when not set
+INITIALIZED_FIELDS = {
+    Bike: ("total_usage", "geometry", "components", "setup"),
+    BikeComponents: tuple(_field.name for _field in fields(BikeComponents)),
+    Wheels: ("front_wheel", "rear_wheel"),
+    Wheel: ("rim", "hub", "tyre"),
+    BikeSetup: ("fork", "shock"),
+}
+
+_plans = {}
+_factories = {}
+
+
+def init_plan(cls) -> tuple:
+    """Returns cached (field name, class) pairs which are initialized on instances of cls"""
+    try:
+        return _plans[cls]
+    except KeyError:
+        pass
+    names = next((INITIALIZED_FIELDS[base] for base in cls.__mro__ if base in INITIALIZED_FIELDS), ())
+    hints = typing.get_type_hints(cls) if names else {}
+    _plans[cls] = tuple((name, hints[name]) for name in names)
+    return _plans[cls]
+
+
+def skeleton_factory(cls):
+    """Returns cached function creating instance of cls with whole initialized sub-tree"""
+    try:
+        return _factories[cls]
+    except KeyError:
+        pass
+    plan = tuple((name, skeleton_factory(_class)) for name, _class in init_plan(cls))
+    if not plan:
+        factory = cls
+    else:
+        def factory():
+            instance = cls()
+            for name, sub_factory in plan:
+                setattr(instance, name, sub_factory())
+            return instance
+    _factories[cls] = factory
+    return factory
+
+
+def fill(instance, recursive=True):
+    """Initializes every unset field of instance listed in its plan, returns instance"""
+    for name, _class in init_plan(type(instance)):
+        value = getattr(instance, name)
+        if value is None:
+            setattr(instance, name, skeleton_factory(_class)())
+        elif recursive:
+            fill(value)
+    return instance
 
 
 class BikeBuilder:
     def __init__(self, bike=None):
+        start = time.perf_counter()
         self.bike = bike
         if not bike:
-            self.bike = Bike()
-        self.init_bike()
-        self.init_components()
-        self.init_setup()
+            self.bike = skeleton_factory(Bike)()
+            BUILD_SECONDS.observe(time.perf_counter() - start, "new")
+        else:
+            fill(self.bike)
+            BUILD_SECONDS.observe(time.perf_counter() - start, "fill")
+
+    @staticmethod
+    def build_many(bikes) -> list:
+        """Returns list of initialized bikes, bikes is either number of new bikes or iterable of existing ones"""
+        with BUILD_SECONDS.time("build_many"):
+            if isinstance(bikes, int):
+                factory = skeleton_factory(Bike)
+                return [factory() for _ in range(bikes)]
+            return [fill(bike) for bike in bikes]
 
     def init_bike(self):
-        if not self.bike.total_usage:
-            self.bike.total_usage = Usage()
-        if not self.bike.geometry:
-            self.bike.geometry = Geometry()
-        if not self.bike.components:
-            self.bike.components = BikeComponents()
-        if not self.bike.setup:
-            self.bike.setup = BikeSetup()
+        fill(self.bike, recursive=False)
 
     def init_components(self):
-        for attr, _class in self.bike.components.__annotations__.items():
-            if getattr(self.bike.components, attr) is not _class:
-                self.bike.components.__setattr__(attr, _class)
-        self.init_wheels()
+        fill(self.bike.components)
 
     def init_setup(self):
-        if not self.bike.setup.fork:
-            self.bike.setup.fork = SuspensionSetup()
-        if not self.bike.setup.shock:
-            self.bike.setup.shock = SuspensionSetup()
+        fill(self.bike.setup)
 
     def init_wheels(self):
-        if not self.bike.components.wheels.front_wheel:
-            self.bike.components.wheels.front_wheel = Wheel()
-        self.bike.components.wheels.front_wheel = self.init_wheel(self.bike.components.wheels.front_wheel)
-        if not self.bike.components.wheels.rear_wheel:
-            self.bike.components.wheels.rear_wheel = Wheel()
-        self.bike.components.wheels.rear_wheel = self.init_wheel(self.bike.components.wheels.rear_wheel)
+        fill(self.bike.components.wheels)
 
     @staticmethod
     def init_wheel(wheel):
-        if not wheel.rim:
-            wheel.rim = Rim()
-        if not wheel.hub:
-            wheel.hub = Hub()
-        if not wheel.tyre:
-            wheel.tyre = Tyre()
-        return wheel
+        return fill(wheel)
 
     def get_bike(self):
         return self.bike
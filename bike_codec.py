@@ -0,0 +1,284 @@
+"""
+Conversion of Bike objects to and from the layout described in bike_data_format.json
+* encoder and decoder of each dataclass is generated as python source once and cached
+* enums are stored by value, adjustable (set) values as sorted lists, dates in ISO format
+* keys are renamed to the ones used in bike_data_format.json, dotted names are nested ("rebound.fast")
+* whole garage can be exported to / imported from JSON Lines file one bike at a time
+"""
+import dataclasses
+import datetime
+import json
+import sys
+import time
+import typing
+from enum import Enum
+
+import bike_data
+from bike_data import (Bike, BikeSetup, BreakDisc, Cassette, Chainrings, Frame, Geometry,
+                       SuspensionSetup, Wheels)
+
+KEYS = {
+    Bike: {"users_name": "name"},
+    Geometry: {
+        "top_tube_length": "top_tube",
+        "head_tube_angle": "headtube_angle",
+        "head_tube_length": "headtube",
+        "seat_tube_angle": "seattube_angle",
+        "seat_tube_length": "seattube",
+        "bottom_bracket_height": "bb_height",
+        "bottom_bracket_drop": "bb_drop",
+        "chainstay_length": "chainstay",
+        "standover": "standover_height",
+    },
+    Frame: {"model_year": "year"},
+    BreakDisc: {"_diameter": "diameter"},
+    Wheels: {"_size": "size", "front_wheel": "front", "rear_wheel": "rear"},
+    Chainrings: {"tooth_numbers": "tooth_number"},
+    Cassette: {"tooth_range": "range"},
+    SuspensionSetup: {
+        "fast_compression": "compression.fast",
+        "low_compression": "compression.low",
+        "fast_rebound": "rebound.fast",
+        "low_rebound": "rebound.low",
+    },
+    BikeSetup: {"front_tyre": "tyre_pressure.front", "rear_tyre": "tyre_pressure.rear"},
+}
+TYPE_KEY = "type"
+
+CLASSES = {name: cls for name, cls in vars(bike_data).items()
+           if isinstance(cls, type) and dataclasses.is_dataclass(cls) and not issubclass(cls, Enum)}
+
+_encoders = {}
+_decoders = {}
+
+
+def _encode_set(value):
+    return sorted(value) if isinstance(value, (set, frozenset)) else value
+
+
+def _decode_set(value):
+    return set(value) if isinstance(value, list) else value
+
+
+def _encode_date(value):
+    return value.isoformat() if isinstance(value, (datetime.date, datetime.time)) else value
+
+
+def _decode_date(value):
+    if not isinstance(value, str) or not value:
+        return value
+    if ":" in value and "-" not in value:
+        return datetime.time.fromisoformat(value)
+    return datetime.datetime.fromisoformat(value)
+
+
+def _encode_nested(value, declared):
+    if value is None or isinstance(value, type):
+        return None
+    cls = type(value)
+    encoded = encoder(cls)(value)
+    if cls is not declared:
+        encoded[TYPE_KEY] = cls.__name__
+    return encoded
+
+
+def _decode_nested(data, declared):
+    if data is None:
+        return None
+    return decoder(CLASSES.get(data.get(TYPE_KEY), declared))(data)
+
+
+def _field_kind(hint):
+    """Returns kind of conversion needed for field with given type hint"""
+    if isinstance(hint, type):
+        if issubclass(hint, Enum):
+            return "enum"
+        if dataclasses.is_dataclass(hint):
+            return "nested"
+        if hint in (datetime.time, datetime.date, datetime.datetime):
+            return "date"
+        if hint is list:
+            return "list"
+    elif set in typing.get_args(hint):
+        return "set"
+    return "plain"
+
+
+def _plan(cls):
+    hints = typing.get_type_hints(cls)
+    keys = KEYS.get(cls, {})
+    return [(_field.name, keys.get(_field.name, _field.name), hints[_field.name], _field_kind(hints[_field.name]))
+            for _field in dataclasses.fields(cls)]
+
+
+def _nested_literal(entries):
+    """Builds source of dict literal from (dotted key, expression) pairs"""
+    groups = {}
+    for key, expression in entries:
+        head, _, rest = key.partition(".")
+        groups.setdefault(head, []).append((rest, expression) if rest else expression)
+    items = []
+    for head, values in groups.items():
+        if isinstance(values[0], tuple):
+            items.append("{!r}: {}".format(head, _nested_literal(values)))
+        else:
+            items.append("{!r}: {}".format(head, values[0]))
+    return "{" + ", ".join(items) + "}"
+
+
+def _compile(name, source, namespace):
+    exec(compile(source, "<bike_codec {}>".format(name), "exec"), namespace)
+    return namespace[name]
+
+
+def encoder(cls, keys=None):
+    """
+    Returns cached function turning instance of dataclass cls into JSON compatible dict, with keys (top level
+    keys of the layout) only these parts are encoded and other attributes are not even read
+    """
+    cache_key = cls if keys is None else (cls, frozenset(keys))
+    try:
+        return _encoders[cache_key]
+    except KeyError:
+        pass
+    namespace = {"_encode_nested": _encode_nested, "_encode_set": _encode_set, "_encode_date": _encode_date}
+    entries = []
+    for index, (attribute, key, hint, kind) in enumerate(_plan(cls)):
+        if keys is not None and key.partition(".")[0] not in keys:
+            continue
+        value = "obj.{}".format(attribute)
+        if kind == "enum":
+            expression = "(None if (v := {}) is None else v.value)".format(value)
+        elif kind == "nested":
+            namespace["_t{}".format(index)] = hint
+            expression = "_encode_nested({}, _t{})".format(value, index)
+        elif kind == "set":
+            expression = "_encode_set({})".format(value)
+        elif kind == "date":
+            expression = "_encode_date({})".format(value)
+        elif kind == "list":
+            expression = "(None if (v := {}) is None else list(v))".format(value)
+        else:
+            expression = value
+        entries.append((key, expression))
+    name = "encode_{}".format(cls.__name__)
+    source = "def {}(obj):\n    return {}\n".format(name, _nested_literal(entries))
+    _encoders[cache_key] = _compile(name, source, namespace)
+    return _encoders[cache_key]
+
+
+def decoder(cls):
+    """Returns cached function building instance of dataclass cls from dict made by encoder(cls)"""
+    try:
+        return _decoders[cls]
+    except KeyError:
+        pass
+    namespace = {"_cls": cls, "_decode_nested": _decode_nested, "_decode_set": _decode_set,
+                 "_decode_date": _decode_date}
+    arguments = []
+    for index, (attribute, key, hint, kind) in enumerate(_plan(cls)):
+        *parents, leaf = key.split(".")
+        value = "data"
+        for parent in parents:
+            value = "{}.get({!r}, _empty)".format(value, parent)
+        value = "{}.get({!r})".format(value, leaf)
+        if kind == "enum":
+            namespace["_t{}".format(index)] = hint
+            expression = "(None if (v := {}) is None else _t{}(v))".format(value, index)
+        elif kind == "nested":
+            namespace["_t{}".format(index)] = hint
+            expression = "_decode_nested({}, _t{})".format(value, index)
+        elif kind == "set":
+            expression = "_decode_set({})".format(value)
+        elif kind == "date":
+            expression = "_decode_date({})".format(value)
+        else:
+            expression = value
+        arguments.append("{}={}".format(attribute, expression))
+    namespace["_empty"] = {}
+    name = "decode_{}".format(cls.__name__)
+    source = "def {}(data):\n    return _cls({})\n".format(name, ", ".join(arguments))
+    _decoders[cls] = _compile(name, source, namespace)
+    return _decoders[cls]
+
+
+def encode_part(value, cls) -> dict:
+    """Encodes part of bike declared as dataclass cls (e.g. Geometry), class of value is kept when it is subclass"""
+    return _encode_nested(value, cls)
+
+
+def decode_part(data: dict, cls):
+    return _decode_nested(data, cls)
+
+
+def to_dict(bike: Bike, keys=None) -> dict:
+    """Encodes bike, only given top level keys of the layout (e.g. ["name", "geometry"]) when keys are set"""
+    return encoder(Bike, keys)(bike)
+
+
+def from_dict(data: dict) -> Bike:
+    return decoder(Bike)(data)
+
+
+def dumps(bike: Bike) -> str:
+    return json.dumps(to_dict(bike), separators=(",", ":"))
+
+
+def loads(text: str) -> Bike:
+    return from_dict(json.loads(text))
+
+
+def dump_jsonl(bikes, fp) -> int:
+    """Writes every bike as single line of JSON, returns number of written bikes"""
+    count = 0
+    for bike in bikes:
+        fp.write(dumps(bike))
+        fp.write("\n")
+        count += 1
+    return count
+
+
+def load_jsonl(fp):
+    """Yields bikes read one line at a time from JSON Lines file"""
+    for line in fp:
+        if line.strip():
+            yield loads(line)
+
+
+def export_garage(store, path) -> tuple:
+    """Streams all bikes of BikeStore into JSON Lines file, returns (bike count, seconds)"""
+    start = time.perf_counter()
+    with open(path, "w", encoding="utf-8") as fp:
+        count = dump_jsonl(store.scan(), fp)
+    return count, time.perf_counter() - start
+
+
+def import_garage(store, path) -> tuple:
+    """Streams bikes from JSON Lines file into BikeStore using batched writes, returns (bike count, seconds)"""
+    start = time.perf_counter()
+    count = 0
+    with open(path, encoding="utf-8") as fp, store.batch():
+        for bike in load_jsonl(fp):
+            store.put(bike)
+            count += 1
+    return count, time.perf_counter() - start
+
+
+def main(argv):
+    from bike_store import BikeStore
+
+    if len(argv) != 4 or argv[1] not in ("export", "import"):
+        print("usage: python bike_codec.py export|import <database> <file.jsonl>")
+        return 2
+    store = BikeStore(argv[2])
+    if argv[1] == "export":
+        count, seconds = export_garage(store, argv[3])
+    else:
+        count, seconds = import_garage(store, argv[3])
+    store.close()
+    print("{}ed {} bikes in {:.2f} s ({:.0f} bikes/s)".format(argv[1], count, seconds, count / (seconds or 1e-9)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
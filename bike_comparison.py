@@ -0,0 +1,165 @@
+"""
+Bike comparison
+* field by field differences of two bikes
+* similarity index - every bike is turned into normalized feature vector (geometry and key component specs)
+  and nearest neighbours are found by one matrix operation over whole catalog
+"""
+import dataclasses
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+from bike_data import Bike, BottomBracketStandard, HeadsetStandard, SuspensionType, WheelSize
+
+FieldDifference = namedtuple("FieldDifference", "path first second")
+SimilarBike = namedtuple("SimilarBike", "bike_id distance")
+
+WHEEL_SIZES = {
+    WheelSize.SIXTEEN: -3, WheelSize.TWENTY: -2, WheelSize.TWENTY_FOUR: -1, WheelSize.TWENTY_SIX: 0,
+    WheelSize.TWENTY_SEVEN: 1, WheelSize.MULLET: 1.5, WheelSize.TWENTY_NINE_MULLET: 1.5, WheelSize.TWENTY_NINE: 2,
+}
+
+
+def _get(bike, path):
+    value = bike
+    for name in path.split("."):
+        value = getattr(value, name, None)
+        if value is None or isinstance(value, type):
+            return None
+    if isinstance(value, (set, frozenset)):
+        return sum(value) / len(value) if value else None
+    return value
+
+
+def _wheel_size(bike):
+    return WHEEL_SIZES.get(_get(bike, "components.wheels._size"))
+
+
+# (feature name, getter, typical value, typical spread) - missing value counts as typical one
+FEATURES = [
+    ("reach", lambda bike: _get(bike, "geometry.reach"), 460, 25),
+    ("stack", lambda bike: _get(bike, "geometry.stack"), 625, 20),
+    ("head tube angle", lambda bike: _get(bike, "geometry.head_tube_angle"), 65, 1),
+    ("seat tube angle", lambda bike: _get(bike, "geometry.seat_tube_angle"), 76.5, 1),
+    ("chainstay", lambda bike: _get(bike, "geometry.chainstay_length"), 435, 10),
+    ("wheelbase", lambda bike: _get(bike, "geometry.wheelbase"), 1230, 30),
+    ("bb drop", lambda bike: _get(bike, "geometry.bottom_bracket_drop"), 25, 10),
+    ("frame travel", lambda bike: _get(bike, "components.frame.travel"), 140, 20),
+    ("fork travel", lambda bike: _get(bike, "components.fork.travel"), 150, 20),
+    ("fork offset", lambda bike: _get(bike, "components.fork.offset"), 44, 7),
+    ("shock length", lambda bike: _get(bike, "components.shock.length"), 210, 15),
+    ("wheel size", _wheel_size, 1, 1),
+    ("coil shock", lambda bike: _get(bike, "components.shock.suspension_type") == SuspensionType.SPRING, 0, 1),
+] + [
+    ("bb " + standard.value, lambda bike, standard=standard:
+        _get(bike, "components.bottom_bracket.standard") == standard, 0, 1)
+    for standard in BottomBracketStandard
+] + [
+    ("headset " + standard.value, lambda bike, standard=standard:
+        _get(bike, "components.headset.standard") == standard, 0, 1)
+    for standard in HeadsetStandard
+]
+
+_centers = np.array([center for _, _, center, _ in FEATURES], dtype=float)
+_scales = np.array([scale for _, _, _, scale in FEATURES], dtype=float)
+
+
+def feature_vector(bike: Bike) -> np.ndarray:
+    values = np.array([np.nan if (value := getter(bike)) is None else float(value) for _, getter, _, _ in FEATURES])
+    vector = (values - _centers) / _scales
+    vector[np.isnan(vector)] = 0
+    return vector
+
+
+def _leaves(value, prefix=""):
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        for _field in dataclasses.fields(value):
+            yield from _leaves(getattr(value, _field.name), prefix + _field.name + ".")
+    else:
+        yield prefix[:-1], value
+
+
+def compare(first: Bike, second: Bike) -> list:
+    """Returns FieldDifference for every value which differs between bikes"""
+    first_values = dict(_leaves(first))
+    second_values = dict(_leaves(second))
+    return [FieldDifference(path, first_values.get(path), second_values.get(path))
+            for path in dict.fromkeys(list(first_values) + list(second_values))
+            if first_values.get(path) != second_values.get(path)]
+
+
+class SimilarityIndex:
+    """
+    Bikes are rows of one float32 matrix, query is single matrix-vector product (|a - b|^2 = |a|^2 - 2ab + |b|^2)
+    followed by partial sort. Removed bikes only get infinite norm, so their rows are never returned, and their
+    rows are given to the next added bikes, so matrix does not grow under churn of adds and removes.
+    """
+
+    def __init__(self, capacity=1024):
+        self._vectors = np.zeros((capacity, len(FEATURES)), dtype=np.float32)
+        self._norms = np.zeros(capacity, dtype=np.float32)
+        self._ids = []
+        self._rows = {}
+        self._free = []  # rows of removed bikes
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, bike_id):
+        return bike_id in self._rows
+
+    def add(self, bike_id, bike: Bike):
+        """Adds bike to index, bike already in index is replaced"""
+        self.add_many([(bike_id, bike)])
+
+    def add_many(self, bikes):
+        """bikes are (bike id, bike) pairs"""
+        bikes = list(bikes)
+        vectors = np.array([feature_vector(bike) for _, bike in bikes]).reshape(len(bikes), len(FEATURES))
+        with self._lock:
+            rows = []
+            for bike_id, _ in bikes:
+                row = self._rows.get(bike_id)
+                if row is None and self._free:
+                    row = self._rows[bike_id] = self._free.pop()
+                    self._ids[row] = bike_id
+                elif row is None:
+                    row = self._rows[bike_id] = len(self._ids)
+                    self._ids.append(bike_id)
+                rows.append(row)
+            if len(self._ids) > len(self._vectors):
+                grow = max(len(self._ids), 2 * len(self._vectors)) - len(self._vectors)
+                self._vectors = np.concatenate([self._vectors, np.zeros((grow, len(FEATURES)), dtype=np.float32)])
+                self._norms = np.concatenate([self._norms, np.zeros(grow, dtype=np.float32)])
+            self._vectors[rows] = vectors
+            self._norms[rows] = (vectors ** 2).sum(axis=1)
+
+    def remove(self, bike_id):
+        with self._lock:
+            row = self._rows.pop(bike_id, None)
+            if row is not None:
+                self._norms[row] = np.inf
+                self._free.append(row)
+
+    def most_similar(self, bike, k=10) -> list:
+        """Returns k nearest bikes to given bike (or id of indexed bike), the bike itself is left out"""
+        with self._lock:
+            if isinstance(bike, Bike):
+                query, exclude = feature_vector(bike).astype(np.float32), None
+            else:
+                exclude = self._rows[bike]
+                query = self._vectors[exclude].copy()
+            size = len(self._ids)
+            distances = self._norms[:size] - 2 * (self._vectors[:size] @ query)
+            if exclude is not None:
+                distances[exclude] = np.inf
+            k = min(k, len(self._rows) - (exclude is not None))
+            if k <= 0:
+                return []
+            nearest = np.argpartition(distances, k - 1)[:k]
+            nearest = nearest[np.argsort(distances[nearest], kind="stable")]
+            query_norm = float(query @ query)
+            return [SimilarBike(self._ids[row], float(np.sqrt(max(distances[row] + query_norm, 0))))
+                    for row in nearest]
@@ -32,14 +32,14 @@ class ISCGStandard(Enum):
     ISCG05 = "ISCG05"
 
 
-@dataclass
+@dataclass(slots=True)
 class Usage:
     hours: datetime.time = field(default=0)
     distance: float = field(default=0)
     races: int = field(default=0)
 
 
-@dataclass
+@dataclass(slots=True)
 class Geometry:
     top_tube_length: int = field(default=None)
     head_tube_angle: Union[int, set] = field(default=None)
@@ -55,14 +55,14 @@ class Geometry:
     stack: int = field(default=None)
 
 
-@dataclass
+@dataclass(slots=True)
 class Component:
     brand: str = field(default=None)
     model: str = field(default=None)
     usage: Usage = field(default=None)
 
 
-@dataclass
+@dataclass(slots=True)
 class Frame(Component):
     model_year: int = field(default=None)
     size: str = field(default=None)
@@ -72,81 +72,80 @@ class Frame(Component):
     iscg_tabs: ISCGStandard = field(default=None)
 
 
-@dataclass
+@dataclass(slots=True)
 class Shock(Component):
     length: int = field(default=None)
     suspension_type: SuspensionType = field(default=None)
 
 
-@dataclass
+@dataclass(slots=True)
 class Fork(Component):
     travel: int = field(default=None)
     dropout: int = field(default=None)
     offset: int = field(default=None)
 
 
-@dataclass
+@dataclass(slots=True)
 class Handlebars(Component):
     width: int = field(default=None)
     diameter: int = field(default=None)
 
 
-@dataclass
+@dataclass(slots=True)
 class Stem(Component):
     length: int = field(default=None)
     rise: int = field(default=None)
     diameter: int = field(default=None)
 
 
-@dataclass
+@dataclass(slots=True)
 class Headset(Component):
     standard: HeadsetStandard = field(default=None)
 
 
-@dataclass
+@dataclass(slots=True)
 class Grips(Component):
     pass
 
 
-@dataclass
+@dataclass(slots=True)
 class BreakDisc(Component):
     centerlock: bool = field(default=None)
     _diameter: int = field(default=None)
 
     @property
     def diameter(self):
-        return self.diameter
+        return self._diameter
 
     @diameter.setter
     def diameter(self, value):
         if value in [140, 160, 180, 200, 203, 220]:
-            self.diameter = value
+            self._diameter = value
         else:
             raise ValueError
 
 
-@dataclass
+@dataclass(slots=True)
 class Pads(Component):
     compound: str = field(default=None)
 
 
-@dataclass
+@dataclass(slots=True)
 class Break(Component):
     pass
 
 
-@dataclass
+@dataclass(slots=True)
 class VBreak(Break):
     pass
 
 
-@dataclass
+@dataclass(slots=True)
 class DiscBreak(Break):
     disc: BreakDisc = field(default=None)
     pads: Pads = field(default=None)
 
 
-@dataclass
 class WheelSize(Enum):
     SIXTEEN = "16\""
     TWENTY = "20\""
@@ -158,19 +157,19 @@ class WheelSize(Enum):
     TWENTY_NINE_MULLET = "29\"/mullet"
 
 
-@dataclass
+@dataclass(slots=True)
 class Rim(Component):
     spoke_count: int = field(default=None)
     size: WheelSize = field(default=None)
 
 
-@dataclass
+@dataclass(slots=True)
 class Hub(Component):
     holes_count: int = field(default=None)
     boost: bool = field(default=None)
 
 
-@dataclass
+@dataclass(slots=True)
 class Tyre(Component):
     width: float = field(default=None)
     casing: str = field(default=None)
@@ -178,7 +177,7 @@ class Tyre(Component):
     size: WheelSize = field(default=None)
 
 
-@dataclass
+@dataclass(slots=True)
 class Wheel(Component):
     rim: Rim = field(default=None)
     hub: Hub = field(default=None)
@@ -186,7 +185,7 @@ class Wheel(Component):
     size: WheelSize = field(default=None)
 
 
-@dataclass
+@dataclass(slots=True)
 class Wheels(Component):
     _size: WheelSize = field(default=None)
     front_wheel: Wheel = field(default=None)
@@ -210,63 +209,63 @@ class Wheels(Component):
             self.rear_wheel.size = value
 
 
-@dataclass
+@dataclass(slots=True)
 class BottomBracket(Component):
     standard: BottomBracketStandard = field(default=None)
 
 
-@dataclass
+@dataclass(slots=True)
 class Cranks(Component):
     length: int = field(default=None)
     boost: bool = field(default=None)
 
 
-@dataclass
+@dataclass(slots=True)
 class Pedals(Component):
     pass
 
 
-@dataclass
+@dataclass(slots=True)
 class Chainguide(Component):
     mounting: str = field(default=None)
 
 
-@dataclass
+@dataclass(slots=True)
 class Chainrings(Component):
     number_of_chainrings: int = field(default=None)
     tooth_numbers: list = field(default=None)
     offset: int = field(default=None)
 
 
-@dataclass
+@dataclass(slots=True)
 class Cassette(Component):
     speeds: int = field(default=None)
     tooth_range: str = field(default=None)  # might be divided into low and high with int values
 
 
-@dataclass
+@dataclass(slots=True)
 class Derailleur(Component):
     speeds: int = field(default=None)
 
 
-@dataclass
+@dataclass(slots=True)
 class Chain(Component):
     speeds_compatibility: int = field(default=None)
 
 
-@dataclass
+@dataclass(slots=True)
 class Saddle(Component):
     pass
 
 
-@dataclass
+@dataclass(slots=True)
 class Seatpost(Component):
     telescopic: bool = field(default=None)
     diameter: float = field(default=None)
     travel: int = field(default=None)
 
 
-@dataclass
+@dataclass(slots=True)
 class BikeComponents:
     frame: Frame = field(default=None)
     shock: Shock = field(default=None)
@@ -295,12 +294,13 @@ class PressureUnits(Enum):
     BAR = "bar"
 
 
+@dataclass(slots=True)
 class Pressure:
     value: int = field(default=None)
     units: PressureUnits = field(default=None)
 
 
-@dataclass
+@dataclass(slots=True)
 class SuspensionSetup:
     pressure: Pressure = field(default=None)
     fast_compression: int = field(default=None)
@@ -309,7 +309,7 @@ class SuspensionSetup:
     low_rebound: int = field(default=None)
 
 
-@dataclass
+@dataclass(slots=True)
 class BikeSetup:
     front_tyre: Pressure = field(default=None)
     rear_tyre: Pressure = field(default=None)
@@ -335,3 +335,4 @@ class Bike:
     components: BikeComponents = field(default=None)
     setup: BikeSetup = field(default=None)
     weight: int = field(default=None)  # TODO: find weight module
+    path_to_gallery: str = field(default=None)  # folder with photos of bike, see photo_gallery
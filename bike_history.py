@@ -0,0 +1,239 @@
+"""
+History of setup and components of bikes backed by SQLite
+* every change of BikeSetup / SuspensionSetup value and every component swap is appended as event,
+  events are never rewritten (history of bike can only grow forward in time)
+* snapshot of whole setup and components is stored every snapshot_every events of bike
+* state at given time is the last snapshot before it (found by index, O(log n)) plus replay of few events after
+* compaction drops events and snapshots older than given time, history before it is then not available
+"""
+import datetime
+import pickle
+import sqlite3
+import threading
+from collections import namedtuple
+from dataclasses import fields, is_dataclass
+
+from bike_data import Bike, Component
+
+HistoryEvent = namedtuple("HistoryEvent", "event_id time path value")
+BikeState = namedtuple("BikeState", "time setup components")
+
+TRACKED = ("setup", "components")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS history_events (
+    id INTEGER PRIMARY KEY,
+    bike_id INTEGER NOT NULL,
+    time TEXT NOT NULL,
+    path TEXT NOT NULL,
+    value BLOB
+);
+CREATE INDEX IF NOT EXISTS history_events_bike_time ON history_events (bike_id, time);
+CREATE TABLE IF NOT EXISTS history_snapshots (
+    id INTEGER PRIMARY KEY,
+    bike_id INTEGER NOT NULL,
+    time TEXT NOT NULL,
+    event_id INTEGER NOT NULL,
+    setup BLOB,
+    components BLOB
+);
+CREATE INDEX IF NOT EXISTS history_snapshots_bike_time ON history_snapshots (bike_id, time);
+"""
+
+
+def _dump(value):
+    return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _copy(value):
+    return pickle.loads(_dump(value))
+
+
+def _time(value: datetime.datetime) -> str:
+    # fixed width, so stored times are ordered as strings
+    return value.isoformat(timespec="microseconds")
+
+
+_fields = {}
+
+
+def _field_names(kind):
+    """Names of fields of dataclass type (cached), None for other types"""
+    try:
+        return _fields[kind]
+    except KeyError:
+        names = None
+        if is_dataclass(kind):
+            names = tuple(_field.name for _field in fields(kind))
+        _fields[kind] = names
+        return names
+
+
+def _diff(old, new, path, changes):
+    if old is new:
+        return
+    kind = type(new)
+    names = _field_names(kind)
+    if names is None or type(old) is not kind:
+        if old != new:
+            changes.append((path, new))
+        return
+    if isinstance(new, Component) and (old.brand != new.brand or old.model != new.model):
+        changes.append((path, new))
+        return
+    for name in names:
+        _diff(getattr(old, name), getattr(new, name), path + "." + name, changes)
+
+
+def diff(old, new, path="") -> list:
+    """
+    Returns (path, value) of changes between two trees of dataclasses. Component with different brand, model or
+    type is swap and is returned whole, values of other objects are compared one by one.
+    """
+    changes = []
+    _diff(old, new, path, changes)
+    return changes
+
+
+def _apply(state: dict, path: str, value):
+    names = path.split(".")
+    if len(names) == 1:
+        state[path] = value
+        return
+    target = state[names[0]]
+    for name in names[1:-1]:
+        target = getattr(target, name)
+    setattr(target, names[-1], value)
+
+
+class BikeHistory:
+    def __init__(self, path="bike_garage.db", snapshot_every=50):
+        self.path = path
+        self.snapshot_every = snapshot_every
+        self._lock = threading.RLock()
+        self._latest = {}  # bike id -> (time, state dict, events since snapshot)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        if path != ":memory:":
+            self._connection.execute("PRAGMA journal_mode = WAL")
+            self._connection.execute("PRAGMA synchronous = NORMAL")
+        self._connection.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._connection.execute(sql, params).fetchall()
+
+    def _latest_state(self, bike_id):
+        latest = self._latest.get(bike_id)
+        if latest is None:
+            rows = self._query("SELECT MAX(time) FROM (SELECT time FROM history_snapshots WHERE bike_id = ? "
+                               "UNION ALL SELECT time FROM history_events WHERE bike_id = ?)", (bike_id, bike_id))
+            if rows[0][0] is None:
+                return None
+            time = datetime.datetime.fromisoformat(rows[0][0])
+            state, replayed = self._state(bike_id, time)
+            latest = self._latest[bike_id] = (time, state, replayed)
+        return latest
+
+    def record(self, bike_id: int, bike: Bike, time=None) -> int:
+        """Appends changes of setup and components of bike since its last record, returns number of events"""
+        time = time or datetime.datetime.now()
+        new_state = {name: _copy(getattr(bike, name)) for name in TRACKED}
+        with self._lock, self._connection:
+            latest = self._latest_state(bike_id)
+            if latest is None:
+                self._snapshot(bike_id, time, 0, new_state)
+                self._latest[bike_id] = (time, new_state, 0)
+                return 0
+            last_time, state, since_snapshot = latest
+            if time < last_time:
+                raise ValueError("history of bike {} is append-only, {} is before {}".format(bike_id, time,
+                                                                                             last_time))
+            changes = [(bike_id, _time(time), path[1:], _dump(value))
+                       for name in TRACKED for path, value in diff(state[name], new_state[name], "." + name)]
+            if not changes:
+                return 0
+            self._connection.executemany("INSERT INTO history_events (bike_id, time, path, value) "
+                                         "VALUES (?, ?, ?, ?)", changes)
+            since_snapshot += len(changes)
+            if since_snapshot >= self.snapshot_every:
+                (event_id,) = self._connection.execute("SELECT MAX(id) FROM history_events").fetchone()
+                self._snapshot(bike_id, time, event_id, new_state)
+                since_snapshot = 0
+            self._latest[bike_id] = (time, new_state, since_snapshot)
+            return len(changes)
+
+    def _snapshot(self, bike_id, time, event_id, state):
+        self._connection.execute("INSERT INTO history_snapshots (bike_id, time, event_id, setup, components) "
+                                 "VALUES (?, ?, ?, ?, ?)",
+                                 (bike_id, _time(time), event_id, _dump(state["setup"]), _dump(state["components"])))
+
+    def _state(self, bike_id, time):
+        """Returns (state dict, number of replayed events) of bike at time, (None, 0) before its history"""
+        rows = self._query("SELECT event_id, setup, components FROM history_snapshots "
+                           "WHERE bike_id = ? AND time <= ? ORDER BY time DESC, id DESC LIMIT 1",
+                           (bike_id, _time(time)))
+        if not rows:
+            return None, 0
+        event_id, setup, components = rows[0]
+        state = {"setup": pickle.loads(setup), "components": pickle.loads(components)}
+        events = self._query("SELECT path, value FROM history_events WHERE bike_id = ? AND time <= ? AND id > ? "
+                             "ORDER BY id", (bike_id, _time(time), event_id))
+        for path, value in events:
+            _apply(state, path, pickle.loads(value))
+        return state, len(events)
+
+    def state_at(self, bike_id: int, time: datetime.datetime):
+        """Returns BikeState of bike at given time, None when time is before its (compacted) history"""
+        state, _ = self._state(bike_id, time)
+        if state is None:
+            return None
+        return BikeState(time, state["setup"], state["components"])
+
+    def events(self, bike_id: int, since=None, until=None) -> list:
+        """Returns HistoryEvent of bike ordered by time, since is exclusive and until inclusive"""
+        sql = "SELECT id, time, path, value FROM history_events WHERE bike_id = ?"
+        params = [bike_id]
+        if since is not None:
+            sql += " AND time > ?"
+            params.append(_time(since))
+        if until is not None:
+            sql += " AND time <= ?"
+            params.append(_time(until))
+        return [HistoryEvent(event_id, datetime.datetime.fromisoformat(time), path, pickle.loads(value))
+                for event_id, time, path, value in self._query(sql + " ORDER BY id", params)]
+
+    def swaps(self, bike_id: int, since=None, until=None) -> list:
+        """Returns events in which component was mounted, replaced or removed"""
+        return [event for event in self.events(bike_id, since, until)
+                if event.path.startswith("components.")
+                and (event.value is None or isinstance(event.value, Component))]
+
+    def compact(self, before: datetime.datetime, bike_id=None) -> int:
+        """
+        Keeps for every bike only the last snapshot at or before given time and what follows it, older events
+        and snapshots are deleted. Returns number of deleted rows.
+        """
+        deleted = 0
+        with self._lock, self._connection:
+            if bike_id is None:
+                bike_ids = [row[0] for row in self._connection.execute(
+                    "SELECT DISTINCT bike_id FROM history_snapshots")]
+            else:
+                bike_ids = [bike_id]
+            for _bike_id in bike_ids:
+                base = self._connection.execute(
+                    "SELECT id, time, event_id FROM history_snapshots WHERE bike_id = ? AND time <= ? "
+                    "ORDER BY time DESC, id DESC LIMIT 1", (_bike_id, _time(before))).fetchone()
+                if base is None:
+                    continue
+                snapshot_id, time, event_id = base
+                deleted += self._connection.execute("DELETE FROM history_events WHERE bike_id = ? AND id <= ?",
+                                                    (_bike_id, event_id)).rowcount
+                deleted += self._connection.execute(
+                    "DELETE FROM history_snapshots WHERE bike_id = ? AND id != ? AND time <= ?",
+                    (_bike_id, snapshot_id, time)).rowcount
+        return deleted
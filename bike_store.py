@@ -0,0 +1,356 @@
+"""
+Persistent storage of bikes backed by SQLite
+* whole Bike trees are stored, sub-trees (usage, geometry, components, setup) in separate columns as JSON of
+  bike_codec, so stored bikes do not depend on layout of classes of bike_data
+* brand, model, model year and component brand/model are indexed
+* sub-trees are loaded lazily on first access
+* writes can be batched into a single transaction
+* ids come from counter of whole store, id of deleted bike is not given to another one
+* every write gives bike new version (from counter of whole store too), caches of pages are keyed by it
+* listeners (e.g. search index) are called with (bike id, bike) after every committed write, with None for deleted
+  bike
+"""
+import datetime
+import json
+import logging
+import sqlite3
+import threading
+import typing
+from contextlib import contextmanager
+from dataclasses import fields
+
+from bike_codec import decode_part, encode_part
+from bike_data import Bike, BikeComponents, Component
+
+log = logging.getLogger("bike_garage.store")
+
+SUBTREES = ("total_usage", "geometry", "components", "setup")
+SUBTREE_TYPES = {name: typing.get_type_hints(Bike)[name] for name in SUBTREES}
+HEADER = ("users_name", "brand", "model", "model_year", "purchase_date", "weight", "path_to_gallery")
+# columns added after databases were created, they are added to older ones when opened
+ADDED_COLUMNS = (("version", "INTEGER NOT NULL DEFAULT 1"), ("path_to_gallery", "TEXT"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bikes (
+    id INTEGER PRIMARY KEY,
+    users_name TEXT,
+    brand TEXT,
+    model TEXT,
+    model_year TEXT,
+    purchase_date TEXT,
+    weight INTEGER,
+    path_to_gallery TEXT,
+    total_usage TEXT,
+    geometry TEXT,
+    components TEXT,
+    setup TEXT,
+    version INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS bikes_brand ON bikes (brand);
+CREATE INDEX IF NOT EXISTS bikes_model ON bikes (model);
+CREATE INDEX IF NOT EXISTS bikes_model_year ON bikes (model_year);
+CREATE TABLE IF NOT EXISTS components (
+    bike_id INTEGER NOT NULL REFERENCES bikes (id) ON DELETE CASCADE,
+    slot TEXT NOT NULL,
+    brand TEXT,
+    model TEXT
+);
+CREATE INDEX IF NOT EXISTS components_brand_model ON components (brand, model);
+CREATE INDEX IF NOT EXISTS components_bike ON components (bike_id);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+class _LazySubtree:
+    """Data descriptor which loads sub-tree of stored bike on first access"""
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, bike, owner=None):
+        if bike is None:
+            return self
+        try:
+            return bike.__dict__[self.name]
+        except KeyError:
+            value = bike.store.load_subtree(bike.bike_id, self.name)
+            bike.__dict__[self.name] = value
+            return value
+
+    def __set__(self, bike, value):
+        bike.__dict__[self.name] = value
+
+
+class StoredBike(Bike):
+    """Bike loaded from BikeStore, its sub-trees are fetched only when accessed"""
+    total_usage = _LazySubtree()
+    geometry = _LazySubtree()
+    components = _LazySubtree()
+    setup = _LazySubtree()
+
+    @classmethod
+    def from_row(cls, store, row):
+        bike = cls.__new__(cls)
+        bike.store = store
+        bike.bike_id = row[0]
+        for name, value in zip(HEADER, row[1:]):
+            bike.__dict__[name] = value
+        if bike.purchase_date:
+            bike.purchase_date = datetime.datetime.fromisoformat(bike.purchase_date)
+        return bike
+
+
+def _dump(name, value):
+    if value is None:
+        return None
+    return json.dumps(encode_part(value, SUBTREE_TYPES[name]), separators=(",", ":"))
+
+
+def _load(name, text):
+    return None if text is None else decode_part(json.loads(text), SUBTREE_TYPES[name])
+
+
+def iter_components(components, prefix=""):
+    """Yields (slot, component) for every component instance mounted on bike, including nested ones"""
+    if components is None:
+        return
+    for _field in fields(components):
+        value = getattr(components, _field.name)
+        if not isinstance(value, Component):
+            continue
+        slot = prefix + _field.name
+        yield slot, value
+        yield from iter_components(value, slot + ".")
+
+
+class BikeStore:
+    def __init__(self, path="bike_garage.db", batch_size=1000):
+        self.path = path
+        self.batch_size = batch_size
+        self._lock = threading.RLock()
+        self._pending = []
+        self.listeners = []
+        self._connect()
+        columns = [row[1] for row in self._connection.execute("PRAGMA table_info(bikes)")]
+        for name, definition in ADDED_COLUMNS:
+            if name not in columns:
+                with self._connection:
+                    self._connection.execute("ALTER TABLE bikes ADD COLUMN {} {}".format(name, definition))
+
+    def _connect(self):
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.execute("PRAGMA foreign_keys = ON")
+        if self.path != ":memory:":
+            self._connection.execute("PRAGMA journal_mode = WAL")
+            self._connection.execute("PRAGMA synchronous = NORMAL")
+        self._connection.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self.flush()
+            self._connection.close()
+
+    def reopen(self):
+        """
+        Opens new connection after close(), e.g. in process forked from the one which used the store
+        (SQLite connection must not be carried over fork), data of :memory: database are not kept
+        """
+        with self._lock:
+            self._connect()
+
+    def _reserve(self, name, count):
+        """Reserves count values of counter, returns the first of them"""
+        self._connection.execute("UPDATE counters SET value = value + ? WHERE name = ?", (count, name))
+        (last,) = self._connection.execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()
+        return last - count + 1
+
+    def _next_versions(self, count):
+        """Reserves count versions, returns the first of them"""
+        self._connection.execute("INSERT OR IGNORE INTO counters VALUES ('version', 0)")
+        return self._reserve("version", count)
+
+    def _next_ids(self, count):
+        """
+        Reserves count bike ids, returns the first of them, ids of deleted bikes are never given again (rides,
+        history and photos of the deleted bike must not pass to the new one)
+        """
+        # databases written before the counter existed continue after their highest id
+        self._connection.execute("INSERT OR IGNORE INTO counters SELECT 'bike_id', COALESCE(MAX(id), 0) FROM bikes")
+        return self._reserve("bike_id", count)
+
+    def add(self, bike: Bike) -> int:
+        return self.add_many([bike])[0]
+
+    def add_many(self, bikes) -> list:
+        """Stores bikes in single transaction, returns their ids"""
+        with self._lock:
+            bikes = list(bikes)
+            with self._connection:
+                bike_id = self._next_ids(len(bikes))
+                bike_rows = []
+                component_rows = []
+                added = []
+                for bike in bikes:
+                    bike_rows.append(self._bike_row(bike_id, bike))
+                    component_rows.extend(self._component_rows(bike_id, bike.components))
+                    added.append((bike_id, bike))
+                    bike_id += 1
+                version = self._next_versions(len(bike_rows))
+                bike_rows = [row + (version + index,) for index, row in enumerate(bike_rows)]
+                self._connection.executemany(
+                    "INSERT INTO bikes (id, {}, version) VALUES ({})".format(
+                        ", ".join(HEADER + SUBTREES), ", ".join("?" * (len(HEADER) + len(SUBTREES) + 2))), bike_rows)
+                self._connection.executemany(
+                    "INSERT INTO components VALUES (?, ?, ?, ?)", component_rows)
+            self._notify(added)
+        return [bike_id for bike_id, _ in added]
+
+    def put(self, bike: Bike):
+        """Queues bike for batched insert, queue is written once it reaches batch_size"""
+        with self._lock:
+            self._pending.append(bike)
+            if len(self._pending) >= self.batch_size:
+                self.flush()
+
+    def flush(self) -> list:
+        with self._lock:
+            pending, self._pending = self._pending, []
+            return self.add_many(pending) if pending else []
+
+    def update(self, bike_id: int, bike: Bike):
+        with self._lock:
+            with self._connection:
+                row = self._bike_row(bike_id, bike)
+                self._connection.execute(
+                    "UPDATE bikes SET {}, version = ? WHERE id = ?".format(
+                        ", ".join("{} = ?".format(name) for name in HEADER + SUBTREES)),
+                    row[1:] + (self._next_versions(1), bike_id))
+                self._connection.execute("DELETE FROM components WHERE bike_id = ?", (bike_id,))
+                self._connection.executemany("INSERT INTO components VALUES (?, ?, ?, ?)",
+                                             self._component_rows(bike_id, bike.components))
+            self._notify([(bike_id, bike)])
+
+    def delete(self, bike_id: int):
+        with self._lock:
+            with self._connection:
+                self._connection.execute("DELETE FROM bikes WHERE id = ?", (bike_id,))
+            self._notify([(bike_id, None)])
+
+    def subscribe(self, listener):
+        """
+        Calls listener with every stored bike and from then on with every write, under the lock, so no write is
+        missed or seen before the stored state it changes
+        """
+        with self._lock:
+            for bike in self.scan(subtrees=("components",)):
+                listener(bike.bike_id, bike)
+            self.listeners.append(listener)
+
+    def _notify(self, changes):
+        """
+        Calls listeners with committed changes, under the lock, so they see writes in order of commits, error of
+        listener is logged and does not reach the writer (the write succeeded) nor the other listeners
+        """
+        for listener in self.listeners:
+            for bike_id, bike in changes:
+                try:
+                    listener(bike_id, bike)
+                except Exception:
+                    log.exception("listener %r failed on change of bike %s", listener, bike_id)
+
+    @staticmethod
+    def _bike_row(bike_id, bike):
+        purchase_date = bike.purchase_date.isoformat() if bike.purchase_date else None
+        return ((bike_id, bike.users_name, bike.brand, bike.model, bike.model_year, purchase_date, bike.weight,
+                 bike.path_to_gallery)
+                + tuple(_dump(name, getattr(bike, name)) for name in SUBTREES))
+
+    @staticmethod
+    def _component_rows(bike_id, components):
+        return [(bike_id, slot, component.brand, component.model)
+                for slot, component in iter_components(components)
+                if component.brand or component.model]
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._connection.execute(sql, params).fetchall()
+
+    def get(self, bike_id: int):
+        """Returns StoredBike with given id or None, sub-trees are loaded on access"""
+        rows = self._query("SELECT id, {} FROM bikes WHERE id = ?".format(", ".join(HEADER)), (bike_id,))
+        return StoredBike.from_row(self, rows[0]) if rows else None
+
+    def version(self, bike_id: int):
+        """Returns version of bike (new one after every write) or None when there is no such bike"""
+        rows = self._query("SELECT version FROM bikes WHERE id = ?", (bike_id,))
+        return rows[0][0] if rows else None
+
+    def __contains__(self, bike_id):
+        return bool(self._query("SELECT 1 FROM bikes WHERE id = ?", (bike_id,)))
+
+    def __len__(self):
+        return self._query("SELECT COUNT(*) FROM bikes")[0][0]
+
+    def scan(self, after_id=0, chunk_size=500, subtrees=SUBTREES):
+        """
+        Yields bikes ordered by id, reading chunk_size rows at a time. Given subtrees are loaded with the bike,
+        the others only when accessed.
+        """
+        for name in subtrees:
+            if name not in SUBTREES:
+                raise ValueError(name)
+        columns = ", ".join(("id",) + HEADER + tuple(subtrees))
+        while True:
+            rows = self._query("SELECT {} FROM bikes WHERE id > ? ORDER BY id LIMIT ?".format(columns),
+                               (after_id, chunk_size))
+            for row in rows:
+                bike = StoredBike.from_row(self, row[:len(HEADER) + 1])
+                for name, text in zip(subtrees, row[len(HEADER) + 1:]):
+                    bike.__dict__[name] = _load(name, text)
+                yield bike
+            if len(rows) < chunk_size:
+                return
+            after_id = rows[-1][0]
+
+    def load_subtree(self, bike_id: int, name: str):
+        if name not in SUBTREES:
+            raise ValueError(name)
+        rows = self._query("SELECT {} FROM bikes WHERE id = ?".format(name), (bike_id,))
+        return _load(name, rows[0][0]) if rows else None
+
+    def find(self, brand=None, model=None, model_year=None) -> list:
+        """Returns bikes matching all given values, uses indexes of bikes table"""
+        conditions = []
+        params = []
+        for column, value in (("brand", brand), ("model", model), ("model_year", model_year)):
+            if value is not None:
+                conditions.append("{} = ?".format(column))
+                params.append(value)
+        sql = "SELECT id, {} FROM bikes".format(", ".join(HEADER))
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        return [StoredBike.from_row(self, row) for row in self._query(sql + " ORDER BY id", params)]
+
+    def find_by_component(self, brand, model=None) -> list:
+        """Returns (bike id, slot) pairs of bikes which have component of given brand (and model) mounted"""
+        if model is None:
+            return self._query("SELECT bike_id, slot FROM components WHERE brand = ? ORDER BY bike_id", (brand,))
+        return self._query("SELECT bike_id, slot FROM components WHERE brand = ? AND model = ? ORDER BY bike_id",
+                           (brand, model))
+
+    @contextmanager
+    def batch(self):
+        """Every put() inside of with block is written in batches, rest is flushed at the end"""
+        try:
+            yield self
+        finally:
+            self.flush()
+
+
+def components_table(components: BikeComponents) -> dict:
+    if components is None:
+        return {}
+    return {_field.name: getattr(components, _field.name) for _field in fields(components)}
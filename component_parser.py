@@ -0,0 +1,333 @@
+"""
+Filling technical data of component by extracting them from string (whole name of component or listing title)
+* brands, models, component keywords and standards are matched in one pass by trie over words
+  (longest phrase wins, so "minion dhr ii" beats "minion")
+* numeric specs (travel, lengths, diameters, speeds, teeth, tyre and shock sizes, year) are matched by single
+  precompiled regular expression
+* parsed names are remembered in LRU cache, listings repeat the same titles a lot
+"""
+import re
+from collections import namedtuple
+from functools import lru_cache
+from types import MappingProxyType
+
+import bike_data
+from bike_data import BottomBracketStandard, HeadsetStandard, SuspensionType, WheelSize
+
+ParsedName = namedtuple("ParsedName", "brand model component_type specs")
+
+# alias (lower case) -> brand
+BRANDS = {
+    "fox": "Fox", "rockshox": "RockShox", "rock shox": "RockShox", "marzocchi": "Marzocchi", "ohlins": "Ohlins",
+    "cane creek": "Cane Creek", "dvo": "DVO", "shimano": "Shimano", "sram": "SRAM", "maxxis": "Maxxis",
+    "schwalbe": "Schwalbe", "continental": "Continental", "dt swiss": "DT Swiss", "dt": "DT Swiss",
+    "race face": "Race Face", "raceface": "Race Face", "oneup": "OneUp", "one up": "OneUp",
+    "chris king": "Chris King", "hope": "Hope", "e thirteen": "e*thirteen", "e13": "e*thirteen",
+    "magura": "Magura", "renthal": "Renthal", "bikeyoke": "BikeYoke", "yt": "YT", "yt industries": "YT",
+    "specialized": "Specialized", "santa cruz": "Santa Cruz", "trek": "Trek", "commencal": "Commencal",
+    "canyon": "Canyon", "giant": "Giant", "transition": "Transition",
+}
+
+# brand -> model -> component type (name of class from bike_data)
+MODELS = {
+    "Fox": {"32": "Fork", "34": "Fork", "36": "Fork", "38": "Fork", "40": "Fork", "Float X": "Shock",
+            "Float X2": "Shock", "Float DPS": "Shock", "DHX": "Shock", "DHX2": "Shock", "Transfer": "Seatpost"},
+    "RockShox": {"SID": "Fork", "Pike": "Fork", "Lyrik": "Fork", "ZEB": "Fork", "BoXXer": "Fork",
+                 "Deluxe": "Shock", "Super Deluxe": "Shock", "Vivid": "Shock", "Reverb": "Seatpost"},
+    "Marzocchi": {"Bomber Z1": "Fork", "Bomber Z2": "Fork", "Bomber 58": "Fork", "Bomber CR": "Shock"},
+    "Ohlins": {"RXF36": "Fork", "RXF38": "Fork", "TTX22M": "Shock", "TTX Air": "Shock"},
+    "Cane Creek": {"Helm": "Fork", "Kitsuma": "Shock", "DB Coil": "Shock", "40": "Headset", "110": "Headset"},
+    "DVO": {"Onyx": "Fork", "Diamond": "Fork", "Jade": "Shock", "Topaz": "Shock"},
+    "Shimano": {"XTR": None, "XT": None, "SLX": None, "Deore": None, "Saint": None, "Zee": None},
+    "SRAM": {"XX1 Eagle": None, "X01 Eagle": None, "GX Eagle": None, "NX Eagle": None, "Code": "DiscBreak",
+             "Guide": "DiscBreak", "G2": "DiscBreak", "Maven": "DiscBreak", "Centerline": "BreakDisc",
+             "HS2": "BreakDisc", "DUB": "BottomBracket"},
+    "Maxxis": {"Minion DHF": "Tyre", "Minion DHR": "Tyre", "Minion DHR II": "Tyre", "Assegai": "Tyre",
+               "High Roller": "Tyre", "High Roller II": "Tyre", "Dissector": "Tyre", "Aggressor": "Tyre",
+               "Rekon": "Tyre", "Shorty": "Tyre"},
+    "Schwalbe": {"Magic Mary": "Tyre", "Big Betty": "Tyre", "Hans Dampf": "Tyre", "Nobby Nic": "Tyre",
+                 "Tacky Chan": "Tyre", "Albert": "Tyre"},
+    "Continental": {"Kryptotal": "Tyre", "Der Kaiser": "Tyre", "Trail King": "Tyre"},
+    "DT Swiss": {"EX 1700": "Wheel", "EX 1501": "Wheel", "EX 511": "Rim", "EX 471": "Rim", "FR 560": "Rim",
+                 "240": "Hub", "350": "Hub", "370": "Hub"},
+    "Race Face": {"Atlas": None, "Turbine": None, "Next": None, "Aeffect": None, "Chester": None},
+    "OneUp": {"Dropper Post": "Seatpost", "V2 Dropper": "Seatpost", "Composite Pedal": "Pedals"},
+    "Chris King": {"InSet": "Headset", "NoThreadSet": "Headset", "Classic": "Hub"},
+    "Hope": {"Pro 4": "Hub", "Pro 5": "Hub", "Tech 4": "DiscBreak", "Tech 4 V4": "DiscBreak"},
+    "e*thirteen": {"LG1": "Chainguide", "TRS": None, "Helix": "Cassette"},
+    "Magura": {"MT5": "DiscBreak", "MT7": "DiscBreak", "MDR-P": "BreakDisc"},
+    "Renthal": {"Fatbar": "Handlebars", "Apex": "Stem"},
+    "BikeYoke": {"Revive": "Seatpost", "Divine": "Seatpost"},
+    "YT": {"Capra": "Frame", "Jeffsy": "Frame", "Tues": "Frame", "Decoy": "Frame", "Izzo": "Frame"},
+    "Specialized": {"Enduro": "Frame", "Stumpjumper": "Frame", "Stumpjumper EVO": "Frame", "Demo": "Frame"},
+    "Santa Cruz": {"Nomad": "Frame", "Megatower": "Frame", "Bronson": "Frame", "Hightower": "Frame", "V10": "Frame"},
+    "Trek": {"Slash": "Frame", "Fuel EX": "Frame", "Session": "Frame"},
+    "Commencal": {"Meta": "Frame", "Meta AM": "Frame", "Meta SX": "Frame", "Supreme DH": "Frame", "Clash": "Frame"},
+    "Canyon": {"Spectral": "Frame", "Strive": "Frame", "Torque": "Frame", "Sender": "Frame"},
+    "Giant": {"Reign": "Frame", "Trance": "Frame", "Glory": "Frame"},
+    "Transition": {"Patrol": "Frame", "Sentinel": "Frame", "Spire": "Frame", "TR11": "Frame"},
+}
+
+# keyword -> component type, explicit keyword wins over type given by model
+KEYWORDS = {
+    "frame": "Frame", "frameset": "Frame", "fork": "Fork", "shock": "Shock", "rear shock": "Shock",
+    "handlebar": "Handlebars", "handlebars": "Handlebars", "bar": "Handlebars", "riser bar": "Handlebars",
+    "stem": "Stem", "headset": "Headset", "grips": "Grips", "grip": "Grips", "brake": "DiscBreak",
+    "brakes": "DiscBreak", "disc brake": "DiscBreak", "v brake": "VBreak", "rotor": "BreakDisc",
+    "brake rotor": "BreakDisc", "disc": "BreakDisc", "pads": "Pads", "brake pads": "Pads", "rim": "Rim",
+    "hub": "Hub", "rear hub": "Hub", "front hub": "Hub", "tyre": "Tyre", "tire": "Tyre", "wheel": "Wheel",
+    "wheelset": "Wheels", "bottom bracket": "BottomBracket", "crankset": "Cranks", "cranks": "Cranks",
+    "crank": "Cranks", "pedals": "Pedals", "chainguide": "Chainguide", "chain guide": "Chainguide",
+    "chainring": "Chainrings", "chainrings": "Chainrings", "cassette": "Cassette", "derailleur": "Derailleur",
+    "rear derailleur": "Derailleur", "chain": "Chain", "saddle": "Saddle", "seatpost": "Seatpost",
+    "seat post": "Seatpost", "dropper": "Seatpost", "dropper post": "Seatpost",
+}
+
+# phrase -> (kind, value) for values which are not component type
+VALUES = {
+    "threaded": ("standard", "threaded"), "bsa": ("bottom_bracket", BottomBracketStandard.THREADED),
+    "press fit": ("bottom_bracket", BottomBracketStandard.PRESS_FIT),
+    "pf92": ("bottom_bracket", BottomBracketStandard.PRESS_FIT),
+    "bb92": ("bottom_bracket", BottomBracketStandard.PRESS_FIT),
+    "bb30": ("bottom_bracket", BottomBracketStandard.BB30), "pf30": ("bottom_bracket", BottomBracketStandard.BB30),
+    "isis": ("bottom_bracket", BottomBracketStandard.ISIS),
+    "square taper": ("bottom_bracket", BottomBracketStandard.SQUARE),
+    "tapered": ("headset", HeadsetStandard.TAPERED), "ahead": ("headset", HeadsetStandard.AHEAD),
+    "integrated": ("headset", HeadsetStandard.INTEGRATED), "is42": ("headset", HeadsetStandard.INTEGRATED),
+    "is52": ("headset", HeadsetStandard.INTEGRATED), "zs44": ("headset", HeadsetStandard.INTEGRATED_PRESS_FIT),
+    "zs56": ("headset", HeadsetStandard.INTEGRATED_PRESS_FIT),
+    "integrated press fit": ("headset", HeadsetStandard.INTEGRATED_PRESS_FIT),
+    "26": ("wheel_size", WheelSize.TWENTY_SIX), "27.5": ("wheel_size", WheelSize.TWENTY_SEVEN),
+    "27,5": ("wheel_size", WheelSize.TWENTY_SEVEN), "650b": ("wheel_size", WheelSize.TWENTY_SEVEN),
+    "29": ("wheel_size", WheelSize.TWENTY_NINE), "29er": ("wheel_size", WheelSize.TWENTY_NINE),
+    "24": ("wheel_size", WheelSize.TWENTY_FOUR), "20": ("wheel_size", WheelSize.TWENTY),
+    "mullet": ("wheel_size", WheelSize.MULLET), "mx": ("wheel_size", WheelSize.MULLET),
+    "mixed wheel": ("wheel_size", WheelSize.MULLET),
+    "coil": ("suspension_type", SuspensionType.SPRING), "air": ("suspension_type", SuspensionType.AIR),
+    "dropper": ("telescopic", True), "dropper post": ("telescopic", True), "boost": ("boost", True),
+    "non boost": ("boost", False), "centerlock": ("centerlock", True),
+    "center lock": ("centerlock", True), "6 bolt": ("centerlock", False),
+    "exo": ("casing", "EXO"), "exo+": ("casing", "EXO+"), "doubledown": ("casing", "DoubleDown"),
+    "dd": ("casing", "DoubleDown"), "super gravity": ("casing", "Super Gravity"),
+    "super trail": ("casing", "Super Trail"), "maxxgrip": ("compound", "MaxxGrip"),
+    "3c maxxgrip": ("compound", "MaxxGrip"), "maxxterra": ("compound", "MaxxTerra"),
+    "3c maxxterra": ("compound", "MaxxTerra"), "dual compound": ("compound", "Dual"),
+    "addix soft": ("compound", "Addix Soft"), "addix ultra soft": ("compound", "Addix Ultra Soft"),
+}
+
+# where the spec goes for given component type, specs of other types are kept under their generic name
+WHEEL_SIZE_FIELD = {"Rim": "size", "Tyre": "size", "Wheel": "size", "Wheels": "size"}
+STANDARD_FIELD = {"BottomBracket": ("bottom_bracket", "standard"), "Headset": ("headset", "standard"),
+                  "Frame": ("headset", "head_tube")}
+MM_FIELD = {"Fork": "travel", "Frame": "travel", "Seatpost": "travel", "Stem": "length", "Cranks": "length",
+            "BreakDisc": "diameter", "Handlebars": "width", "Shock": "length"}
+SPEEDS_FIELD = {"Chain": "speeds_compatibility"}
+HOLES_FIELD = {"Rim": "spoke_count"}
+DIAMETERS = {22.2, 25.4, 30.9, 31.6, 31.8, 34.9, 35}
+
+SPECS = re.compile(r"""
+    # every spec starts with digit, "offset" or "size", lookahead skips other positions quickly
+    \b(?=[0-9os])(?:
+      (?P<shock>\b(\d{3})\s?x\s?(\d{2}(?:\.\d)?)\s?(?:mm)?\b)
+    | (?P<tyre>\b(2[0-9](?:[.,]5)?)\s?(?:"|in)?\s?x\s?(\d[.,]\d{1,2})\b)
+    | (?P<tooth_range>\b(\d{1,2})\s?-\s?(\d{2})\s?t\b)
+    | (?P<speeds>\b(\d{1,2})\s?-?\s?(?:speed|spd|sp|s)\b)
+    | (?P<teeth>\b(\d{2})\s?t\b)
+    | (?P<holes>\b(\d{2})\s?h\b)
+    | (?P<offset>\b(\d{2})\s?mm\s+offset\b|\boffset\s+(\d{2})\s?(?:mm)?\b)
+    | (?P<mm>\b(\d{2,4}(?:[.,]\d)?)\s?mm\b)
+    | (?P<frame_size>\bsize\s?:?\s?(xxs|xs|s|m|l|xl|xxl|s[1-6])\b)
+    | (?P<year>\b(19[89]\d|20[0-4]\d)\b)
+    )
+""", re.VERBOSE)
+TOKENS = re.compile(r"[a-z0-9]+(?:[.,][0-9]+)?\+?")
+_END = object()
+
+
+def tokens(text: str) -> list:
+    return TOKENS.findall(text.lower())
+
+
+def _number(text):
+    value = float(text.replace(",", "."))
+    return int(value) if value.is_integer() else value
+
+
+class ComponentNameParser:
+    def __init__(self, brands=None, models=None, keywords=None, values=None, cache_size=65536):
+        self._trie = {}
+        for alias, brand in (brands or BRANDS).items():
+            self._add(alias, ("brand", brand))
+        for brand, models_of_brand in (models or MODELS).items():
+            for model, component_type in models_of_brand.items():
+                self._add(model, ("model", (brand, model, component_type)))
+        for keyword, component_type in (keywords or KEYWORDS).items():
+            self._add(keyword, ("type", component_type))
+        for phrase, value in (values or VALUES).items():
+            self._add(phrase, value)
+        self.parse = lru_cache(maxsize=cache_size)(self._parse)
+
+    def _add(self, phrase, entry):
+        node = self._trie
+        for token in tokens(phrase):
+            node = node.setdefault(token, {})
+        node.setdefault(_END, []).append(entry)
+
+    def _match(self, words):
+        """Yields (start, end, entries) of longest dictionary phrases, left to right"""
+        trie = self._trie
+        position = 0
+        count = len(words)
+        while position < count:
+            node = trie
+            end = position
+            best = None
+            while end < count:
+                node = node.get(words[end])
+                if node is None:
+                    break
+                end += 1
+                if _END in node:
+                    best = end, node[_END]
+            if best is None:
+                position += 1
+            else:
+                yield position, best[0], best[1]
+                position = best[0]
+
+    def _parse(self, name: str) -> ParsedName:
+        lowered = name.lower()
+        spec_matches = list(SPECS.finditer(lowered))
+        if spec_matches:
+            # specs are blanked out (keeping positions), so their numbers are not taken as words
+            parts = []
+            position = 0
+            for match in spec_matches:
+                start, end = match.span()
+                parts.append(lowered[position:start])
+                parts.append(" " * (end - start))
+                position = end
+            parts.append(lowered[position:])
+            lowered = "".join(parts)
+        words = []
+        spans = []
+        for match in TOKENS.finditer(lowered):
+            words.append(match.group())
+            spans.append(match.span())
+
+        brand = None
+        brand_end = None
+        models = []
+        component_type = None
+        values = {}
+        used = [False] * len(words)
+        for start, end, entries in self._match(words):
+            for kind, value in entries:
+                if kind == "brand" and brand is None:
+                    brand, brand_end = value, end
+                elif kind == "model":
+                    models.append(value)
+                elif kind == "type":
+                    component_type = value
+                else:
+                    values.setdefault(kind, value)
+            used[start:end] = [True] * (end - start)
+
+        model = None
+        model_type = None
+        for model_brand, model_name, model_component in models:
+            # numeric model names (Fox 36, DT Swiss 240) are recognized only together with their brand
+            if model_brand == brand or (brand is None and not model_name.isdigit()):
+                brand = model_brand
+                model, model_type = model_name, model_component
+                break
+        component_type = component_type or model_type
+
+        specs = {}
+        for match in spec_matches:
+            self._spec(match, component_type, specs)
+        if "standard" in values:
+            # plain "threaded" is standard of bottom bracket unless the name is about headset or frame
+            kind = "headset" if component_type in ("Headset", "Frame") else "bottom_bracket"
+            values.setdefault(kind, HeadsetStandard.THREADED if kind == "headset"
+                              else BottomBracketStandard.THREADED)
+            del values["standard"]
+        for kind, value in values.items():
+            if kind == "wheel_size":
+                if "size" not in specs and "wheel_size" not in specs:
+                    specs[WHEEL_SIZE_FIELD.get(component_type, "wheel_size")] = value
+            elif kind in ("bottom_bracket", "headset"):
+                field_kind, field_name = STANDARD_FIELD.get(component_type, (None, None))
+                specs[field_name if field_kind == kind else kind + "_standard"] = value
+            else:
+                specs[kind] = value
+
+        if model is None and brand is not None:
+            # unknown model is the rest of the name after brand which was not recognized as anything else
+            model = " ".join(name[begin:stop] for index, (begin, stop) in enumerate(spans)
+                             if index >= brand_end and not used[index]) or None
+        return ParsedName(brand, model, component_type, MappingProxyType(specs))
+
+    @staticmethod
+    def _spec(match, component_type, specs):
+        group = match.lastgroup
+        values = [value for value in match.groups()[match.re.groupindex[group]:] if value is not None]
+        if group == "shock":
+            if component_type in (None, "Shock"):
+                specs.setdefault("length", int(values[0]))
+        elif group == "tyre":
+            size = {"26": WheelSize.TWENTY_SIX, "27.5": WheelSize.TWENTY_SEVEN, "27,5": WheelSize.TWENTY_SEVEN,
+                    "29": WheelSize.TWENTY_NINE}.get(values[0])
+            if size is not None:
+                specs.setdefault(WHEEL_SIZE_FIELD.get(component_type, "wheel_size"), size)
+            specs.setdefault("width", _number(values[1]))
+        elif group == "tooth_range":
+            specs.setdefault("tooth_range", "{}-{}".format(*values[:2]))
+        elif group == "speeds":
+            specs.setdefault(SPEEDS_FIELD.get(component_type, "speeds"), int(values[0]))
+        elif group == "teeth":
+            specs.setdefault("tooth_numbers", (int(values[0]),))
+        elif group == "holes":
+            specs.setdefault(HOLES_FIELD.get(component_type, "holes_count"), int(values[0]))
+        elif group == "offset":
+            specs.setdefault("offset", int(values[0]))
+        elif group == "mm":
+            value = _number(values[0])
+            if value in DIAMETERS and (isinstance(value, float) or component_type == "Handlebars"):
+                specs.setdefault("diameter", value)
+            elif component_type in MM_FIELD:
+                specs.setdefault(MM_FIELD[component_type], value)
+        elif group == "frame_size":
+            if component_type in (None, "Frame"):
+                specs.setdefault("size", values[0].upper())
+        elif group == "year":
+            specs.setdefault("model_year", int(values[0]))
+
+    def parse_many(self, names) -> list:
+        parse = self.parse
+        return [parse(name) for name in names]
+
+    def to_component(self, name: str, component=None):
+        """
+        Fills empty fields of component from parsed name, new instance of recognized type is made when component
+        is not given (None when type is not recognized)
+        """
+        parsed = self.parse(name)
+        if component is None:
+            if parsed.component_type is None:
+                return None
+            component = getattr(bike_data, parsed.component_type)()
+        for field_name, value in (("brand", parsed.brand), ("model", parsed.model), *parsed.specs.items()):
+            if value is None or not hasattr(component, field_name) or getattr(component, field_name) is not None:
+                continue
+            try:
+                setattr(component, field_name, list(value) if isinstance(value, tuple) else value)
+            except (ValueError, AttributeError):
+                continue  # e.g. disc diameter which is not standard, Wheels.size without wheels
+        return component
+
+
+parser = ComponentNameParser()
+parse = parser.parse
+parse_many = parser.parse_many
+to_component = parser.to_component
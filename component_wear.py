@@ -0,0 +1,171 @@
+"""
+Wear of components and their service intervals
+* usage counters of all components of all bikes are kept in numpy columns (one row per mounted component)
+* usage from rides is added per bike and spread to components by index, without loop over components
+* service rules are evaluated for whole table at once, one vectorized pass per rule
+* ride types of ride log which the table does not know get their own column, their rides still count to hours
+  and distance
+"""
+import logging
+from collections import namedtuple
+
+import numpy as np
+
+from bike_store import iter_components
+from ride_log import RIDE_TYPES
+
+ServiceRule = namedtuple("ServiceRule", "kind name metric interval")
+ServiceNotice = namedtuple("ServiceNotice", "bike_id slot kind service used interval due")
+
+logger = logging.getLogger("bike_garage.wear")  # not log, that is name of RideLog arguments
+
+# metric is "hours", "distance" (km) or name of ride type (number of such rides)
+SERVICE_RULES = [
+    ServiceRule("Fork", "lower leg service", "hours", 50),
+    ServiceRule("Fork", "damper service", "hours", 125),
+    ServiceRule("Shock", "air can service", "hours", 50),
+    ServiceRule("Shock", "damper service", "hours", 125),
+    ServiceRule("Seatpost", "dropper service", "hours", 100),
+    ServiceRule("Chain", "replace chain", "distance", 1500),
+    ServiceRule("Cassette", "replace cassette", "distance", 5000),
+    ServiceRule("Chainrings", "replace chainring", "distance", 5000),
+    ServiceRule("Pads", "replace pads", "hours", 40),
+    ServiceRule("Pads", "check pads after bikepark", "bikepark", 10),
+    ServiceRule("Tyre", "check tyre after bikepark", "bikepark", 15),
+    ServiceRule("Hub", "hub bearings service", "hours", 100),
+    ServiceRule("Headset", "headset service", "hours", 100),
+    ServiceRule("BottomBracket", "bottom bracket service", "hours", 100),
+]
+
+
+class WearTable:
+    def __init__(self, ride_types=None, capacity=1024):
+        self.ride_types = list(ride_types or RIDE_TYPES)
+        self.kinds = []
+        self.slots = []
+        self.size = 0
+        self._bike_rows = {}
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        old = self.size
+        columns = {
+            "bike_id": np.zeros(capacity, dtype=np.int64),
+            "kind": np.zeros(capacity, dtype=np.int16),
+            "hours": np.zeros(capacity),
+            "distance": np.zeros(capacity),
+            "rides": np.zeros((capacity, len(self.ride_types))),
+            "serviced_hours": np.zeros(capacity),
+            "serviced_distance": np.zeros(capacity),
+            "serviced_rides": np.zeros((capacity, len(self.ride_types))),
+        }
+        for name, column in columns.items():
+            if old:
+                column[:old] = getattr(self, name)[:old]
+            setattr(self, name, column)
+
+    def __len__(self):
+        return self.size
+
+    def add_ride_type(self, ride_type: str) -> int:
+        """Adds column counting rides of ride type, returns its index"""
+        self.ride_types.append(ride_type)
+        for name in ("rides", "serviced_rides"):
+            column = getattr(self, name)
+            setattr(self, name, np.hstack([column, np.zeros((len(column), 1))]))
+        return len(self.ride_types) - 1
+
+    def kind_code(self, kind: str) -> int:
+        if kind not in self.kinds:
+            self.kinds.append(kind)
+        return self.kinds.index(kind)
+
+    def add_bike(self, bike_id: int, bike):
+        """Adds row for every component mounted on bike, counters start from its current usage"""
+        for slot, component in iter_components(bike.components):
+            if self.size == len(self.bike_id):
+                self._allocate(2 * len(self.bike_id))
+            row = self.size
+            self.bike_id[row] = bike_id
+            self.kind[row] = self.kind_code(type(component).__name__)
+            if component.usage is not None:
+                self.hours[row] = component.usage.hours or 0
+                self.distance[row] = component.usage.distance or 0
+            self.slots.append(slot)
+            self._bike_rows.setdefault(bike_id, []).append(row)
+            self.size += 1
+
+    def rows(self, bike_id: int, slot=None) -> list:
+        return [row for row in self._bike_rows.get(bike_id, []) if slot is None or self.slots[row] == slot]
+
+    def add_rides(self, bike_ids, hours, distance, ride_types):
+        """Adds usage of rides given as equally long arrays, ride_types are indexes to ride_types (ValueError if not)"""
+        bike_ids = np.asarray(bike_ids, dtype=np.int64)
+        ride_types = np.asarray(ride_types, dtype=np.int64)
+        unknown = (ride_types < 0) | (ride_types >= len(self.ride_types))
+        if unknown.any():
+            raise ValueError("unknown ride type index {}".format(int(ride_types[unknown][0])))
+        if not len(bike_ids) or not self.size:
+            return
+        size = max(int(bike_ids.max()), int(self.bike_id[:self.size].max())) + 1
+        per_bike_hours = np.bincount(bike_ids, weights=np.asarray(hours, dtype=float), minlength=size)
+        per_bike_distance = np.bincount(bike_ids, weights=np.asarray(distance, dtype=float), minlength=size)
+        per_bike_rides = np.zeros((size, len(self.ride_types)))
+        np.add.at(per_bike_rides, (bike_ids, ride_types), 1)
+
+        component_bikes = self.bike_id[:self.size]
+        self.hours[:self.size] += per_bike_hours[component_bikes]
+        self.distance[:self.size] += per_bike_distance[component_bikes]
+        self.rides[:self.size] += per_bike_rides[component_bikes]
+
+    def add_ride_log(self, log, after=-1):
+        """
+        Adds rides of RideLog with id greater than after, returns id of last added ride, ride types which are not in
+        ride_types are added to them (with warning, service rules do not know them)
+        """
+        start = after + 1
+        if start >= len(log):
+            return after
+        columns = log.columns
+        codes = np.frombuffer(columns["ride_type"], dtype=np.uint8)[start:]
+        for code in np.unique(codes):
+            ride_type = log.ride_types[code]
+            if ride_type not in self.ride_types:
+                logger.warning("ride type %r is not known, its rides are counted in a column of its own", ride_type)
+                self.add_ride_type(ride_type)
+        mapping = np.array([self.ride_types.index(name) if name in self.ride_types else -1
+                            for name in log.ride_types], dtype=np.int64)
+        self.add_rides(np.frombuffer(columns["bike_id"], dtype=np.dtype(columns["bike_id"].typecode))[start:],
+                       np.frombuffer(columns["duration"], dtype=np.float32)[start:] / 3600,
+                       np.frombuffer(columns["distance"], dtype=np.float32)[start:],
+                       mapping[codes])
+        return len(log) - 1
+
+    def record_service(self, rows):
+        """Resets counters of service intervals of given rows (component was serviced or replaced)"""
+        self.serviced_hours[rows] = self.hours[rows]
+        self.serviced_distance[rows] = self.distance[rows]
+        self.serviced_rides[rows] = self.rides[rows]
+
+    def _used(self, metric):
+        size = self.size
+        if metric == "hours":
+            return self.hours[:size] - self.serviced_hours[:size]
+        if metric == "distance":
+            return self.distance[:size] - self.serviced_distance[:size]
+        column = self.ride_types.index(metric)
+        return self.rides[:size, column] - self.serviced_rides[:size, column]
+
+    def due(self, rules=None, soon=0.1) -> list:
+        """Returns ServiceNotice of every component which is due or within soon fraction of its interval"""
+        notices = []
+        kinds = self.kind[:self.size]
+        for rule in rules or SERVICE_RULES:
+            if rule.kind not in self.kinds:
+                continue
+            used = self._used(rule.metric)
+            flagged = np.flatnonzero((kinds == self.kinds.index(rule.kind)) & (used >= rule.interval * (1 - soon)))
+            for row in flagged.tolist():
+                notices.append(ServiceNotice(int(self.bike_id[row]), self.slots[row], rule.kind, rule.name,
+                                             float(used[row]), rule.interval, bool(used[row] >= rule.interval)))
+        return notices
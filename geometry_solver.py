@@ -0,0 +1,184 @@
+"""
+Calculating rest of geometry values based on already filled ones (all lengths in mm, angles in degrees)
+
+Used relations (bike drawn from bottom bracket, front axle is bb_drop above it):
+* bottom_bracket_height + bottom_bracket_drop = wheel radius
+* top_tube_length = reach + stack / tan(seat_tube_angle)
+* wheelbase = reach + (stack - bb_drop) / tan(head_tube_angle) + fork offset / sin(head_tube_angle)
+              + sqrt(chainstay_length^2 - bb_drop^2)
+* stack = bb_drop + (fork length + head_tube_length) * sin(head_tube_angle) - fork offset * cos(head_tube_angle)
+  (only when fork length - axle to crown including lower headset cup - is known)
+
+Whole catalog is solved at once, every relation is evaluated as numpy operation over all frames.
+Adjustable values (sets, e.g. flip chip positions) are expanded into all combinations and values derived
+from them are sets as well. Already solved combinations of known values are remembered.
+"""
+import itertools
+import math
+from dataclasses import fields
+
+import numpy as np
+
+from bike_data import Geometry
+
+FIELDS = tuple(_field.name for _field in fields(Geometry))
+WHEEL_RADIUS = {"29\"": 375.0, "27,5\"": 355.0, "26\"": 340.0}
+DEFAULT_WHEEL_RADIUS = WHEEL_RADIUS["29\""]
+DEFAULT_FORK_OFFSET = 44.0
+DECIMALS = 1
+MAX_PASSES = 4
+MAX_CACHED = 100000
+
+_solved = {}
+_frames = {}
+
+
+def _column(values, name):
+    return values[FIELDS.index(name)]
+
+
+def _fill(target, value, mask):
+    """Writes value into target where mask is set and value is finite, returns number of filled entries"""
+    mask = mask & np.isfinite(value)
+    target[mask] = value[mask]
+    return int(mask.sum())
+
+
+def _solve_columns(values, wheel_radius, fork_offset, fork_length):
+    """values is (fields, frames) float array with NaN for unknown values, it is completed in place"""
+    known = np.isfinite
+    top_tube = _column(values, "top_tube_length")
+    hta = _column(values, "head_tube_angle")
+    head_tube = _column(values, "head_tube_length")
+    sta = _column(values, "seat_tube_angle")
+    bb_height = _column(values, "bottom_bracket_height")
+    bb_drop = _column(values, "bottom_bracket_drop")
+    chainstay = _column(values, "chainstay_length")
+    wheelbase = _column(values, "wheelbase")
+    reach = _column(values, "reach")
+    stack = _column(values, "stack")
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for _ in range(MAX_PASSES):
+            filled = 0
+            # wheel radius
+            filled += _fill(bb_height, wheel_radius - bb_drop, ~known(bb_height))
+            filled += _fill(bb_drop, wheel_radius - bb_height, ~known(bb_drop))
+
+            # effective top tube
+            tan_sta = np.tan(np.radians(sta))
+            filled += _fill(top_tube, reach + stack / tan_sta, ~known(top_tube))
+            filled += _fill(reach, top_tube - stack / tan_sta, ~known(reach))
+            filled += _fill(stack, (top_tube - reach) * tan_sta, ~known(stack))
+            filled += _fill(sta, np.degrees(np.arctan2(stack, top_tube - reach)), ~known(sta))
+
+            # wheelbase
+            hta_radians = np.radians(hta)
+            fork_reach = fork_offset / np.sin(hta_radians)
+            rear_center = np.sqrt(chainstay ** 2 - bb_drop ** 2)
+            front_center = reach + (stack - bb_drop) / np.tan(hta_radians) + fork_reach
+            filled += _fill(wheelbase, front_center + rear_center, ~known(wheelbase))
+            filled += _fill(chainstay, np.sqrt((wheelbase - front_center) ** 2 + bb_drop ** 2), ~known(chainstay))
+            filled += _fill(reach, wheelbase - rear_center - (stack - bb_drop) / np.tan(hta_radians) - fork_reach,
+                            ~known(reach))
+            filled += _fill(stack, (wheelbase - rear_center - reach - fork_reach) * np.tan(hta_radians) + bb_drop,
+                            ~known(stack))
+
+            # head tube and fork
+            if fork_length is not None:
+                sin_hta, cos_hta = np.sin(hta_radians), np.cos(hta_radians)
+                filled += _fill(stack, bb_drop + (fork_length + head_tube) * sin_hta - fork_offset * cos_hta,
+                                ~known(stack))
+                filled += _fill(head_tube, (stack - bb_drop + fork_offset * cos_hta) / sin_hta - fork_length,
+                                ~known(head_tube))
+                filled += _fill(bb_drop, stack - (fork_length + head_tube) * sin_hta + fork_offset * cos_hta,
+                                ~known(bb_drop))
+            if not filled:
+                break
+    return values
+
+
+def _configurations(geometry):
+    """Returns list of tuples of known values (NaN for unknown), one for every combination of adjustable values"""
+    options = []
+    for name in FIELDS:
+        value = getattr(geometry, name)
+        if isinstance(value, (set, frozenset)):
+            options.append(sorted(float(option) for option in value))
+        else:
+            options.append([math.nan if value is None else float(value)])
+    return list(itertools.product(*options))
+
+
+def _frame_key(geometry):
+    return tuple(frozenset(value) if isinstance(value, set) else value
+                 for value in (getattr(geometry, name) for name in FIELDS))
+
+
+def _key(configuration):
+    return tuple(None if math.isnan(value) else value for value in configuration)
+
+
+def _number(value):
+    return int(value) if value.is_integer() else value
+
+
+def _merge(solved):
+    """Single value when all configurations agree, set of values otherwise, None when any is unknown"""
+    if any(math.isnan(value) for value in solved):
+        return None
+    values = {_number(value) for value in solved}
+    return values.pop() if len(values) == 1 else values
+
+
+def complete_many(geometries, wheel_radius=DEFAULT_WHEEL_RADIUS, fork_offset=DEFAULT_FORK_OFFSET,
+                  fork_length=None) -> list:
+    """Fills missing values of every Geometry in place, returns the geometries"""
+    geometries = list(geometries)
+    parameters = (wheel_radius, fork_offset, fork_length)
+    frame_keys = [(_frame_key(geometry), parameters) for geometry in geometries]
+
+    unsolved = {}
+    new_frames = {}
+    cached = set()  # keys of configurations solved before, which new frames are made of
+    for geometry, frame_key in zip(geometries, frame_keys):
+        if frame_key in _frames or frame_key in new_frames:
+            continue
+        new_frames[frame_key] = configurations = _configurations(geometry)
+        for configuration in configurations:
+            key = (_key(configuration), parameters)
+            if key in _solved:
+                cached.add(key)
+            else:
+                unsolved[key] = configuration
+    if len(_solved) + len(unsolved) > MAX_CACHED or len(_frames) + len(new_frames) > MAX_CACHED:
+        # entries which this call reads survive the eviction
+        kept_solved = {key: _solved[key] for key in cached}
+        kept_frames = {frame_key: _frames[frame_key] for frame_key in frame_keys if frame_key in _frames}
+        clear_cache()
+        _solved.update(kept_solved)
+        _frames.update(kept_frames)
+    if unsolved:
+        values = np.array(list(unsolved.values()), dtype=float).T.copy()
+        solved = np.round(_solve_columns(values, wheel_radius, fork_offset, fork_length), DECIMALS).T
+        for key, row in zip(unsolved, solved):
+            _solved[key] = tuple(row.tolist())
+    for frame_key, configurations in new_frames.items():
+        rows = [_solved[(_key(configuration), parameters)] for configuration in configurations]
+        _frames[frame_key] = tuple(None if known is not None else _merge([row[index] for row in rows])
+                                   for index, known in enumerate(frame_key[0]))
+
+    for geometry, frame_key in zip(geometries, frame_keys):
+        for name, value in zip(FIELDS, _frames[frame_key]):
+            if getattr(geometry, name) is None:
+                setattr(geometry, name, set(value) if isinstance(value, set) else value)
+    return geometries
+
+
+def complete(geometry: Geometry, **parameters) -> Geometry:
+    return complete_many([geometry], **parameters)[0]
+
+
+def clear_cache():
+    _solved.clear()
+    _frames.clear()
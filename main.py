@@ -1,4 +1,42 @@
-from web_gui import bike_garage
+import logging
+import os
+import shutil
+import tempfile
+
+import metrics
+from server import Config, Server
+from web_gui import bike_garage, deferred_startup, garage
+
+
+def main():
+    config = Config.from_environ()
+    if deferred_startup:
+        config.warmup = ()  # templates are compiled by the first request which renders them
+    if config.debug:
+        bike_garage.run(host=config.host, port=config.port, debug=True)
+        return
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(process)d %(levelname)s %(message)s")
+    # workers share their metrics through files, so any of them can answer /metrics for the whole server
+    metrics_directory = os.environ.get("BIKE_GARAGE_METRICS_DIR")
+    temporary = not metrics_directory
+    if temporary:
+        metrics_directory = tempfile.mkdtemp(prefix="bike_garage_metrics_")
+    os.makedirs(metrics_directory, exist_ok=True)
+
+    def after_fork():
+        garage.reopen()
+        metrics.registry.directory = metrics_directory  # set only in workers, master does not export
+
+    def after_exit(pid):
+        metrics.registry.fold_exited(pid, metrics_directory)
+
+    metrics.clear_exports(metrics_directory)
+    try:
+        Server(bike_garage, config, before_fork=garage.close, after_fork=after_fork, after_exit=after_exit).run()
+    finally:
+        if temporary:
+            shutil.rmtree(metrics_directory, ignore_errors=True)
+
 
 if __name__ == "__main__":
-    bike_garage.run(debug=True)
+    main()
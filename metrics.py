@@ -0,0 +1,344 @@
+"""
+Instrumentation of the app, scrapers and builders
+* counters and histograms with fixed buckets live in the process, recording a value is one bisect and few
+  additions under a lock
+* with directory set, every process (worker of pre-fork server) writes its values there once per second and
+  render() sums values of all of them, so any worker answers /metrics for the whole server
+* values of exited workers are folded into single file by the supervisor, so their counts stay in totals
+* render() returns Prometheus text format
+* SamplingProfiler samples stack of one thread from a background thread, so the profiled code is not slowed
+  by tracing of every call
+"""
+import bisect
+import collections
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+EXITED = "exited.json"  # summed values of processes which exited, see Registry.fold_exited
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names, values, extra="") -> str:
+    pairs = ['{}="{}"'.format(name, _escape(value)) for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value, *labels):
+        """Adds value, labels are values of label names in order of their declaration"""
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + value
+
+    def state(self) -> dict:
+        with self._lock:
+            return dict(self._values)
+
+    def reset(self):
+        # new lock, reset runs also in forked child where old one could be held by thread which is gone
+        self._values = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def merge(total, value):
+        return (total or 0) + value
+
+    def lines(self, state):
+        for labels, value in sorted(state.items()):
+            yield "{}{} {}".format(self.name, _labels(self.labels, labels), _number(value))
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # labels -> [count per bucket (and one over the last), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            values = self._values.get(labels)
+            if values is None:
+                values = self._values[labels] = [[0] * (len(self.buckets) + 1), 0]
+            values[0][index] += 1
+            values[1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def state(self) -> dict:
+        with self._lock:
+            return {labels: [list(counts), total] for labels, (counts, total) in self._values.items()}
+
+    def reset(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def merge(total, value):
+        if total is None:
+            return [list(value[0]), value[1]]
+        return [[first + second for first, second in zip(total[0], value[0])], total[1] + value[1]]
+
+    def lines(self, state):
+        for labels, (counts, total) in sorted(state.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                yield "{}_bucket{} {}".format(self.name, _labels(self.labels, labels,
+                                                                'le="{}"'.format(_number(bound))), cumulative)
+            yield "{}_sum{} {}".format(self.name, _labels(self.labels, labels), _number(total))
+            yield "{}_count{} {}".format(self.name, _labels(self.labels, labels), cumulative)
+
+
+class Registry:
+    def __init__(self, directory=None, export_interval=1.0):
+        self.directory = directory
+        self.export_interval = export_interval
+        self.metrics = {}
+        self._exporter_pid = None
+        self._lock = threading.Lock()
+
+    def _add(self, metric):
+        with self._lock:
+            return self.metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation, labels=()) -> Counter:
+        return self._add(Counter(name, documentation, labels))
+
+    def histogram(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, documentation, labels, buckets))
+
+    def state(self) -> dict:
+        return {name: metric.state() for name, metric in self.metrics.items()}
+
+    def reset(self):
+        for metric in self.metrics.values():
+            metric.reset()
+
+    def export(self):
+        """Writes values of this process to directory (file per process), they are summed by render()"""
+        state = {name: [[list(labels), value] for labels, value in values.items()]
+                 for name, values in self.state().items()}
+        descriptor, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(descriptor, "w") as f:
+            json.dump(state, f)
+        os.replace(temporary, os.path.join(self.directory, "{}.json".format(os.getpid())))
+
+    def start_export(self):
+        """Starts thread exporting values periodically, once in every process (it is not inherited by fork)"""
+        if self.directory is None or self._exporter_pid == os.getpid():
+            return
+        with self._lock:
+            if self._exporter_pid == os.getpid():
+                return
+            self._exporter_pid = os.getpid()
+        os.makedirs(self.directory, exist_ok=True)
+
+        def run():
+            while True:
+                time.sleep(self.export_interval)
+                self.export()
+        threading.Thread(target=run, name="metrics-export", daemon=True).start()
+
+    def _collect(self) -> dict:
+        states = collections.defaultdict(dict)
+        for name, values in self.state().items():
+            states[name].update(values)
+        if self.directory is None:
+            return states
+        own = "{}.json".format(os.getpid())
+        for file_name in os.listdir(self.directory):
+            if file_name.endswith(".json") and file_name != own:
+                self._merge_file(states, os.path.join(self.directory, file_name))
+        return states
+
+    def _merge_file(self, states, path):
+        try:
+            with open(path) as f:
+                exported = json.load(f)
+        except (OSError, ValueError):
+            return
+        for name, values in exported.items():
+            metric = self.metrics.get(name)
+            if metric is None:
+                continue
+            for labels, value in values:
+                labels = tuple(labels)
+                states[name][labels] = metric.merge(states[name].get(labels), value)
+
+    def fold_exited(self, pid, directory=None):
+        """
+        Adds values exported by exited process to EXITED file and removes its own file, called by supervisor of
+        workers, so totals of counters never go down, even when new worker gets the same pid, and files do not
+        pile up
+        """
+        directory = directory or self.directory
+        path = os.path.join(directory, "{}.json".format(pid))
+        if not os.path.exists(path):
+            return
+        exited = os.path.join(directory, EXITED)
+        states = collections.defaultdict(dict)
+        self._merge_file(states, exited)
+        self._merge_file(states, path)
+        state = {name: [[list(labels), value] for labels, value in values.items()] for name, values in states.items()}
+        descriptor, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(descriptor, "w") as f:
+            json.dump(state, f)
+        os.replace(temporary, exited)
+        os.remove(path)
+
+    def render(self) -> str:
+        """All metrics in Prometheus text format (version 0.0.4)"""
+        states = self._collect()
+        lines = []
+        for name, metric in sorted(self.metrics.items()):
+            lines.append("# HELP {} {}".format(name, metric.documentation))
+            lines.append("# TYPE {} {}".format(name, metric.kind))
+            lines.extend(metric.lines(states.get(name, {})))
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+# forked worker starts from zero, values recorded before fork (warm-up) would be counted once per worker
+os.register_at_fork(after_in_child=registry.reset)
+
+REQUEST_SECONDS = registry.histogram("bike_garage_request_seconds", "Time of handling request by endpoint",
+                                     ("endpoint", "method", "status"))
+VIEW_SECONDS = registry.histogram("bike_garage_view_seconds",
+                                  "Time of handling request without rendering of templates", ("endpoint",))
+RENDER_SECONDS = registry.histogram("bike_garage_template_render_seconds", "Time of rendering template",
+                                    ("template",))
+FETCH_SECONDS = registry.histogram("bike_garage_fetch_seconds", "Time of outbound HTTP request by host",
+                                   ("host",))
+FETCHES = registry.counter("bike_garage_fetches_total", "Outbound HTTP requests by host and status",
+                           ("host", "status"))
+FETCH_BYTES = registry.counter("bike_garage_fetch_bytes_total", "Downloaded bytes by host", ("host",))
+PARSE_SECONDS = registry.histogram("bike_garage_parse_seconds", "Time of parsing downloaded page by parser",
+                                   ("parser",))
+BUILD_SECONDS = registry.histogram("bike_garage_bike_build_seconds",
+                                   "Time of initializing bikes by BikeBuilder", ("operation",),
+                                   buckets=(0.00001, 0.00005, 0.0001, 0.0005) + LATENCY_BUCKETS)
+
+
+def clear_exports(directory):
+    """Removes files exported to directory by processes of previous run"""
+    for file_name in os.listdir(directory):
+        if file_name.endswith(".json"):
+            os.remove(os.path.join(directory, file_name))
+
+
+def timed_get(session, url, **kwargs):
+    """session.get(url) counted in fetch metrics of its host"""
+    host = urlsplit(url).netloc.lower()
+    start = time.perf_counter()
+    try:
+        response = session.get(url, **kwargs)
+    except Exception:
+        FETCHES.inc(1, host, "error")
+        raise
+    content = response.content  # whole body is read, so its download is timed too
+    FETCH_SECONDS.observe(time.perf_counter() - start, host)
+    FETCHES.inc(1, host, str(response.status_code))
+    FETCH_BYTES.inc(len(content), host)
+    return response
+
+
+class SamplingProfiler:
+    """
+    Samples stack of given thread every interval seconds, report lists functions by number of samples in which
+    they were on the stack (inclusive) and on its top (self)
+    """
+
+    def __init__(self, thread_id=None, interval=0.001):
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.interval = interval
+        self.samples = 0
+        self.inclusive = collections.Counter()
+        self.own = collections.Counter()
+        self.stacks = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self, frame):
+        functions = []
+        while frame is not None:
+            code = frame.f_code
+            functions.append("{}:{}({})".format(os.path.basename(code.co_filename), code.co_firstlineno,
+                                                code.co_name))
+            frame = frame.f_back
+        if not functions:
+            return
+        self.samples += 1
+        self.own[functions[0]] += 1
+        self.inclusive.update(set(functions))
+        self.stacks[";".join(reversed(functions))] += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self._sample(frame)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def report(self, top=30) -> str:
+        if not self.samples:
+            return "no samples, profiled code ran shorter than {:.1f} ms\n".format(self.interval * 1000)
+        lines = ["{} samples every {:.1f} ms".format(self.samples, self.interval * 1000), "",
+                 "{:>7} {:>7}  function".format("total", "self")]
+        for function, count in self.inclusive.most_common(top):
+            lines.append("{:>6.1f}% {:>6.1f}%  {}".format(100 * count / self.samples, 100 * self.own[function]
+                                                          / self.samples, function))
+        lines += ["", "collapsed stacks (input of flamegraph.pl):"]
+        lines += ["{} {}".format(stack, count) for stack, count in self.stacks.most_common()]
+        return "\n".join(lines) + "\n"
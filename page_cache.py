@@ -0,0 +1,137 @@
+"""
+Cache of downloaded web pages used by scrapers
+* two tiers - in-process LRU and files on disk, so pages survive restart of app
+* every source (host) can have its own time to live
+* stale pages are revalidated with ETag / If-Modified-Since, unchanged page costs only 304 response
+* hits, misses, revalidations and transferred bytes are counted in stats
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from urllib.parse import urlsplit
+
+from metrics import timed_get
+
+DEFAULT_DIRECTORY = os.environ.get("BIKE_GARAGE_PAGE_CACHE",
+                                   os.path.join(tempfile.gettempdir(), "bike_garage_page_cache"))
+
+
+@dataclass
+class CachedPage:
+    url: str
+    text: str
+    fetched_at: float
+    size: int  # bytes of body as downloaded
+    etag: str = field(default=None)
+    last_modified: str = field(default=None)
+
+
+@dataclass
+class CacheStats:
+    memory_hits: int = field(default=0)
+    disk_hits: int = field(default=0)
+    misses: int = field(default=0)
+    revalidated: int = field(default=0)
+    bytes_downloaded: int = field(default=0)
+    bytes_saved: int = field(default=0)
+
+
+class PageCache:
+    def __init__(self, directory=DEFAULT_DIRECTORY, max_entries=256, default_ttl=600, ttls=None):
+        """directory None keeps pages only in memory, ttls maps host to time to live in seconds"""
+        self.directory = directory
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.ttls = dict(ttls or {})
+        self.stats = CacheStats()
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def ttl(self, url: str) -> float:
+        return self.ttls.get(urlsplit(url).netloc.lower(), self.default_ttl)
+
+    def _path(self, url):
+        return os.path.join(self.directory, hashlib.sha256(url.encode()).hexdigest() + ".json")
+
+    def _remember(self, page):
+        with self._lock:
+            self._memory[page.url] = page
+            self._memory.move_to_end(page.url)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _store(self, page):
+        self._remember(page)
+        if not self.directory:
+            return
+        descriptor, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(descriptor, "w", encoding="utf-8") as f:
+            json.dump(asdict(page), f)
+        os.replace(temporary, self._path(page.url))
+
+    def lookup(self, url: str) -> tuple:
+        """Returns (cached page, "memory" or "disk") - page might be stale, (None, None) when url is not cached"""
+        with self._lock:
+            page = self._memory.get(url)
+            if page is not None:
+                self._memory.move_to_end(url)
+                return page, "memory"
+        if not self.directory:
+            return None, None
+        try:
+            with open(self._path(url), encoding="utf-8") as f:
+                page = CachedPage(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            return None, None
+        self._remember(page)
+        return page, "disk"
+
+    def _count(self, name, value=1):
+        with self._lock:
+            setattr(self.stats, name, getattr(self.stats, name) + value)
+
+    def fetch(self, url: str, session, timeout=10) -> str:
+        """Returns text of page, downloads it only when cached copy is missing or changed"""
+        page, tier = self.lookup(url)
+        now = time.time()
+        if page is not None and now - page.fetched_at < self.ttl(url):
+            self._count(tier + "_hits")
+            self._count("bytes_saved", page.size)
+            return page.text
+
+        headers = {}
+        if page is not None:
+            if page.etag:
+                headers["If-None-Match"] = page.etag
+            if page.last_modified:
+                headers["If-Modified-Since"] = page.last_modified
+        response = timed_get(session, url, headers=headers, timeout=timeout)
+        if page is not None and headers and response.status_code == 304:
+            page.fetched_at = now
+            self._store(page)
+            self._count("revalidated")
+            self._count("bytes_saved", page.size)
+            return page.text
+
+        response.raise_for_status()
+        self._count("misses")
+        self._count("bytes_downloaded", len(response.content))
+        self._store(CachedPage(url=url, text=response.text, fetched_at=now, size=len(response.content),
+                               etag=response.headers.get("ETag"),
+                               last_modified=response.headers.get("Last-Modified")))
+        return response.text
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self.directory:
+            for name in os.listdir(self.directory):
+                if name.endswith(".json"):
+                    os.remove(os.path.join(self.directory, name))
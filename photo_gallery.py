@@ -0,0 +1,290 @@
+"""
+Photos of bikes, gallery of bike is folder with its photos (path_to_gallery of bike_data_format.json)
+* ingestion makes thumbnails of every size in SIZES on pool of processes, request only sends finished files,
+  nothing is resized on request path
+* photos are stored by sha256 of their content, the same photo in two galleries (or uploaded twice) is rendered
+  and stored once
+* folder is ingested incrementally, its manifest remembers digest of every file by its size and mtime, so only new
+  or changed photos are read again, gallery page reads only the manifest
+* thumbnails never change under their url, they are served with immutable Cache-Control, ETag and Range support
+* Pillow is imported only by the processes which render thumbnails
+
+    python photo_gallery.py ~/photos/capra ~/photos/jeffsy  # ingests folders
+    python photo_gallery.py --db bike_garage.db             # ingests galleries of all bikes
+"""
+import argparse
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import re
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from flask import abort, send_file, url_for
+
+from asset_pipeline import CACHE_CONTROL
+
+PHOTO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "photos")
+# name -> longest side in pixels, smaller photos are not enlarged
+SIZES = {"small": 320, "medium": 960, "large": 1920}
+EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".tif", ".tiff", ".bmp", ".gif")
+JPEG_QUALITY = 85
+DIGEST = re.compile(r"[0-9a-f]{64}")
+CHUNK_SIZE = 1024 * 1024
+
+Photo = namedtuple("Photo", "digest name width height")  # width and height of the largest thumbnail
+IngestReport = namedtuple("IngestReport", "photos rendered errors")
+
+
+def file_digest(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def render_thumbnails(source, targets) -> tuple:
+    """
+    Writes thumbnails of source photo to targets ((longest side, path) pairs), returns size of the largest one,
+    runs in worker process
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(source) as image:
+        scale = max(side for side, _ in targets) / max(image.size)
+        # JPEG is decoded at the smallest scale (1/2, 1/4, 1/8) still larger than the largest thumbnail, which
+        # saves most of the work with photos from camera
+        image.draft("RGB", (math.ceil(image.width * scale), math.ceil(image.height * scale)))
+        image = ImageOps.exif_transpose(image).convert("RGB")
+    size = None
+    # every thumbnail is made from the previous, larger one
+    for side, path in sorted(targets, key=lambda target: target[0], reverse=True):
+        image.thumbnail((side, side), Image.LANCZOS)
+        size = size or image.size
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = "{}.{}.tmp".format(path, os.getpid())
+        image.save(temporary, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+        os.replace(temporary, path)  # readers never see half written file
+    return size
+
+
+def thumbnail_size(path) -> tuple:
+    from PIL import Image
+
+    with Image.open(path) as image:  # reads only the header
+        return image.size
+
+
+class PhotoStore:
+    def __init__(self, root=PHOTO_ROOT, sizes=None, max_workers=None):
+        self.root = root
+        self.sizes = dict(sizes or SIZES)
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._executor = None
+        self._background = None
+        self._manifests = {}  # manifest path -> (mtime, photos)
+        self._lock = threading.Lock()
+
+    def close(self):
+        with self._lock:
+            for executor in (self._background, self._executor):
+                if executor is not None:
+                    executor.shutdown(wait=True)
+            self._executor = self._background = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawned workers do not inherit locks and connections of threads of the web server
+                context = multiprocessing.get_context("spawn")
+                self._executor = ProcessPoolExecutor(self.max_workers, mp_context=context)
+            return self._executor
+
+    def path(self, digest, size) -> str:
+        return os.path.join(self.root, size, digest[:2], digest + ".jpg")
+
+    def _targets(self, digest) -> list:
+        return [(side, self.path(digest, size)) for size, side in self.sizes.items()]
+
+    def ingest(self, paths) -> IngestReport:
+        """Renders thumbnails of photos at paths which are not stored yet, files which are not images are errors"""
+        paths = list(paths)
+        if not paths:
+            return IngestReport([], 0, {})
+        pool = self._pool()
+        errors = {}
+        digests = {}
+        for path, future in [(path, pool.submit(file_digest, path)) for path in paths]:
+            try:
+                digests[path] = future.result()
+            except OSError as error:
+                errors[path] = error
+        # identical photos are rendered once, the first path stands for all of them
+        sources = {}
+        for path, digest in digests.items():
+            sources.setdefault(digest, path)
+        largest = max(self.sizes, key=self.sizes.get)
+        futures = {}
+        for digest, path in sources.items():
+            targets = self._targets(digest)
+            if not all(os.path.exists(target) for _, target in targets):
+                futures[digest] = True, pool.submit(render_thumbnails, path, targets)
+            else:
+                futures[digest] = False, pool.submit(thumbnail_size, self.path(digest, largest))
+        sizes = {}
+        rendered = 0
+        for digest, (rendering, future) in futures.items():
+            try:
+                sizes[digest] = future.result()
+            except Exception as error:  # Pillow raises many kinds of errors for broken files
+                errors[sources[digest]] = error
+                continue
+            rendered += rendering
+        photos = []
+        for path, digest in digests.items():
+            if digest in sizes:
+                photos.append(Photo(digest, os.path.basename(path), *sizes[digest]))
+            else:
+                errors[path] = errors[sources[digest]]
+        return IngestReport(photos, rendered, errors)
+
+    def _manifest_path(self, folder) -> str:
+        key = hashlib.sha256(os.path.abspath(folder).encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.root, "galleries", key + ".json")
+
+    def ingest_folder(self, folder) -> IngestReport:
+        """Ingests photos of folder which changed since the last time and writes its manifest"""
+        known = {photo["name"]: photo for photo in self._read_manifest(self._manifest_path(folder))}
+        files = []
+        changed = []
+        for entry in sorted(os.scandir(folder), key=lambda entry: entry.name):
+            if not entry.is_file() or not entry.name.lower().endswith(EXTENSIONS):
+                continue
+            stat = entry.stat()
+            files.append((entry.name, stat.st_size, stat.st_mtime_ns))
+            photo = known.get(entry.name)
+            if photo is None or (photo["bytes"], photo["mtime_ns"]) != (stat.st_size, stat.st_mtime_ns):
+                changed.append(entry.path)
+        report = self.ingest(changed)
+        for photo in report.photos:
+            known[photo.name] = photo._asdict()
+        photos = []
+        for name, size, mtime_ns in files:
+            if os.path.join(folder, name) in report.errors or name not in known:
+                continue
+            photos.append(dict(known[name], bytes=size, mtime_ns=mtime_ns))
+        self._write_manifest(folder, photos)
+        return IngestReport([Photo(*(photo[field] for field in Photo._fields)) for photo in photos],
+                            report.rendered, report.errors)
+
+    def ingest_in_background(self, folder):
+        """Ingests folder on background thread (e.g. from listener of BikeStore), returns Future"""
+        with self._lock:
+            if self._background is None:
+                self._background = ThreadPoolExecutor(max_workers=1, thread_name_prefix="photo-ingest")
+            return self._background.submit(self.ingest_folder, folder)
+
+    def _write_manifest(self, folder, photos):
+        path = self._manifest_path(folder)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = "{}.{}.tmp".format(path, threading.get_ident())
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump({"folder": os.path.abspath(folder), "photos": photos}, f)
+        os.replace(temporary, path)
+
+    def _read_manifest(self, path) -> list:
+        """Photos of manifest, parsed once per change of the file"""
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return []
+        cached = self._manifests.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        with open(path, encoding="utf-8") as f:
+            photos = json.load(f)["photos"]
+        self._manifests[path] = mtime, photos
+        return photos
+
+    def gallery(self, folder) -> list:
+        """Photos of ingested folder in order of names, empty when folder was not ingested yet"""
+        if not folder:
+            return []
+        return [Photo(*(photo[field] for field in Photo._fields))
+                for photo in self._read_manifest(self._manifest_path(folder))]
+
+    def gallery_version(self, folder):
+        """Changes whenever gallery of folder does (mtime of its manifest), None before the first ingestion"""
+        try:
+            return os.stat(self._manifest_path(folder)).st_mtime_ns if folder else None
+        except FileNotFoundError:
+            return None
+
+
+class Photos:
+    """Serves thumbnails of PhotoStore under /photos/<size>/<digest>.jpg"""
+
+    def __init__(self, app=None, store: PhotoStore = None):
+        self.store = store if store is not None else PhotoStore()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.add_url_rule("/photos/<size>/<digest>.jpg", "photo", self.send)
+        app.jinja_env.globals["photo_url"] = self.url
+
+    @staticmethod
+    def url(photo: Photo, size="small") -> str:
+        return url_for("photo", size=size, digest=photo.digest)
+
+    def send(self, size, digest):
+        if size not in self.store.sizes or not DIGEST.fullmatch(digest):
+            abort(404)
+        path = self.store.path(digest, size)
+        if not os.path.isfile(path):
+            abort(404)
+        # conditional send answers If-None-Match with 304 and Range with 206 partial content
+        response = send_file(path, mimetype="image/jpeg", conditional=True, etag="{}-{}".format(digest, size))
+        response.headers["Cache-Control"] = CACHE_CONTROL
+        return response
+
+
+def _bike_galleries(db_path) -> list:
+    from bike_store import BikeStore
+
+    store = BikeStore(db_path)
+    try:
+        return [bike.path_to_gallery for bike in store.scan(subtrees=()) if bike.path_to_gallery]
+    finally:
+        store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("folders", nargs="*")
+    parser.add_argument("--db", help="ingest galleries of all bikes of this BikeStore")
+    parser.add_argument("--root", default=PHOTO_ROOT)
+    parser.add_argument("--workers", type=int)
+    args = parser.parse_args()
+    folders = args.folders + (_bike_galleries(args.db) if args.db else [])
+    with PhotoStore(args.root, max_workers=args.workers) as store:
+        for folder in folders:
+            report = store.ingest_folder(folder)
+            print("{}: {} photos, {} rendered, {} errors".format(folder, len(report.photos), report.rendered,
+                                                                 len(report.errors)))
+            for path, error in report.errors.items():
+                print("    {}: {}".format(path, error))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Caching of rendered pages and page fragments keyed by version of data they show
+* key of page is endpoint, query arguments and version given by view (e.g. version of bike from BikeStore),
+  a change of bike gives new version, so old entries are never served again and fall out of LRU
+* ETag is derived from the key and release (hash of templates and asset manifest), so it is strong and the
+  same in every worker process; matching If-None-Match is answered by 304 without rendering anything
+* fragments are cached from templates: {% call cached_fragment("name", key...) %} ... {% endcall %}
+"""
+import functools
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import Response, request
+from markupsafe import Markup
+
+
+class LRUCache:
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            try:
+                value = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def release(app, extra=None) -> str:
+    """Hash of what changes rendered pages beside data: template sources and extra (e.g. asset manifest)"""
+    digest = hashlib.sha256(repr(extra).encode("utf-8"))
+    for name in sorted(app.jinja_env.list_templates()):
+        source, _, _ = app.jinja_env.loader.get_source(app.jinja_env, name)
+        digest.update(name.encode("utf-8") + b"\0" + source.encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+class ResponseCache:
+    def __init__(self, app=None, max_pages=256, max_fragments=1024, extra=None):
+        self.pages = LRUCache(max_pages)
+        self.fragments = LRUCache(max_fragments)
+        self.enabled = True
+        self.release = None
+        if app is not None:
+            self.init_app(app, extra)
+
+    def init_app(self, app, extra=None):
+        self.release = release(app, extra)
+        app.jinja_env.globals["cached_fragment"] = self.fragment
+
+    def etag(self, key) -> str:
+        return hashlib.sha256(repr((self.release,) + key).encode("utf-8")).hexdigest()[:32]
+
+    def page(self, version):
+        """
+        Decorator of view, version() is called within request and returns hashable version of data shown
+        by the page (for example (bike id, bike version))
+        """
+        def decorator(view):
+            @functools.wraps(view)
+            def cached_view(*args, **kwargs):
+                if not self.enabled:
+                    return view(*args, **kwargs)
+                key = (request.endpoint, tuple(sorted(request.args.items(multi=True))), version())
+                etag = self.etag(key)
+                if request.if_none_match.contains(etag):
+                    response = Response(status=304)
+                else:
+                    body = self.pages.get(key)
+                    if body is None:
+                        body = view(*args, **kwargs)
+                        if not isinstance(body, str):
+                            return body  # redirects and other responses are not cached
+                        body = body.encode("utf-8")
+                        self.pages.set(key, body)
+                    response = Response(body, mimetype="text/html")
+                response.set_etag(etag)
+                response.headers["Cache-Control"] = "no-cache"  # always revalidate, version may change
+                return response
+            return cached_view
+        return decorator
+
+    def fragment(self, name, *key, caller):
+        """Returns cached output of template block, caller renders it on miss"""
+        if not self.enabled:
+            return caller()
+        key = (name,) + key
+        html = self.fragments.get(key)
+        if html is None:
+            html = str(caller())
+            self.fragments.set(key, html)
+        return Markup(html)
+
+    def clear(self):
+        self.pages.clear()
+        self.fragments.clear()
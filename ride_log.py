@@ -0,0 +1,276 @@
+"""
+Ride history of bikes and its import from GPX and CSV files
+* rides are kept in compact columns (array module), not as python object per ride
+* ride ids of every bike are indexed, page of rides of one bike costs only its length, not length of the log
+* files are parsed in chunks, so memory stays bounded no matter how long the history is
+* every imported chunk updates Bike.total_usage and usage of each mounted component just once
+"""
+import array
+import csv
+import datetime
+import functools
+import json
+import math
+import os
+import sys
+import threading
+import time
+from bisect import bisect_right
+from collections import namedtuple
+
+from bike_data import Bike, Usage
+from bike_store import iter_components
+
+Ride = namedtuple("Ride", "start ride_type distance duration elevation")
+
+RIDE_TYPES = ["casual", "high intensity", "bikepark", "jumps", "race"]
+RACE = "race"
+MAX_RIDE_TYPES = 256  # ride_type column stores index in one byte
+CSV_DATE_FORMATS = ("%d. %m. %Y", "%Y-%m-%d", "%Y-%m-%dT%H:%M:%S")
+EARTH_RADIUS = 6371.0088  # km
+
+
+class RideLog:
+    """Append only columnar log of rides of all bikes, ride id is its position in the log"""
+    COLUMNS = (
+        ("bike_id", "l"),
+        ("start", "d"),  # unix timestamp
+        ("ride_type", "B"),  # index to ride_types
+        ("distance", "f"),  # km
+        ("duration", "f"),  # seconds
+        ("elevation", "f"),  # m
+    )
+
+    def __init__(self, ride_types=None):
+        self.ride_types = list(ride_types or RIDE_TYPES)
+        self.columns = {name: array.array(typecode) for name, typecode in self.COLUMNS}
+        self._bike_rides = {}  # bike id -> array of its ride ids, covers the first _indexed rides
+        self._indexed = 0
+        self._index_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.columns["bike_id"])
+
+    def ride_type_code(self, ride_type: str) -> int:
+        ride_type = (ride_type or RIDE_TYPES[0]).strip().lower()
+        if ride_type not in self.ride_types:
+            if len(self.ride_types) >= MAX_RIDE_TYPES:
+                raise ValueError("ride type {} does not fit, log has {} ride types already".format(
+                    ride_type, MAX_RIDE_TYPES))
+            self.ride_types.append(ride_type)
+        return self.ride_types.index(ride_type)
+
+    def append_many(self, bike_id: int, rides):
+        """
+        Appends rides of bike, rides are converted to columns of their own first, so ride which does not fit
+        (e.g. distance None) raises before any column is changed and the log stays consistent
+        """
+        chunk = {name: array.array(typecode) for name, typecode in self.COLUMNS}
+        for ride in rides:
+            chunk["bike_id"].append(bike_id)
+            chunk["start"].append(ride.start)
+            chunk["ride_type"].append(self.ride_type_code(ride.ride_type))
+            chunk["distance"].append(ride.distance)
+            chunk["duration"].append(ride.duration)
+            chunk["elevation"].append(ride.elevation)
+        for name, values in chunk.items():
+            self.columns[name].extend(values)
+
+    def ride(self, ride_id: int) -> Ride:
+        columns = self.columns
+        return Ride(columns["start"][ride_id], self.ride_types[columns["ride_type"][ride_id]],
+                    columns["distance"][ride_id], columns["duration"][ride_id], columns["elevation"][ride_id])
+
+    def ride_ids(self, bike_id):
+        """Ids of rides of bike in ascending order, index is extended only by rides appended since the last call"""
+        with self._index_lock:
+            bike_ids = self.columns["bike_id"]
+            for ride_id in range(self._indexed, len(bike_ids)):
+                rides = self._bike_rides.get(bike_ids[ride_id])
+                if rides is None:
+                    rides = self._bike_rides[bike_ids[ride_id]] = array.array("q")
+                rides.append(ride_id)
+            self._indexed = len(bike_ids)
+            return self._bike_rides.get(bike_id, ())
+
+    def rides(self, bike_id=None, after=-1, limit=None):
+        """Yields (ride id, Ride) with id greater than after, optionally only rides of one bike"""
+        if bike_id is None:
+            ride_ids = range(len(self))
+            start = after + 1
+        else:
+            ride_ids = self.ride_ids(bike_id)
+            start = bisect_right(ride_ids, after)
+        end = len(ride_ids) if limit is None else min(len(ride_ids), start + limit)
+        for position in range(max(start, 0), end):
+            yield ride_ids[position], self.ride(ride_ids[position])
+
+    def save(self, path):
+        header = {"count": len(self), "ride_types": self.ride_types,
+                  "columns": [[name, typecode] for name, typecode in self.COLUMNS]}
+        temporary = path + ".tmp"
+        with open(temporary, "wb") as f:
+            f.write(json.dumps(header).encode() + b"\n")
+            for name, _ in self.COLUMNS:
+                self.columns[name].tofile(f)
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            header = json.loads(f.readline())
+            log = cls(header["ride_types"])
+            for name, typecode in header["columns"]:
+                log.columns[name] = array.array(typecode)
+                log.columns[name].fromfile(f, header["count"])
+        return log
+
+
+def _number(value) -> float:
+    value = (value or "").strip().lower()
+    for unit in ("km", "mil", "ft", "m"):
+        if value.endswith(unit):
+            value = value[:-len(unit)]
+            break
+    return float(value.replace(",", ".")) if value else 0.0
+
+
+def _duration(value) -> float:
+    """Seconds from "%H:%M", "%H:%M:%S" or plain number of seconds"""
+    parts = (value or "0").strip().split(":")
+    seconds = 0.0
+    for part in parts:
+        seconds = seconds * 60 + float(part)
+    return seconds * 60 if len(parts) == 2 else seconds
+
+
+@functools.lru_cache(maxsize=4096)
+def _start(value) -> float:
+    value = value.strip()
+    for date_format in CSV_DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(value, date_format).timestamp()
+        except ValueError:
+            continue
+    return datetime.datetime.fromisoformat(value).timestamp()
+
+
+def read_csv(fp, chunk_size=1000):
+    """Yields lists of at most chunk_size rides from CSV with columns described by ride_data of /usage"""
+    reader = csv.DictReader(fp)
+    chunk = []
+    for row in reader:
+        row = {key.strip().lower(): value for key, value in row.items() if key}
+        chunk.append(Ride(start=_start(row["date"]),
+                          ride_type=row.get("ride type") or RIDE_TYPES[0],
+                          distance=_number(row.get("distance")),
+                          duration=_duration(row.get("duration")),
+                          elevation=_number(row.get("elevation gain"))))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _haversine(lat1, lon1, lat2, lon2) -> float:
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS * math.asin(math.sqrt(a))
+
+
+def read_gpx(source, ride_type=RIDE_TYPES[0]) -> Ride:
+    """Summarizes GPX track into single ride, track points are discarded as soon as they are read"""
+    import xml.etree.ElementTree as ElementTree
+
+    distance = elevation = 0.0
+    previous = None
+    first_time = last_time = None
+    for _, element in ElementTree.iterparse(source, events=("end",)):
+        if not element.tag.endswith("trkpt"):
+            continue
+        lat, lon = float(element.get("lat")), float(element.get("lon"))
+        ele = time_text = None
+        for child in element:
+            if child.tag.endswith("ele"):
+                ele = float(child.text)
+            elif child.tag.endswith("time"):
+                time_text = child.text
+        if previous is not None:
+            distance += _haversine(previous[0], previous[1], lat, lon)
+            if ele is not None and previous[2] is not None and ele > previous[2]:
+                elevation += ele - previous[2]
+        previous = (lat, lon, ele)
+        if time_text:
+            moment = datetime.datetime.fromisoformat(time_text.replace("Z", "+00:00"))
+            first_time = first_time or moment
+            last_time = moment
+        element.clear()
+    start = first_time.timestamp() if first_time else 0.0
+    duration = (last_time - first_time).total_seconds() if first_time else 0.0
+    return Ride(start, ride_type, distance, duration, elevation)
+
+
+def _add_usage(usage, hours, distance, races):
+    usage.hours = (usage.hours or 0) + hours
+    usage.distance = (usage.distance or 0) + distance
+    usage.races = (usage.races or 0) + races
+
+
+def apply_usage(bike: Bike, rides) -> Usage:
+    """Adds totals of rides to bike and all its mounted components, returns the added usage"""
+    delta = Usage()
+    for ride in rides:
+        delta.hours += ride.duration / 3600
+        delta.distance += ride.distance
+        delta.races += ride.ride_type == RACE
+    if bike.total_usage is None:
+        bike.total_usage = Usage()
+    _add_usage(bike.total_usage, delta.hours, delta.distance, delta.races)
+    for _, component in iter_components(bike.components):
+        if component.usage is None:
+            component.usage = Usage()
+        _add_usage(component.usage, delta.hours, delta.distance, delta.races)
+    return delta
+
+
+def ingest(log: RideLog, bike_id: int, bike: Bike, chunks) -> int:
+    """Stores chunks of rides into log and updates usage of bike, returns number of rides"""
+    count = 0
+    for chunk in chunks:
+        log.append_many(bike_id, chunk)
+        apply_usage(bike, chunk)
+        count += len(chunk)
+    return count
+
+
+def read_file(path, chunk_size=1000):
+    if path.lower().endswith(".gpx"):
+        yield [read_gpx(path)]
+    else:
+        with open(path, newline="", encoding="utf-8") as fp:
+            yield from read_csv(fp, chunk_size)
+
+
+def main(argv):
+    from bike_store import BikeStore
+
+    if len(argv) < 5:
+        print("usage: python ride_log.py <database> <ride log> <bike id> <rides.csv|ride.gpx>...")
+        return 2
+    store = BikeStore(argv[1])
+    log = RideLog.load(argv[2]) if os.path.exists(argv[2]) else RideLog()
+    bike_id = int(argv[3])
+    bike = store.get(bike_id)
+    start = time.perf_counter()
+    count = sum(ingest(log, bike_id, bike, read_file(path)) for path in argv[4:])
+    store.update(bike_id, bike)
+    log.save(argv[2])
+    store.close()
+    seconds = time.perf_counter() - start
+    print("imported {} rides in {:.2f} s ({:.0f} rides/s)".format(count, seconds, count / (seconds or 1e-9)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
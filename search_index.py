@@ -0,0 +1,379 @@
+"""
+In-process full text search over components of bikes, wishlist items and titles of scraped catalog entries
+* inverted index: every term has array of ids of entries containing it, ids only grow, so the arrays stay sorted
+  and adding entry is an append to few arrays
+* changed or removed entry is only marked dead and skipped by queries, arrays are compacted once dead entries
+  outnumber live ones
+* query word matches terms it is prefix of (search as you type) and, when it is at least FUZZY_MIN characters
+  long, terms within one edit (symmetric delete dictionary, vocabulary is never scanned)
+* entry has to match every query word, score is sum of idf of matched terms weighted by quality of match and by
+  field (brand, model and title count more than specs), shorter entries win ties
+* candidates come from the rarest word, the others are only looked up for them (binary search in long arrays),
+  so query stays in milliseconds even when common words match hundreds of thousands of entries
+"""
+import array
+import bisect
+import heapq
+import math
+import re
+import threading
+from collections import namedtuple
+from dataclasses import fields
+from enum import Enum
+
+import numpy as np
+
+from bike_data import Component
+from bike_store import iter_components
+
+Entry = namedtuple("Entry", "key kind title detail url")
+Hit = namedtuple("Hit", Entry._fields + ("score",))
+
+KINDS = ("component", "wishlist", "catalog")
+WORD = re.compile(r"[^\W_]+")
+MIN_PREFIX = 2  # shorter words match only whole terms
+FUZZY_MIN = 4
+MAX_EXPANSIONS = 32  # terms matched by one query word, the most frequent ones are kept
+PREFIX_QUALITY = 0.5  # completion of prefix scores between this and exact match, the longer prefix the more
+FUZZY_QUALITY = 0.6
+DETAIL_WEIGHT = 0.5
+LENGTH_WEIGHT = 0.05
+# component fields which are not its specs
+NOT_SPECS = ("brand", "model", "usage")
+
+
+def words(text) -> list:
+    return WORD.findall(str(text or "").casefold())
+
+
+def _deletes(term):
+    return {term[:index] + term[index + 1:] for index in range(len(term))}
+
+
+def _one_edit(first, second) -> bool:
+    """True when strings differ by one insertion, deletion, substitution or swap of neighbouring characters"""
+    if abs(len(first) - len(second)) > 1 or first == second:
+        return False
+    if len(first) > len(second):
+        first, second = second, first
+    start = 0
+    while start < len(first) and first[start] == second[start]:
+        start += 1
+    if len(first) < len(second):
+        return first[start:] == second[start + 1:]
+    if first[start + 1:] == second[start + 1:]:
+        return True
+    swapped = first[:start] + first[start + 1:start + 2] + first[start] + first[start + 2:]
+    return swapped == second
+
+
+def _spec(value) -> str:
+    if isinstance(value, Enum):
+        return str(value.value)
+    if isinstance(value, (set, frozenset, list, tuple)):
+        return " ".join(str(item) for item in value)
+    return str(value)
+
+
+def component_specs(component: Component) -> str:
+    """Values of fields of component other than brand, model, usage and nested components, flags by name"""
+    specs = []
+    for _field in fields(component):
+        value = getattr(component, _field.name)
+        if _field.name in NOT_SPECS or value is None or isinstance(value, (Component, type)):
+            continue
+        if isinstance(value, bool):
+            if value:
+                specs.append(_field.name.strip("_").replace("_", " "))
+        else:
+            specs.append(_spec(value))
+    return " ".join(specs)
+
+
+class SearchIndex:
+    def __init__(self, capacity=1024):
+        self._terms = {}  # term -> term id
+        self._vocabulary = []  # term id -> term
+        self._sorted = []  # terms in order, for prefix lookup
+        self._unsorted = []  # terms added since last query, merged into _sorted by it
+        self._prefixes = {}  # prefix -> ids of its most frequent completions, dropped when new term starts with it
+        self._postings = []  # term id -> array of entry id << 1 | 1 when term is only in detail
+        self._deletes = {}  # term with one character deleted -> term ids
+        self._entries = []  # entry id -> Entry, None once removed
+        self._ids = {}  # key -> entry id
+        self._bike_keys = {}  # bike id -> keys of entries of its components
+        self._norms = np.zeros(capacity, dtype=np.float32)  # zero for removed entries
+        self._kinds = np.zeros(capacity, dtype=np.uint8)
+        self._scratch = np.zeros(capacity, dtype=np.float32)  # zeroed again after every use
+        self._dead = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, key):
+        return key in self._ids
+
+    def get(self, key):
+        entry_id = self._ids.get(key)
+        return None if entry_id is None else self._entries[entry_id]
+
+    def _term_id(self, term):
+        term_id = self._terms.get(term)
+        if term_id is None:
+            term_id = self._terms[term] = len(self._vocabulary)
+            self._vocabulary.append(term)
+            self._postings.append(array.array("i"))
+            self._unsorted.append(term)
+            if len(term) >= FUZZY_MIN:
+                for deleted in _deletes(term):
+                    self._deletes.setdefault(deleted, []).append(term_id)
+        return term_id
+
+    def _grow(self, size):
+        if size <= len(self._norms):
+            return
+        grow = max(size, 2 * len(self._norms)) - len(self._norms)
+        self._norms = np.concatenate([self._norms, np.zeros(grow, dtype=np.float32)])
+        self._kinds = np.concatenate([self._kinds, np.zeros(grow, dtype=np.uint8)])
+        self._scratch = np.zeros(len(self._norms), dtype=np.float32)
+
+    def _remove(self, key):
+        entry_id = self._ids.pop(key, None)
+        if entry_id is None:
+            return False
+        self._entries[entry_id] = None
+        self._norms[entry_id] = 0
+        self._dead += 1
+        return True
+
+    def _add(self, entry: Entry) -> bool:
+        entry_id = self._ids.get(entry.key)
+        if entry_id is not None:
+            if self._entries[entry_id] == entry:
+                return False
+            self._remove(entry.key)
+        terms = dict.fromkeys(words(entry.title), 0)
+        for term in words(entry.detail):
+            terms.setdefault(term, 1)
+        entry_id = len(self._entries)
+        self._entries.append(entry)
+        self._ids[entry.key] = entry_id
+        self._grow(entry_id + 1)
+        self._norms[entry_id] = 1 / (1 + LENGTH_WEIGHT * len(terms)) if terms else 0
+        self._kinds[entry_id] = KINDS.index(entry.kind)
+        for term, in_detail in terms.items():
+            self._postings[self._term_id(term)].append(entry_id << 1 | in_detail)
+        return True
+
+    def add(self, key, kind, title, detail="", url=None) -> bool:
+        """Adds entry or replaces entry with the same key, returns False when the same entry is already indexed"""
+        return self.add_many([Entry(key, kind, title, detail, url)]) > 0
+
+    def add_many(self, entries) -> int:
+        """entries are Entry tuples, returns number of added or changed ones"""
+        with self._lock:
+            added = sum(self._add(Entry(*entry)) for entry in entries)
+            self._compact_if_needed()
+        return added
+
+    def remove(self, key) -> bool:
+        with self._lock:
+            removed = self._remove(key)
+            self._compact_if_needed()
+        return removed
+
+    def update_bike(self, bike_id, bike):
+        """Re-indexes components of bike, bike None removes them (signature of BikeStore listener)"""
+        entries = []
+        if bike is not None:
+            name = " ".join(str(value) for value in (bike.users_name, bike.brand, bike.model) if value)
+            for slot, component in iter_components(bike.components):
+                if component.brand or component.model:
+                    title = " ".join(value for value in (component.brand, component.model) if value)
+                    detail = " ".join((slot.replace(".", " ").replace("_", " "), component_specs(component), name))
+                    entries.append(Entry(("component", bike_id, slot), "component", title, detail, None))
+        keys = {entry.key for entry in entries}
+        with self._lock:
+            for key in self._bike_keys.pop(bike_id, set()) - keys:
+                self._remove(key)
+            if keys:
+                self._bike_keys[bike_id] = keys
+            for entry in entries:
+                self._add(entry)
+            self._compact_if_needed()
+
+    def add_wishlist_items(self, items) -> int:
+        """items are WishlistItem tuples of wishlist_monitor"""
+        return self.add_many(Entry(("wishlist", item.item_id), "wishlist", item.name, item.user, item.url)
+                             for item in items)
+
+    def add_catalog_results(self, results) -> int:
+        """results are SearchResult tuples of shop_search, entries are keyed by link"""
+        return self.add_many(Entry(("catalog", result.link), "catalog", result.title, result.shop, result.link)
+                             for result in results)
+
+    def _compact_if_needed(self):
+        if self._dead > max(1024, len(self._ids)):
+            self._compact()
+
+    def compact(self):
+        """Drops removed entries from arrays of terms, ids of entries change"""
+        with self._lock:
+            self._compact()
+
+    def _compact(self):
+        live = np.array([entry is not None for entry in self._entries], dtype=bool)
+        new_ids = np.full(len(self._entries), -1, dtype=np.int64)
+        new_ids[live] = np.arange(int(live.sum()))
+        for term_id, postings in enumerate(self._postings):
+            if not postings:
+                continue
+            packed = np.frombuffer(postings, dtype=np.int32)
+            moved = new_ids[packed >> 1]
+            kept = moved >= 0
+            compacted = array.array("i")
+            compacted.frombytes(((moved[kept] << 1) | (packed[kept] & 1)).astype(np.int32).tobytes())
+            del packed  # array of term can not be replaced while numpy view of it exists
+            self._postings[term_id] = compacted
+        rows = np.flatnonzero(live)
+        size = len(rows)
+        self._norms[:size] = self._norms[rows]
+        self._norms[size:] = 0
+        self._kinds[:size] = self._kinds[rows]
+        self._entries = [self._entries[row] for row in rows]
+        self._ids = {entry.key: entry_id for entry_id, entry in enumerate(self._entries)}
+        self._dead = 0
+        self._prefixes = {}
+
+    def _completions(self, word) -> list:
+        """Ids of at most MAX_EXPANSIONS terms starting with word, the most frequent ones"""
+        if self._unsorted:
+            if len(self._unsorted) < 64:
+                for term in self._unsorted:
+                    bisect.insort(self._sorted, term)
+            else:
+                self._sorted = sorted(self._sorted + self._unsorted)  # merge of two sorted runs
+            for term in self._unsorted:
+                for end in range(MIN_PREFIX, len(term) + 1):
+                    self._prefixes.pop(term[:end], None)
+            self._unsorted = []
+        term_ids = self._prefixes.get(word)
+        if term_ids is None:
+            start = bisect.bisect_left(self._sorted, word)
+            end = bisect.bisect_left(self._sorted, word + "\U0010ffff", start)
+            term_ids = [self._terms[term] for term in self._sorted[start:end]]
+            if len(term_ids) > MAX_EXPANSIONS:
+                # frequencies change with every added entry, cached choice is refreshed only by new terms
+                frequencies = np.array([len(self._postings[term_id]) for term_id in term_ids])
+                term_ids = [term_ids[index] for index in np.argpartition(-frequencies, MAX_EXPANSIONS - 1)[
+                    :MAX_EXPANSIONS]]
+            if len(self._prefixes) >= 4096:
+                self._prefixes = {}
+            self._prefixes[word] = term_ids
+        return term_ids
+
+    def _fuzzy(self, word):
+        candidates = set(self._deletes.get(word, ()))  # word misses one character
+        for deleted in _deletes(word):
+            term_id = self._terms.get(deleted)  # word has one extra character
+            if term_id is not None:
+                candidates.add(term_id)
+            candidates.update(self._deletes.get(deleted, ()))  # substituted or swapped character
+        return [term_id for term_id in candidates if _one_edit(word, self._vocabulary[term_id])]
+
+    def _expand(self, word) -> list:
+        """(term id, weight) of terms matched by query word, weight is idf times quality of match"""
+        qualities = {}
+        term_id = self._terms.get(word)
+        if term_id is not None:
+            qualities[term_id] = 1.0
+        if len(word) >= MIN_PREFIX:
+            for term_id in self._completions(word):
+                qualities.setdefault(term_id, PREFIX_QUALITY + (1 - PREFIX_QUALITY) * len(word)
+                                     / len(self._vocabulary[term_id]))
+        if len(word) >= FUZZY_MIN:
+            for term_id in self._fuzzy(word):
+                qualities.setdefault(term_id, FUZZY_QUALITY)
+        matched = [term_id for term_id in qualities if self._postings[term_id]]
+        if len(matched) > MAX_EXPANSIONS:
+            matched = heapq.nlargest(MAX_EXPANSIONS, matched, key=lambda term_id: len(self._postings[term_id]))
+        count = len(self._ids)
+        return [(term_id, qualities[term_id] * math.log(1 + count / len(self._postings[term_id])))
+                for term_id in matched]
+
+    def _first_word(self, expansion):
+        """
+        Candidate entry ids and their weights for the rarest query word, entry matched by more terms of the word is
+        there once for each of them
+        """
+        packed = [np.frombuffer(self._postings[term_id], dtype=np.int32) for term_id, _ in expansion]
+        weights = np.repeat(np.array([weight for _, weight in expansion], dtype=np.float32),
+                            [len(part) for part in packed])
+        packed = np.concatenate(packed)
+        ids = packed >> 1
+        weights[(packed & 1).astype(bool)] *= DETAIL_WEIGHT
+        return ids, weights
+
+    def _word_weights(self, expansion, ids):
+        """Best weight of word for every candidate entry id, zero when it does not match"""
+        best = np.zeros(len(ids), dtype=np.float32)
+        keys = ids << 1
+        short = []
+        for term_id, weight in expansion:
+            packed = np.frombuffer(self._postings[term_id], dtype=np.int32)
+            if len(packed) <= 8 * len(ids):
+                short.append((packed, weight))
+                continue
+            # few candidates, binary search for them in the long array
+            positions = np.minimum(np.searchsorted(packed, keys), len(packed) - 1)
+            found = packed[positions]
+            weights = np.where(found & 1, weight * DETAIL_WEIGHT, weight) * ((found >> 1) == ids)
+            np.maximum(best, weights, out=best)
+        if short:
+            # short arrays are scattered into dense scratch array at once
+            packed = np.concatenate([part for part, _ in short])
+            weights = np.repeat(np.array([weight for _, weight in short], dtype=np.float32),
+                                [len(part) for part, _ in short])
+            weights[(packed & 1).astype(bool)] *= DETAIL_WEIGHT
+            scratch = self._scratch
+            np.maximum.at(scratch, packed >> 1, weights)
+            np.maximum(best, scratch[ids], out=best)
+            scratch[packed >> 1] = 0
+        return best
+
+    def search(self, query, limit=10, kinds=None) -> list:
+        """Returns Hits of entries matching every word of query (the last one can be unfinished), best first"""
+        query_words = list(dict.fromkeys(words(query)))
+        if not query_words or limit <= 0:
+            return []
+        with self._lock:
+            expansions = [self._expand(word) for word in query_words]
+            if not all(expansions):
+                return []
+            expansions.sort(key=lambda expansion: sum(len(self._postings[term_id]) for term_id, _ in expansion))
+            ids, scores = self._first_word(expansions[0])
+            for expansion in expansions[1:]:
+                if not len(ids):
+                    break
+                weights = self._word_weights(expansion, ids)
+                matched = weights > 0
+                ids, scores = ids[matched], scores[matched] + weights[matched]
+            scores = scores * self._norms[ids]
+            if kinds is not None:
+                scores[~np.isin(self._kinds[ids], [KINDS.index(kind) for kind in kinds])] = 0
+            # copies of entry differ only by weight of the first word, the best one is among the best
+            # limit * (number of terms of the first word) candidates
+            size = min(int(np.count_nonzero(scores)), limit * len(expansions[0]))
+            if not size:
+                return []
+            best = np.argpartition(-scores, size - 1)[:size]
+            best = best[np.lexsort((ids[best], -scores[best]))]
+            hits = {}
+            for row in best:
+                entry_id = int(ids[row])
+                if entry_id not in hits:
+                    hits[entry_id] = Hit(*self._entries[entry_id], score=float(scores[row]))
+                    if len(hits) == limit:
+                        break
+            return list(hits.values())
@@ -0,0 +1,245 @@
+"""
+Production server of web gui
+* pre-fork: listening socket, app, templates and data store are prepared in master process, workers are forked
+  from it and share that memory copy-on-write (gc.freeze keeps collector from writing to the shared objects)
+* app is warmed up before fork by rendering warm-up pages, so every worker starts with compiled templates and
+  filled page caches
+* every worker serves requests on a bounded number of threads, resources which must not cross fork (SQLite
+  connection) are closed before it and reopened in the worker
+* SIGTERM / SIGINT stops accepting, requests in flight are finished (up to graceful timeout) and workers exit,
+  worker which dies on its own is replaced
+* configuration comes from environment (BIKE_GARAGE_HOST, _PORT, _WORKERS, _THREADS, _KEEPALIVE,
+  _GRACEFUL_TIMEOUT, _WARMUP, _ACCESS_LOG, _DEBUG), see Config
+
+    BIKE_GARAGE_WORKERS=4 BIKE_GARAGE_PORT=8000 python main.py
+"""
+import gc
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+from dataclasses import dataclass, field
+
+from werkzeug.serving import ThreadedWSGIServer, WSGIRequestHandler
+
+log = logging.getLogger("bike_garage.server")
+
+ENVIRONMENT_PREFIX = "BIKE_GARAGE_"
+DEFAULT_WARMUP = ("/", "/usage", "/components/", "/setup/", "/wishlist/", "/gallery/")
+
+
+def _flag(value: str) -> bool:
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+@dataclass
+class Config:
+    host: str = field(default="127.0.0.1")
+    port: int = field(default=5000)
+    workers: int = field(default=os.cpu_count() or 1)
+    threads: int = field(default=8)
+    keepalive: float = field(default=5.0)  # idle keep-alive connection is closed after this many seconds
+    graceful_timeout: float = field(default=30.0)
+    backlog: int = field(default=1024)
+    warmup: tuple = field(default=DEFAULT_WARMUP)
+    access_log: bool = field(default=False)
+    debug: bool = field(default=False)
+
+    @classmethod
+    def from_environ(cls, environ=None):
+        """Config with values of BIKE_GARAGE_<NAME> variables (e.g. BIKE_GARAGE_WORKERS=4), defaults for the rest"""
+        environ = os.environ if environ is None else environ
+        config = cls()
+        for name, kind in (("host", str), ("port", int), ("workers", int), ("threads", int),
+                           ("keepalive", float), ("graceful_timeout", float), ("backlog", int)):
+            value = environ.get(ENVIRONMENT_PREFIX + name.upper())
+            if value:
+                setattr(config, name, kind(value))
+        warmup = environ.get(ENVIRONMENT_PREFIX + "WARMUP")
+        if warmup is not None:
+            config.warmup = tuple(path.strip() for path in warmup.split(",") if path.strip())
+        for name in ("access_log", "debug"):
+            value = environ.get(ENVIRONMENT_PREFIX + name.upper())
+            if value:
+                setattr(config, name, _flag(value))
+        if config.workers < 1 or config.threads < 1:
+            raise ValueError("BIKE_GARAGE_WORKERS and BIKE_GARAGE_THREADS have to be at least 1")
+        return config
+
+
+class _RequestHandler(WSGIRequestHandler):
+    def setup(self):
+        self.timeout = self.server.keepalive
+        super().setup()
+
+    def handle_one_request(self):
+        super().handle_one_request()
+        if self.server.stopping:
+            # keep-alive connection would hold the worker until client closes it
+            self.close_connection = True
+
+    def log_request(self, code="-", size="-"):
+        if self.server.access_log:
+            super().log_request(code, size)
+
+    def log_error(self, format, *args):
+        # idle keep-alive connection closed after timeout is not an error
+        if not format.startswith("Request timed out"):
+            super().log_error(format, *args)
+
+
+class _WorkerServer(ThreadedWSGIServer):
+    """Serves requests from inherited listening socket on at most `threads` threads at once"""
+    daemon_threads = False
+    block_on_close = True  # server_close() waits for requests in flight
+
+    def __init__(self, app, listener: socket.socket, config: Config):
+        host, port = listener.getsockname()[:2]
+        super().__init__(host, port, app, _RequestHandler, fd=listener.fileno())
+        self.keepalive = config.keepalive
+        self.access_log = config.access_log
+        self.stopping = False
+        self._slots = threading.BoundedSemaphore(config.threads)
+
+    def process_request(self, request, client_address):
+        # when all threads are busy the worker stops accepting and connections go to other workers
+        self._slots.acquire()
+        try:
+            super().process_request(request, client_address)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self._slots.release()
+
+    def stop(self):
+        self.stopping = True
+        # shutdown() waits for serve_forever() loop, so it can not be called from the thread running it
+        threading.Thread(target=self.shutdown, daemon=True).start()
+
+
+class Server:
+    """
+    Pre-fork server of WSGI (Flask) app. before_fork is called in master after warm-up, after_fork in every
+    worker before it starts serving, after_exit in master with pid of every worker which exited.
+    """
+
+    def __init__(self, app, config: Config = None, before_fork=None, after_fork=None, after_exit=None):
+        self.app = app
+        self.config = config or Config.from_environ()
+        self.before_fork = before_fork
+        self.after_fork = after_fork
+        self.after_exit = after_exit
+        self.listener = None
+        self.workers = {}  # pid -> start time
+        self.stopping = False
+
+    def bind(self):
+        family = socket.AF_INET6 if ":" in self.config.host else socket.AF_INET
+        listener = socket.socket(family, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind((self.config.host, self.config.port))
+        listener.listen(self.config.backlog)
+        self.listener = listener
+        return listener
+
+    @property
+    def address(self):
+        return self.listener.getsockname()[:2]
+
+    def warm_up(self) -> list:
+        """Compiles all templates and requests warm-up pages, returns (path, status, seconds)"""
+        if hasattr(self.app, "jinja_env"):
+            for name in self.app.jinja_env.list_templates():
+                self.app.jinja_env.get_template(name)
+        results = []
+        client = self.app.test_client()
+        for path in self.config.warmup:
+            start = time.perf_counter()
+            response = client.get(path)
+            response.close()
+            results.append((path, response.status_code, time.perf_counter() - start))
+        return results
+
+    def run(self):
+        """Prepares app, forks workers and supervises them until SIGTERM / SIGINT, returns after all exited"""
+        if self.listener is None:
+            self.bind()
+        for path, status, seconds in self.warm_up():
+            log.info("warm-up %s %s in %.1f ms", path, status, seconds * 1000)
+        if self.before_fork is not None:
+            self.before_fork()
+        gc.collect()
+        gc.freeze()  # objects created so far are never touched by collector, their pages stay shared
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        signal.signal(signal.SIGALRM, self._kill)
+        log.info("serving on http://%s:%s with %d workers of %d threads", *self.address, self.config.workers,
+                 self.config.threads)
+        for _ in range(self.config.workers):
+            self._spawn()
+        self._supervise()
+        self.listener.close()
+        log.info("stopped")
+
+    def _spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                self._work()
+            except BaseException:
+                log.exception("worker %d failed", os.getpid())
+                os._exit(1)
+            os._exit(0)
+        self.workers[pid] = time.monotonic()
+
+    def _work(self):
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGALRM):
+            signal.signal(signum, signal.SIG_DFL)  # handlers of master, worker exits until it is serving
+        server = _WorkerServer(self.app, self.listener, self.config)
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *_: server.stop())
+        if self.after_fork is not None:
+            self.after_fork()
+        server.serve_forever()  # closes server and waits for requests in flight at the end
+
+    def _supervise(self):
+        while self.workers:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            started = self.workers.pop(pid, None)
+            if started is not None and self.after_exit is not None:
+                try:
+                    self.after_exit(pid)
+                except Exception:
+                    log.exception("after_exit of worker %d failed", pid)
+            if started is None or self.stopping:
+                continue
+            log.warning("worker %d exited with status %d, starting new one", pid, os.waitstatus_to_exitcode(status))
+            if time.monotonic() - started < 1:
+                time.sleep(1)  # worker failing right after start would be restarted in tight loop
+            if not self.stopping:
+                self._spawn()
+        signal.setitimer(signal.ITIMER_REAL, 0)
+
+    def _stop(self, *_):
+        if self.stopping:
+            return
+        self.stopping = True
+        log.info("stopping, waiting up to %.0f s for requests in flight", self.config.graceful_timeout)
+        for pid in self.workers:
+            os.kill(pid, signal.SIGTERM)
+        signal.setitimer(signal.ITIMER_REAL, self.config.graceful_timeout)
+
+    def _kill(self, *_):
+        for pid in self.workers:
+            log.warning("worker %d did not stop in time, killing it", pid)
+            os.kill(pid, signal.SIGKILL)
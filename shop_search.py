@@ -0,0 +1,150 @@
+"""
+Searching for bikes and replacement parts in several shops at once
+* every shop is an adapter which builds search url and parses the results page (like search_bike_vital)
+* requests run on thread pool and share one session with pooled keep-alive connections
+* number of parallel requests to one host is limited and every request has timeout
+* results of all shops are merged and deduplicated by link
+* requests is imported when the first SearchEngine is created
+* results can be added to SearchIndex, so titles of seen catalog entries can be searched without asking the shops again
+"""
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import urljoin, urlsplit
+
+from bike_data import Bike
+from metrics import PARSE_SECONDS, timed_get
+from web_scraper import VITAL_MTB_SEARCH, parse_vital_results, search_terms
+
+SearchResult = namedtuple("SearchResult", "title link shop")
+SearchReport = namedtuple("SearchReport", "results errors")
+
+
+class ShopAdapter:
+    name = None
+    search_url = None
+
+    def __init__(self, name=None, search_url=None):
+        if name:
+            self.name = name
+        if search_url:
+            self.search_url = search_url
+
+    def url(self, search_by: list) -> str:
+        return self.search_url.format("+".join(search_by))
+
+    def parse(self, html_page: str, search_by: list) -> list:
+        """Returns [title, link] pairs found on results page"""
+        raise NotImplementedError
+
+
+class VitalMtbAdapter(ShopAdapter):
+    name = "Vital MTB"
+    search_url = VITAL_MTB_SEARCH
+
+    def parse(self, html_page, search_by):
+        return parse_vital_results(html_page, search_by)
+
+
+def normalize_link(link: str) -> str:
+    parts = urlsplit(link)
+    return "{}://{}{}?{}".format(parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip("/"), parts.query)
+
+
+class SearchEngine:
+    def __init__(self, adapters=None, max_workers=8, per_host=2, timeout=10, cache=None, index=None):
+        """
+        cache is optional PageCache, pages are then downloaded only when changed, results are added to optional
+        SearchIndex index
+        """
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.adapters = list(adapters) if adapters else [VitalMtbAdapter()]
+        self.cache = cache
+        self.index = index
+        self.per_host = per_host
+        self.timeout = timeout
+        self.session = requests.Session()
+        pooled = HTTPAdapter(pool_connections=max(len(self.adapters), 1), pool_maxsize=max_workers)
+        self.session.mount("http://", pooled)
+        self.session.mount("https://", pooled)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="shop-search")
+        self._host_limits = {}
+        self._lock = threading.Lock()
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @contextmanager
+    def _host_limit(self, url):
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            if host not in self._host_limits:
+                self._host_limits[host] = threading.BoundedSemaphore(self.per_host)
+            limit = self._host_limits[host]
+        with limit:
+            yield
+
+    def fetch(self, url: str) -> str:
+        with self._host_limit(url):
+            if self.cache is not None:
+                return self.cache.fetch(url, self.session, timeout=self.timeout)
+            response = timed_get(self.session, url, timeout=self.timeout)
+        response.raise_for_status()
+        return response.text
+
+    def _search_shop(self, adapter, search_by):
+        url = adapter.url(search_by)
+        html_page = self.fetch(url)
+        with PARSE_SECONDS.time(adapter.name):
+            parsed = adapter.parse(html_page, search_by)
+        return [SearchResult(title, urljoin(url, link), adapter.name) for title, link in parsed]
+
+    def _submit(self, search_by):
+        return [(adapter, self._executor.submit(self._search_shop, adapter, search_by)) for adapter in self.adapters]
+
+    @staticmethod
+    def _merge(futures) -> SearchReport:
+        import requests
+
+        results = []
+        errors = {}
+        seen = set()
+        for adapter, future in futures:
+            try:
+                shop_results = future.result()
+            except (requests.RequestException, ValueError) as error:
+                errors[adapter.name] = error
+                continue
+            for result in shop_results:
+                key = normalize_link(result.link)
+                if key not in seen:
+                    seen.add(key)
+                    results.append(result)
+        return SearchReport(results, errors)
+
+    def _indexed(self, report: SearchReport) -> SearchReport:
+        if self.index is not None:
+            self.index.add_catalog_results(report.results)
+        return report
+
+    def search_terms(self, search_by: list) -> SearchReport:
+        return self._indexed(self._merge(self._submit(search_by)))
+
+    def search(self, bike: Bike) -> SearchReport:
+        """Searches all shops concurrently, results are in order of adapters, failed shops are in errors"""
+        return self.search_terms(search_terms(bike))
+
+    def search_many(self, bikes) -> list:
+        """Searches for all bikes at once, returns SearchReport for every bike"""
+        pending = [self._submit(search_terms(bike)) for bike in bikes]
+        return [self._indexed(self._merge(futures)) for futures in pending]
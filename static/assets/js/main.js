@@ -55,6 +55,63 @@
     })
   }
 
+  /**
+   * Search as you type, requests are debounced and answers of stale queries are dropped
+   */
+  const searchForm = select('.search-form[data-search-url]')
+  if (searchForm) {
+    const input = searchForm.querySelector('input[name=q]')
+    const results = searchForm.querySelector('.search-results')
+    let timer = null
+    let latest = ''
+    let hits = []
+
+    const hitUrl = hit => hit.url || searchForm.dataset.componentsUrl + '?bike_num=' + hit.bike_id
+    const show = () => {
+      results.replaceChildren(...hits.map(hit => {
+        const item = document.createElement('li')
+        const link = document.createElement('a')
+        const detail = document.createElement('small')
+        link.className = 'dropdown-item'
+        link.href = hitUrl(hit)
+        link.textContent = hit.title
+        detail.textContent = hit.kind + ' · ' + hit.detail
+        link.appendChild(detail)
+        item.appendChild(link)
+        return item
+      }))
+      results.classList.toggle('show', hits.length > 0)
+    }
+    const search = () => {
+      const query = input.value.trim()
+      latest = query
+      if (!query) {
+        hits = []
+        return show()
+      }
+      fetch(searchForm.dataset.searchUrl + '?limit=8&q=' + encodeURIComponent(query))
+        .then(response => response.json())
+        .then(answer => {
+          if (answer.query === latest) {
+            hits = answer.hits || []
+            show()
+          }
+        })
+    }
+
+    input.addEventListener('input', () => {
+      clearTimeout(timer)
+      timer = setTimeout(search, 120)
+    })
+    input.addEventListener('blur', () => setTimeout(() => results.classList.remove('show'), 200))
+    searchForm.addEventListener('submit', e => {
+      e.preventDefault()
+      if (hits.length) {
+        window.location = hitUrl(hits[0])
+      }
+    })
+  }
+
   /**
    * Navbar links active state on scroll
    */
@@ -184,7 +241,7 @@
 
   var useDarkMode = window.matchMedia('(prefers-color-scheme: dark)').matches;
 
-  tinymce.init({
+  if (typeof tinymce !== 'undefined') tinymce.init({
     selector: 'textarea.tinymce-editor',
     plugins: 'print preview paste importcss searchreplace autolink autosave save directionality code visualblocks visualchars fullscreen image link media template codesample table charmap hr pagebreak nonbreaking anchor toc insertdatetime advlist lists wordcount imagetools textpattern noneditable help charmap quickbars emoticons',
     imagetools_cors_hosts: ['picsum.photos'],
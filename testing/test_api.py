@@ -0,0 +1,78 @@
+import json
+
+import pytest
+from flask import Flask
+
+from api import Api
+from bike_data import Bike, BikeComponents, Fork, Geometry, Hub, Wheel, Wheels
+from bike_store import BikeStore
+from ride_log import Ride, RideLog
+
+
+def make_bike(number):
+    wheels = Wheels(front_wheel=Wheel(), rear_wheel=Wheel(hub=Hub(brand="DT Swiss", model="350")))
+    return Bike(users_name="bike {}".format(number), brand="YT", model="Capra", geometry=Geometry(reach=450 + number),
+                components=BikeComponents(fork=Fork(brand="Fox", model="36"), wheels=wheels))
+
+
+@pytest.fixture
+def client():
+    store = BikeStore(":memory:")
+    store.add_many([make_bike(number) for number in range(1, 8)])
+    rides = RideLog()
+    rides.append_many(1, [Ride(1651392000.0, "casual", 20.5, 5400, 450), Ride(1651478400.0, "race", 30, 7200, 1200)])
+    rides.append_many(2, [Ride(1651564800.0, "bikepark", 15, 10800, 0)])
+    app = Flask(__name__)
+    Api(app, store, rides)
+    yield app.test_client()
+    store.close()
+
+
+def test_keyset_pagination(client):
+    response = client.get("/api/bikes?limit=3&fields=name")
+    page = response.get_json()
+    assert page["items"] == [{"id": 1, "name": "bike 1"}, {"id": 2, "name": "bike 2"}, {"id": 3, "name": "bike 3"}]
+    names = [item["name"] for item in page["items"]]
+    while page["next"]:
+        assert "fields=name" in page["next"]
+        page = client.get(page["next"]).get_json()
+        names.extend(item["name"] for item in page["items"])
+    assert names == ["bike {}".format(number) for number in range(1, 8)]
+    assert client.get("/api/bikes?after=7").get_json() == {"items": [], "next": None}
+
+
+def test_field_projection(client):
+    bike = client.get("/api/bikes/2?fields=geometry.reach,components.fork").get_json()
+    assert bike == {"id": 2, "geometry": {"reach": 452}, "components": {"fork": bike["components"]["fork"]}}
+    assert bike["components"]["fork"]["brand"] == "Fox"
+    whole = client.get("/api/bikes/2").get_json()
+    assert whole["name"] == "bike 2" and whole["components"]["wheels"]["rear"]["hub"]["brand"] == "DT Swiss"
+    response = client.get("/api/bikes?fields=colour")
+    assert response.status_code == 400
+    assert "colour" in response.get_json()["error"]
+    assert client.get("/api/bikes/99").status_code == 404
+
+
+def test_components(client):
+    tree = client.get("/api/bikes/1/components?fields=fork.model,wheels.rear.hub.brand").get_json()
+    assert tree == {"fork": {"model": "36"}, "wheels": {"rear": {"hub": {"brand": "DT Swiss"}}}}
+
+
+def test_ndjson_stream(client):
+    response = client.get("/api/bikes?format=ndjson&fields=name&after=2")
+    assert response.mimetype == "application/x-ndjson"
+    lines = response.get_data(as_text=True).splitlines()
+    assert [json.loads(line)["id"] for line in lines] == [3, 4, 5, 6, 7]
+    response = client.get("/api/bikes?limit=2", headers={"Accept": "application/x-ndjson"})
+    assert len(response.get_data(as_text=True).splitlines()) == 2
+
+
+def test_rides(client):
+    page = client.get("/api/bikes/1/rides?limit=1").get_json()
+    assert page["items"][0]["id"] == 0
+    assert page["items"][0]["distance"] == 20.5
+    assert page["items"][0]["ride_type"] == "casual"
+    assert client.get(page["next"]).get_json()["items"][0]["ride_type"] == "race"
+    lines = client.get("/api/rides?format=ndjson&fields=bike_id").get_data(as_text=True).splitlines()
+    assert [json.loads(line) for line in lines] == [{"id": 0, "bike_id": 1}, {"id": 1, "bike_id": 1},
+                                                    {"id": 2, "bike_id": 2}]
@@ -0,0 +1,85 @@
+import gzip
+import os
+
+import pytest
+from flask import Flask, render_template_string
+
+from asset_pipeline import Assets, build
+
+BUNDLES = {
+    "common": {"css": ["css/style.css"], "js": ["js/vendor.js", "js/main.js"]},
+    "charts": {"js": ["js/charts.js"]},
+}
+PAGE = """{% for url in asset_urls("js", page_bundles|default([])) %}{{ url }} {% endfor %}"""
+
+
+@pytest.fixture
+def static(tmp_path):
+    for name, content in (("css/style.css", 'body { background: url("../img/bg.svg?v=1#top") }'),
+                          ("img/bg.svg", "<svg></svg>"), ("js/vendor.js", "var vendor = 1"),
+                          ("js/main.js", "var main = vendor"), ("js/charts.js", "var charts = 1")):
+        path = tmp_path / "static" / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+    return tmp_path / "static"
+
+
+def make_app(static, dist):
+    app = Flask(__name__, static_folder=str(static))
+    Assets(app, str(dist), BUNDLES)
+    return app
+
+
+def test_build(static):
+    dist = static / "dist"
+    manifest = build(str(static), str(dist), BUNDLES)
+    assert sorted(manifest) == ["charts.js", "common.css", "common.js"]
+    common_js = (dist / manifest["common.js"]).read_bytes()
+    assert common_js == b"var vendor = 1;\nvar main = vendor"
+    assert gzip.decompress((dist / (manifest["common.js"] + ".gz")).read_bytes()) == common_js
+    css = (dist / manifest["common.css"]).read_text()
+    font = css.split('url("')[1].split("#")[0]
+    assert font.startswith("bg.") and (dist / font).read_text() == "<svg></svg>"
+
+    assert build(str(static), str(dist), BUNDLES) == manifest
+    (static / "js" / "main.js").write_text("var main = 2")
+    changed = build(str(static), str(dist), BUNDLES)
+    assert changed["common.js"] != manifest["common.js"]
+    assert not (dist / manifest["common.js"]).exists()
+
+
+def test_page_links_only_its_bundles(static):
+    app = make_app(static, static / "dist")
+    with app.test_request_context():
+        assert render_template_string(PAGE).split() == ["/static/js/vendor.js", "/static/js/main.js"]
+
+    manifest = build(str(static), str(static / "dist"), BUNDLES)
+    app = make_app(static, static / "dist")
+    with app.test_request_context():
+        assert render_template_string(PAGE).split() == ["/assets/" + manifest["common.js"]]
+        assert render_template_string('{% set page_bundles = ["charts"] %}' + PAGE).split() == [
+            "/assets/" + manifest["common.js"], "/assets/" + manifest["charts.js"]]
+
+
+def test_serving_precompressed(static):
+    dist = static / "dist"
+    manifest = build(str(static), str(dist), BUNDLES)
+    client = make_app(static, dist).test_client()
+    url = "/assets/" + manifest["common.js"]
+
+    response = client.get(url, headers={"Accept-Encoding": "gzip, deflate"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "immutable" in response.headers["Cache-Control"]
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert gzip.decompress(response.data) == (dist / manifest["common.js"]).read_bytes()
+
+    assert client.get(url, headers={"Accept-Encoding": "br;q=0, gzip"}).headers["Content-Encoding"] == "gzip"
+    assert "Content-Encoding" not in client.get(url, headers={"Accept-Encoding": "gzip;q=0, br;q=0"}).headers
+
+    response = client.get(url)
+    assert "Content-Encoding" not in response.headers
+    assert response.data == (dist / manifest["common.js"]).read_bytes()
+    assert client.get(url, headers={"If-None-Match": response.headers["ETag"]}).status_code == 304
+    assert client.get("/assets/manifest.json").status_code == 404
+    assert client.get("/assets/" + manifest["common.js"] + ".gz").status_code == 404
+    assert os.path.isfile(dist / "manifest.json")
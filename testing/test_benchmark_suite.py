@@ -0,0 +1,41 @@
+import importlib.util
+import os
+
+from flask import template_rendered
+
+SUITE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "suite.py")
+spec = importlib.util.spec_from_file_location("benchmark_suite", SUITE)
+suite = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(suite)
+
+
+def test_regression_over_threshold():
+    baseline = {"calibration": 0.05, "cases": {"fast": 0.001, "slow": 0.001}}
+    results = {"fast": 0.0011, "slow": 0.0013, "new": 0.5}
+    compared = {result.name: result for result in suite.compare(results, baseline, threshold=0.2)}
+    assert not compared["fast"].regression
+    assert compared["slow"].regression
+    assert round(compared["slow"].change, 6) == 0.3
+    assert compared["new"].baseline is None and not compared["new"].regression
+    # baseline of twice as fast machine
+    assert not any(result.regression for result in suite.compare(results, baseline, threshold=0.2, scale=2))
+    assert "1 regressions over 20% threshold" in suite.report(compared.values(), 0.2)
+
+
+def test_every_case_runs_on_fixtures():
+    import web_gui
+
+    rendered = []
+
+    def record(sender, template, context, **extra):
+        rendered.append(template.name)
+    template_rendered.connect(record, web_gui.bike_garage)
+    try:
+        for case in suite.CASES:
+            assert case.setup()() is not None, case.name
+    finally:
+        template_rendered.disconnect(record, web_gui.bike_garage)
+    templates = set(os.listdir(os.path.join(suite.ROOT, "templates"))) - {"base.html"}
+    assert templates <= set(rendered)
+    assert set(suite.PAGES) == templates
+    assert set(suite.load_baseline(suite.BASELINE)["cases"]) == {case.name for case in suite.CASES}
@@ -2,7 +2,7 @@ from unittest import TestCase
 
 import pytest
 
-from bike_data import *
+from bike_data import Bike, BikeComponents, Fork, Frame, Geometry, Hub, SuspensionSetup, Tyre
 from bike_builder import BikeBuilder
 
 
@@ -140,6 +140,21 @@ class TestBikeBuilder(TestCase):
         assert test_bike.geometry.standover is None
         assert test_bike.geometry.stack is None
 
+    def test_build_many(self):
+        bikes = BikeBuilder.build_many(3)
+        assert len(bikes) == 3
+        assert bikes[0].components is not bikes[1].components
+        assert isinstance(bikes[0].components.frame, Frame)
+        assert isinstance(bikes[0].components.wheels.rear_wheel.hub, Hub)
+        assert isinstance(bikes[0].setup.shock, SuspensionSetup)
+        assert bikes[0] == BikeBuilder().get_bike()
+
+        existing = Bike(brand="TB", components=BikeComponents(fork=Fork(travel=160)))
+        (built,) = BikeBuilder.build_many([existing])
+        assert built is existing
+        assert built.components.fork.travel == 160
+        assert isinstance(built.components.wheels.front_wheel.tyre, Tyre)
+
     # following tests are included in test_init_bike_builder_without_bike
     # def test_init_components(self):
     #     pass
@@ -0,0 +1,64 @@
+import io
+import json
+
+from bike_data import Bike, BreakDisc, DiscBreak, HeadsetStandard, Pressure, PressureUnits, WheelSize
+from bike_builder import BikeBuilder
+from bike_codec import dump_jsonl, from_dict, load_jsonl, to_dict
+
+
+def make_bike():
+    bike = BikeBuilder(Bike(users_name="test bike", brand="YT", model="Capra", model_year="2022")).get_bike()
+    bike.geometry.reach = 484
+    bike.geometry.bottom_bracket_drop = {30, 12}
+    bike.components.frame.model_year = 2022
+    bike.components.headset.standard = HeadsetStandard.TAPERED
+    bike.components.front_break = DiscBreak(brand="SRAM", model="Code", disc=BreakDisc(brand="SRAM", _diameter=220))
+    bike.components.wheels.size = WheelSize.MULLET
+    bike.components.chainring.tooth_numbers = [32]
+    bike.setup.front_tyre = Pressure(value=23, units=PressureUnits.PSI)
+    bike.setup.fork.fast_rebound = 4
+    return bike
+
+
+def test_to_dict_uses_format_keys():
+    data = to_dict(make_bike())
+    assert data["name"] == "test bike"
+    assert data["geometry"]["reach"] == 484
+    assert data["geometry"]["bb_drop"] == [12, 30]
+    assert data["components"]["frame"]["year"] == 2022
+    assert data["components"]["headset"]["standard"] == "tapered"
+    assert data["components"]["front_break"]["type"] == "DiscBreak"
+    assert data["components"]["front_break"]["disc"]["diameter"] == 220
+    assert data["components"]["wheels"]["size"] == "mullet"
+    assert data["components"]["wheels"]["rear"]["size"] == "27,5\""
+    assert data["setup"]["tyre_pressure"]["front"] == {"value": 23, "units": "psi"}
+    assert data["setup"]["fork"]["rebound"]["fast"] == 4
+    json.dumps(data)
+
+
+def test_round_trip():
+    bike = make_bike()
+    decoded = from_dict(json.loads(json.dumps(to_dict(bike))))
+    assert decoded == bike
+    assert isinstance(decoded.components.front_break, DiscBreak)
+    assert decoded.components.wheels.rear_wheel.size is WheelSize.TWENTY_SEVEN
+
+
+def test_jsonl_round_trip():
+    bikes = [make_bike() for _ in range(3)]
+    buffer = io.StringIO()
+    assert dump_jsonl(bikes, buffer) == 3
+    buffer.seek(0)
+    assert list(load_jsonl(buffer)) == bikes
+
+
+def test_export_import_garage(tmp_path):
+    from bike_store import BikeStore
+    from bike_codec import export_garage, import_garage
+
+    source = BikeStore(":memory:")
+    source.add_many([make_bike() for _ in range(5)])
+    assert export_garage(source, tmp_path / "garage.jsonl")[0] == 5
+    target = BikeStore(":memory:")
+    assert import_garage(target, tmp_path / "garage.jsonl")[0] == 5
+    assert [bike.geometry for bike in target.scan(chunk_size=2)] == [bike.geometry for bike in source.scan()]
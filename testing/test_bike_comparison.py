@@ -0,0 +1,51 @@
+from bike_builder import BikeBuilder
+from bike_comparison import SimilarityIndex, compare, feature_vector
+from bike_data import WheelSize
+
+
+def make_bike(reach, fork_travel, wheel_size=WheelSize.TWENTY_NINE):
+    bike = BikeBuilder().get_bike()
+    bike.geometry.reach = reach
+    bike.components.fork.travel = fork_travel
+    bike.components.wheels.size = wheel_size
+    return bike
+
+
+def test_compare_lists_differing_fields():
+    first = make_bike(470, 160)
+    second = make_bike(470, 170, WheelSize.MULLET)
+    differences = {difference.path: (difference.first, difference.second) for difference in compare(first, second)}
+    assert differences == {"components.fork.travel": (160, 170),
+                           "components.wheels._size": (WheelSize.TWENTY_NINE, WheelSize.MULLET),
+                           "components.wheels.rear_wheel.size": (WheelSize.TWENTY_NINE, WheelSize.TWENTY_SEVEN)}
+    assert compare(first, first) == []
+
+
+def test_missing_values_count_as_typical():
+    assert not feature_vector(BikeBuilder().get_bike()).any()
+
+
+def test_most_similar():
+    index = SimilarityIndex(capacity=2)
+    index.add_many([(1, make_bike(470, 160)), (2, make_bike(475, 160)), (3, make_bike(420, 120, WheelSize.TWENTY_SIX)),
+                    (4, make_bike(480, 170))])
+    assert len(index) == 4
+    assert [similar.bike_id for similar in index.most_similar(1, k=2)] == [2, 4]
+    assert [similar.bike_id for similar in index.most_similar(make_bike(425, 120), k=1)] == [3]
+
+    index.add(2, make_bike(400, 100, WheelSize.TWENTY_SIX))
+    index.remove(4)
+    assert 4 not in index
+    assert [similar.bike_id for similar in index.most_similar(1, k=5)] == [3, 2]
+
+
+def test_removed_rows_are_reused():
+    index = SimilarityIndex(capacity=4)
+    index.add_many([(1, make_bike(470, 160)), (2, make_bike(480, 170))])
+    for bike_id in range(3, 103):
+        index.add(bike_id, make_bike(400 + bike_id, 150))
+        index.remove(bike_id)
+    assert len(index._vectors) == 4 and len(index) == 2
+    index.add(200, make_bike(471, 160))
+    assert [similar.bike_id for similar in index.most_similar(1, k=5)] == [200, 2]
+    assert [similar.bike_id for similar in index.most_similar(200, k=1)] == [1]
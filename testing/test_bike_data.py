@@ -0,0 +1,37 @@
+import pickle
+
+import pytest
+
+from bike_data import BreakDisc, Geometry, Wheel, Wheels, WheelSize
+from bike_builder import BikeBuilder
+
+
+def test_slotted_layout():
+    bike = BikeBuilder().get_bike()
+    for part in (bike.total_usage, bike.geometry, bike.components, bike.components.wheels,
+                 bike.components.wheels.front_wheel.rim, bike.setup, bike.setup.fork):
+        assert not hasattr(part, "__dict__")
+    with pytest.raises(AttributeError):
+        Geometry().reach_value = 484
+
+
+def test_wheels_size():
+    wheels = Wheels(front_wheel=Wheel(), rear_wheel=Wheel())
+    wheels.size = WheelSize.MULLET
+    assert wheels.size is WheelSize.MULLET
+    assert wheels.front_wheel.size is WheelSize.TWENTY_NINE
+    assert wheels.rear_wheel.size is WheelSize.TWENTY_SEVEN
+    wheels.size = WheelSize.TWENTY_SIX
+    assert wheels.front_wheel.size is WheelSize.TWENTY_SIX
+    assert wheels.rear_wheel.size is WheelSize.TWENTY_SIX
+    assert WheelSize.TWENTY_SIX != WheelSize.TWENTY_NINE
+    assert len({WheelSize.TWENTY_SIX, WheelSize.TWENTY_NINE}) == 2
+
+
+def test_break_disc_diameter():
+    disc = BreakDisc()
+    disc.diameter = 203
+    assert disc.diameter == 203
+    with pytest.raises(ValueError):
+        disc.diameter = 190
+    assert pickle.loads(pickle.dumps(disc)) == disc
@@ -0,0 +1,94 @@
+import datetime
+
+import pytest
+
+from bike_data import Bike, BikeComponents, BikeSetup, Fork, Pressure, SuspensionSetup, Tyre, Wheel, Wheels, \
+    WheelSize
+from bike_history import BikeHistory, diff
+
+START = datetime.datetime(2023, 1, 1)
+
+
+def day(number):
+    return START + datetime.timedelta(days=number)
+
+
+def make_bike():
+    wheels = Wheels(front_wheel=Wheel(tyre=Tyre(brand="Maxxis", model="Assegai")), rear_wheel=Wheel())
+    return Bike(components=BikeComponents(fork=Fork(brand="Fox", model="36", travel=160), wheels=wheels),
+                setup=BikeSetup(fork=SuspensionSetup(pressure=Pressure(value=80), fast_compression=5)))
+
+
+@pytest.fixture
+def history():
+    history = BikeHistory(":memory:", snapshot_every=3)
+    yield history
+    history.close()
+
+
+def test_diff():
+    old, new = make_bike(), make_bike()
+    new.setup.fork.pressure.value = 85
+    new.components.fork.travel = 170
+    new.components.wheels.front_wheel.tyre = Tyre(brand="Maxxis", model="Minion DHF")
+    new.components.wheels._size = WheelSize.TWENTY_NINE
+    changes = dict(diff(old, new))
+    assert list(changes) == [".components.fork.travel", ".components.wheels._size",
+                             ".components.wheels.front_wheel.tyre", ".setup.fork.pressure.value"]
+    assert changes[".components.wheels.front_wheel.tyre"].model == "Minion DHF"
+    old.components.wheels._size = WheelSize.TWENTY_SEVEN
+    assert dict(diff(old, new))[".components.wheels._size"] is WheelSize.TWENTY_NINE
+    old.components.wheels._size = WheelSize.TWENTY_NINE
+    assert ".components.wheels._size" not in dict(diff(old, new))
+
+
+def test_state_at(history):
+    bike = make_bike()
+    assert history.record(1, bike, day(0)) == 0
+    for number in range(1, 8):
+        bike.setup.fork.pressure.value = 80 + number
+        history.record(1, bike, day(number))
+    bike.components.fork = Fork(brand="RockShox", model="ZEB", travel=170)
+    assert history.record(1, bike, day(10)) == 1
+    assert history.record(1, bike, day(11)) == 0
+
+    assert history.state_at(1, day(-1)) is None
+    assert history.state_at(1, day(0)).setup.fork.pressure.value == 80
+    assert history.state_at(1, day(4)).setup.fork.pressure.value == 84
+    assert history.state_at(1, day(9)).components.fork.model == "36"
+    assert history.state_at(1, day(10)).components.fork.model == "ZEB"
+    assert [event.value.model for event in history.swaps(1)] == ["ZEB"]
+    assert len(history.events(1, since=day(5), until=day(7))) == 2
+
+    with pytest.raises(ValueError):
+        history.record(1, bike, day(9))
+
+
+def test_history_survives_reopening(tmp_path):
+    path = str(tmp_path / "history.db")
+    bike = make_bike()
+    with_history = BikeHistory(path, snapshot_every=2)
+    with_history.record(7, bike, day(0))
+    bike.setup.fork.fast_compression = 8
+    with_history.record(7, bike, day(1))
+    with_history.close()
+
+    reopened = BikeHistory(path, snapshot_every=2)
+    bike.setup.fork.fast_compression = 9
+    assert reopened.record(7, bike, day(2)) == 1
+    assert [event.value for event in reopened.events(7)] == [8, 9]
+    reopened.close()
+
+
+def test_compact(history):
+    bike = make_bike()
+    history.record(1, bike, day(0))
+    for number in range(1, 10):
+        bike.setup.fork.pressure.value = 80 + number
+        history.record(1, bike, day(number))
+
+    assert history.compact(day(7)) > 0
+    assert history.state_at(1, day(5)) is None
+    assert history.state_at(1, day(6)).setup.fork.pressure.value == 86
+    assert history.state_at(1, day(8)).setup.fork.pressure.value == 88
+    assert [event.value for event in history.events(1)] == [87, 88, 89]
@@ -0,0 +1,121 @@
+import json
+import os
+import sqlite3
+import tempfile
+from unittest import TestCase
+
+from bike_builder import BikeBuilder
+from bike_data import Bike, BikeComponents, Geometry, Hub, Wheel, Wheels
+from bike_store import BikeStore, StoredBike
+
+
+def make_bike(brand="YT", model="Capra", model_year="2022", hub_brand="DT Swiss"):
+    wheels = Wheels(front_wheel=Wheel(), rear_wheel=Wheel(hub=Hub(brand=hub_brand, model="350")))
+    return Bike(brand=brand, model=model, model_year=model_year, geometry=Geometry(),
+                components=BikeComponents(wheels=wheels))
+
+
+class TestBikeStore(TestCase):
+
+    def setUp(self):
+        self.store = BikeStore(":memory:")
+
+    def tearDown(self):
+        self.store.close()
+
+    def test_add_and_get(self):
+        bike = make_bike()
+        bike.geometry.reach = 484
+        bike_id = self.store.add(bike)
+        stored = self.store.get(bike_id)
+        assert isinstance(stored, StoredBike)
+        assert stored.brand == "YT"
+        assert stored.purchase_date == bike.purchase_date
+        assert "geometry" not in stored.__dict__
+        assert stored.geometry.reach == 484
+        assert "geometry" in stored.__dict__
+        assert stored.components.wheels.rear_wheel.hub.brand == "DT Swiss"
+        assert self.store.get(bike_id + 1) is None
+
+    def test_subtrees_are_stored_as_json(self):
+        bike = BikeBuilder(Bike(brand="YT", model="Capra")).get_bike()
+        bike_id = self.store.add(bike)
+        (components,) = self.store._query("SELECT components FROM bikes WHERE id = ?", (bike_id,))[0]
+        assert json.loads(components)["fork"]["brand"] == bike.components.fork.brand
+        stored = self.store.get(bike_id)
+        for name in ("total_usage", "geometry", "components", "setup"):
+            assert getattr(stored, name) == getattr(bike, name), name
+
+    def test_indexed_lookups(self):
+        self.store.add_many([make_bike(), make_bike(model="Jeffsy"), make_bike(brand="Canyon", hub_brand="Hope")])
+        assert [bike.model for bike in self.store.find(brand="YT")] == ["Capra", "Jeffsy"]
+        assert len(self.store.find(brand="YT", model="Jeffsy", model_year="2022")) == 1
+        assert self.store.find_by_component("Hope") == [(3, "wheels.rear_wheel.hub")]
+        assert len(self.store.find_by_component("DT Swiss", "350")) == 2
+
+    def test_batched_writes(self):
+        self.store.batch_size = 3
+        with self.store.batch():
+            for _ in range(4):
+                self.store.put(make_bike())
+            assert len(self.store) == 3
+        assert len(self.store) == 4
+
+    def test_update_and_delete(self):
+        bike_id = self.store.add(make_bike())
+        bike = self.store.get(bike_id)
+        bike.components.wheels.rear_wheel.hub.brand = "Hope"
+        self.store.update(bike_id, bike)
+        assert self.store.find_by_component("Hope") == [(bike_id, "wheels.rear_wheel.hub")]
+        self.store.delete(bike_id)
+        assert bike_id not in self.store
+        assert self.store.find_by_component("Hope") == []
+
+    def test_versions(self):
+        first, second = self.store.add_many([make_bike(), make_bike()])
+        assert self.store.version(first) != self.store.version(second)
+        version = self.store.version(second)
+        self.store.update(second, self.store.get(second))
+        assert self.store.version(second) > version
+        self.store.delete(second)
+        assert self.store.version(second) is None
+        third = self.store.add(make_bike())
+        assert third == second + 1  # id of deleted bike is not given again
+        assert self.store.version(third) > version + 1
+
+    def test_ids_are_not_reused(self):
+        ids = self.store.add_many([make_bike(), make_bike()])
+        self.store.delete(ids[1])
+        assert self.store.add(make_bike()) == ids[1] + 1
+        self.store.add_many([])
+        self.store.delete(ids[1] + 1)
+        assert self.store.add_many([make_bike(), make_bike()]) == [ids[1] + 2, ids[1] + 3]
+
+    def test_failing_listener_does_not_break_write(self):
+        seen = []
+
+        def failing(bike_id, bike):
+            raise RuntimeError("index is broken")
+
+        self.store.subscribe(failing)
+        self.store.subscribe(lambda bike_id, bike: seen.append(bike_id))
+        with self.assertLogs("bike_garage.store", "ERROR"):
+            bike_id = self.store.add(make_bike())
+        assert bike_id in self.store
+        assert seen == [bike_id]
+
+    def test_database_of_older_version_is_migrated(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "old.db")
+            with sqlite3.connect(path) as connection:
+                connection.execute("CREATE TABLE bikes (id INTEGER PRIMARY KEY, users_name TEXT, brand TEXT, "
+                                   "model TEXT, model_year TEXT, purchase_date TEXT, weight INTEGER, "
+                                   "total_usage BLOB, geometry BLOB, components BLOB, setup BLOB)")
+                connection.execute("INSERT INTO bikes (id, brand) VALUES (1, 'YT')")
+            connection.close()
+            store = BikeStore(path)
+            assert store.get(1).brand == "YT" and store.get(1).path_to_gallery is None
+            bike_id = store.add(Bike(brand="Canyon", path_to_gallery="/photos/spectral"))
+            assert bike_id == 2
+            assert store.get(bike_id).path_to_gallery == "/photos/spectral"
+            store.close()
@@ -0,0 +1,60 @@
+from bike_data import BottomBracketStandard, Fork, HeadsetStandard, SuspensionType, WheelSize
+from component_parser import ComponentNameParser, parse, parse_many, to_component
+
+
+def test_parse_bike_title():
+    parsed = parse("2022 YT Capra 29 Core 4")
+    assert (parsed.brand, parsed.model, parsed.component_type) == ("YT", "Capra", "Frame")
+    assert parsed.specs["model_year"] == 2022
+    assert parsed.specs["wheel_size"] is WheelSize.TWENTY_NINE
+
+
+def test_parse_specs():
+    fork = parse("Fox 36 Factory Grip2 29\" 160mm 44mm offset boost")
+    assert (fork.brand, fork.model, fork.component_type) == ("Fox", "36", "Fork")
+    assert (fork.specs["travel"], fork.specs["offset"]) == (160, 44)
+
+    shock = parse("RockShox Super Deluxe Ultimate Coil 230x65")
+    assert shock.model == "Super Deluxe"
+    assert shock.specs == {"length": 230, "suspension_type": SuspensionType.SPRING}
+
+    tyre = parse("Maxxis Minion DHR II 29x2.4 3C MaxxGrip DoubleDown")
+    assert tyre.model == "Minion DHR II"
+    assert tyre.specs["size"] is WheelSize.TWENTY_NINE
+    assert (tyre.specs["width"], tyre.specs["compound"], tyre.specs["casing"]) == (2.4, "MaxxGrip", "DoubleDown")
+
+    cassette = parse("Shimano XT M8100 12 speed cassette 10-51t")
+    assert cassette.component_type == "Cassette"
+    assert (cassette.specs["speeds"], cassette.specs["tooth_range"]) == (12, "10-51")
+
+    assert parse("Shimano BB-MT800 BSA bottom bracket").specs["standard"] is BottomBracketStandard.THREADED
+    assert parse("Chris King InSet 2 tapered headset").specs["standard"] is HeadsetStandard.TAPERED
+    assert parse("Santa Cruz Nomad frame threaded").specs.get("head_tube") is HeadsetStandard.THREADED
+
+
+def test_numeric_model_needs_brand():
+    assert parse("36 160mm").model is None
+    assert parse("pike 150mm fork").brand == "RockShox"
+
+
+def test_unknown_model_is_rest_of_name():
+    parsed = parse("Shimano RT-MT800 203mm centerlock rotor")
+    assert (parsed.model, parsed.specs["diameter"], parsed.specs["centerlock"]) == ("RT MT800", 203, True)
+
+
+def test_to_component():
+    disc = to_component("Shimano RT-MT800 203mm centerlock rotor")
+    assert (disc.brand, disc.diameter, disc.centerlock) == ("Shimano", 203, True)
+    assert to_component("something") is None
+
+    fork = Fork(travel=170)
+    assert to_component("Fox 36 160mm", fork) is fork
+    assert (fork.brand, fork.model, fork.travel) == ("Fox", "36", 170)
+
+
+def test_custom_dictionary_and_cache():
+    parser = ComponentNameParser(brands={"acme": "Acme"}, models={"Acme": {"Rocket Fork": "Fork"}}, cache_size=8)
+    first, second = parser.parse_many(["ACME rocket fork 140mm"] * 2)
+    assert first is second
+    assert (first.brand, first.model, first.specs["travel"]) == ("Acme", "Rocket Fork", 140)
+    assert parse_many(["ACME rocket fork"])[0].brand is None
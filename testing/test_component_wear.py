@@ -0,0 +1,75 @@
+import pytest
+
+from bike_builder import BikeBuilder
+from component_wear import ServiceRule, WearTable
+from ride_log import RIDE_TYPES, Ride, RideLog
+
+
+def make_table():
+    table = WearTable()
+    for bike_id in (1, 2):
+        table.add_bike(bike_id, BikeBuilder().get_bike())
+    return table
+
+
+def test_rides_are_spread_to_components():
+    table = make_table()
+    table.add_rides([1, 1, 2], [2.0, 3.0, 1.0], [10, 20, 5], [0, 2, 2])
+    fork = table.rows(1, "fork")[0]
+    hub = table.rows(1, "wheels.rear_wheel.hub")[0]
+    other_fork = table.rows(2, "fork")[0]
+    assert table.hours[fork] == table.hours[hub] == 5
+    assert table.distance[fork] == 30
+    assert table.rides[fork, table.ride_types.index("bikepark")] == 1
+    assert table.hours[other_fork] == 1
+
+
+def test_due_and_service():
+    table = make_table()
+    table.add_rides([1] * 50, [1.0] * 50, [30] * 50, [2] * 50)
+    table.add_rides([2], [46.0], [0], [0])
+    rules = [ServiceRule("Fork", "lower leg service", "hours", 50),
+             ServiceRule("Chain", "replace chain", "distance", 1500),
+             ServiceRule("Tyre", "check tyre after bikepark", "bikepark", 15)]
+    notices = table.due(rules)
+    assert {(notice.bike_id, notice.slot, notice.due) for notice in notices} == {
+        (1, "fork", True), (1, "chain", True),
+        (1, "wheels.front_wheel.tyre", True), (1, "wheels.rear_wheel.tyre", True),
+        (2, "fork", False),
+    }
+    table.record_service(table.rows(1, "fork"))
+    assert not [notice for notice in table.due(rules) if notice.bike_id == 1 and notice.slot == "fork"]
+
+
+def test_add_ride_log():
+    table = make_table()
+    log = RideLog()
+    log.append_many(1, [Ride(0.0, "bikepark", 10.0, 7200.0, 0.0), Ride(0.0, "casual", 5.0, 3600.0, 0.0)])
+    last = table.add_ride_log(log)
+    assert last == 1
+    assert table.add_ride_log(log, after=last) == last
+    fork = table.rows(1, "fork")[0]
+    assert table.hours[fork] == 3
+    assert table.distance[fork] == 15
+
+
+def test_unknown_ride_types():
+    table = make_table()
+    with pytest.raises(ValueError):
+        table.add_rides([1], [1.0], [10], [len(table.ride_types)])
+    with pytest.raises(ValueError):
+        table.add_rides([1], [1.0], [10], [-1])
+    log = RideLog()
+    log.append_many(1, [Ride(0.0, "casual", 5.0, 3600.0, 0.0), Ride(0.0, "enduro", 50.0, 7200.0, 0.0)])
+    assert table.add_ride_log(log) == 1  # unknown ride type does not stop wear tracking
+    fork = table.rows(1, "fork")[0]
+    assert table.hours[fork] == 3 and table.distance[fork] == 55
+    assert table.rides[fork, table.ride_types.index("casual")] == 1
+    assert table.rides[fork, table.ride_types.index("enduro")] == 1
+    rules = [ServiceRule("Fork", "enduro check", "enduro", 1)]
+    assert [(notice.slot, notice.due) for notice in table.due(rules) if notice.bike_id == 1] == [("fork", True)]
+
+    small = WearTable(capacity=1)
+    small.add_ride_type("enduro")
+    small.add_bike(1, BikeBuilder().get_bike())  # grows past capacity with the added column
+    assert small.rides.shape == (len(small.bike_id), len(RIDE_TYPES) + 1)
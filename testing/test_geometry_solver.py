@@ -0,0 +1,57 @@
+import math
+
+from bike_data import Geometry
+import geometry_solver
+from geometry_solver import clear_cache, complete, complete_many
+
+
+def test_complete_from_reach_stack_and_angles():
+    geometry = complete(Geometry(reach=480, stack=630, seat_tube_angle=77, head_tube_angle=64,
+                                 bottom_bracket_drop=30, chainstay_length=440))
+    assert geometry.top_tube_length == round(480 + 630 / math.tan(math.radians(77)), 1)
+    assert geometry.bottom_bracket_height == 345
+    assert geometry.wheelbase == 1260.6
+    assert geometry.standover is None
+    assert geometry.seat_tube_length is None
+
+
+def test_complete_inverse_relations():
+    known = complete(Geometry(reach=480, stack=630, seat_tube_angle=77, head_tube_angle=64,
+                              bottom_bracket_drop=30, chainstay_length=440))
+    geometry = complete(Geometry(top_tube_length=known.top_tube_length, wheelbase=known.wheelbase,
+                                 seat_tube_angle=77, head_tube_angle=64, bottom_bracket_height=345,
+                                 chainstay_length=440, stack=630))
+    assert geometry.reach == 480
+    assert geometry.bottom_bracket_drop == 30
+
+    geometry = complete(Geometry(stack=630, head_tube_angle=64, bottom_bracket_drop=30), fork_length=580)
+    assert geometry.head_tube_length == round((630 - 30 + 44 * math.cos(math.radians(64)))
+                                              / math.sin(math.radians(64)) - 580, 1)
+
+
+def test_adjustable_values_produce_sets():
+    geometry = complete(Geometry(bottom_bracket_drop={30, 12}, head_tube_angle=64))
+    assert geometry.bottom_bracket_drop == {30, 12}
+    assert geometry.bottom_bracket_height == {345, 363}
+
+
+def test_complete_many_fills_in_place():
+    catalog = [Geometry(reach=430 + size * 25, stack=620 + size * 9, seat_tube_angle=77) for size in range(4)]
+    assert complete_many(catalog)[0] is catalog[0]
+    assert [geometry.top_tube_length is not None for geometry in catalog] == [True] * 4
+    assert complete_many([Geometry(reach=455, stack=629, seat_tube_angle=77)])[0].top_tube_length == \
+        catalog[1].top_tube_length
+
+
+def test_cache_overflow_keeps_entries_of_running_call(monkeypatch):
+    def make(size):
+        return Geometry(reach=430 + size * 25, stack=620 + size * 9, seat_tube_angle=77)
+
+    expected = [geometry.top_tube_length for geometry in complete_many(make(size) for size in range(6))]
+    clear_cache()
+    monkeypatch.setattr(geometry_solver, "MAX_CACHED", 3)
+    complete_many([make(0), make(1)])
+    # cached frames and new ones together overflow the cache
+    assert [geometry.top_tube_length for geometry in complete_many(make(size) for size in range(6))] == expected
+    assert len(geometry_solver._frames) <= 6
+    clear_cache()
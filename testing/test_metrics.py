@@ -0,0 +1,124 @@
+import os
+import time
+
+from flask import Flask, render_template_string
+
+import metrics
+from metrics import Registry, SamplingProfiler, timed_get
+from web_metrics import WebMetrics
+
+
+def test_histogram_and_counter_text():
+    registry = Registry()
+    latency = registry.histogram("latency_seconds", "Latency", ("endpoint",), buckets=(0.1, 1))
+    requests = registry.counter("requests_total", "Requests", ("endpoint",))
+    for value in (0.05, 0.5, 2):
+        latency.observe(value, "usage")
+    requests.inc(3, 'say "hi"')
+    text = registry.render()
+    assert "# TYPE latency_seconds histogram" in text
+    assert 'latency_seconds_bucket{endpoint="usage",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{endpoint="usage",le="1"} 2' in text
+    assert 'latency_seconds_bucket{endpoint="usage",le="+Inf"} 3' in text
+    assert 'latency_seconds_sum{endpoint="usage"} 2.55' in text
+    assert 'latency_seconds_count{endpoint="usage"} 3' in text
+    assert 'requests_total{endpoint="say \\"hi\\""} 3' in text
+
+
+def test_values_of_processes_are_summed(tmp_path):
+    registry = Registry(directory=str(tmp_path))
+    counter = registry.counter("requests_total", "Requests", ("endpoint",))
+    counter.inc(2, "usage")
+    registry.export()
+    # file of other worker
+    os.rename(tmp_path / "{}.json".format(os.getpid()), tmp_path / "1.json")
+    counter.inc(1, "usage")
+    counter.inc(1, "setup")
+    text = registry.render()
+    assert 'requests_total{endpoint="usage"} 5' in text
+    assert 'requests_total{endpoint="setup"} 1' in text
+
+
+def test_values_of_exited_workers_are_folded(tmp_path):
+    registry = Registry(directory=str(tmp_path))
+    counter = registry.counter("requests_total", "Requests", ("endpoint",))
+    for pid in ("1", "1", "2"):  # the second worker 1 got pid of exited one
+        counter.inc(2, "usage")
+        registry.export()
+        os.rename(tmp_path / "{}.json".format(os.getpid()), tmp_path / "{}.json".format(pid))
+        registry.reset()
+        if pid == "1":
+            registry.fold_exited(1)
+    registry.fold_exited(3)  # exited before its first export
+    assert sorted(os.listdir(tmp_path)) == ["2.json", "exited.json"]
+    assert 'requests_total{endpoint="usage"} 6' in registry.render()
+    registry.fold_exited(2)
+    assert os.listdir(tmp_path) == ["exited.json"]
+    assert 'requests_total{endpoint="usage"} 6' in registry.render()
+
+
+def make_app():
+    app = Flask(__name__)
+    web_metrics = WebMetrics(app)
+
+    @app.route("/page")
+    def page():
+        time.sleep(0.01)
+        return render_template_string("{% for i in range(3) %}{{ i }}{% endfor %}")
+
+    return app, web_metrics
+
+
+def test_requests_and_templates_are_timed():
+    metrics.registry.reset()
+    app, _ = make_app()
+    client = app.test_client()
+    for _ in range(3):
+        assert client.get("/page").data == b"012"
+    client.get("/missing")
+    text = client.get("/metrics").get_data(as_text=True)
+    assert 'bike_garage_request_seconds_count{endpoint="page",method="GET",status="200"} 3' in text
+    assert 'bike_garage_request_seconds_count{endpoint="unmatched",method="GET",status="404"} 1' in text
+    assert 'bike_garage_view_seconds_count{endpoint="page"} 3' in text
+    assert "bike_garage_template_render_seconds_count" in text
+
+
+def test_profiling_of_single_request():
+    app, web_metrics = make_app()
+    client = app.test_client()
+    assert client.get("/page?profile=1").data == b"012"  # profiling is off
+    web_metrics.profiling = True
+    report = client.get("/page?profile=1").get_data(as_text=True)
+    assert "samples every" in report
+    assert client.get("/page").data == b"012"
+
+
+def test_sampling_profiler():
+    def busy():
+        end = time.perf_counter() + 0.05
+        while time.perf_counter() < end:
+            pass
+
+    with SamplingProfiler(interval=0.001) as profiler:
+        busy()
+    assert profiler.samples > 5
+    assert any("(busy)" in function for function in profiler.own)
+
+
+class FakeResponse:
+    status_code = 200
+    content = b"x" * 100
+
+
+class FakeSession:
+    def get(self, url, **kwargs):
+        return FakeResponse()
+
+
+def test_timed_get():
+    metrics.registry.reset()
+    timed_get(FakeSession(), "https://Shop.example/search?q=fox")
+    text = metrics.registry.render()
+    assert 'bike_garage_fetch_bytes_total{host="shop.example"} 100' in text
+    assert 'bike_garage_fetches_total{host="shop.example",status="200"} 1' in text
+    assert 'bike_garage_fetch_seconds_count{host="shop.example"} 1' in text
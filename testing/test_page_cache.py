@@ -0,0 +1,74 @@
+import threading
+from urllib.parse import urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from page_cache import CachedPage, PageCache
+
+PAGE = "<html><body>YT Capra – řazení Shimano</body></html>".encode("utf-8")  # more bytes than characters
+
+
+class EtagHandler(BaseHTTPRequestHandler):
+    requests_served = []
+
+    def do_GET(self):
+        EtagHandler.requests_served.append(self.path)
+        if self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", '"v1"')
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(PAGE)))
+        self.end_headers()
+        self.wfile.write(PAGE)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def page_url():
+    EtagHandler.requests_served = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), EtagHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield "http://127.0.0.1:{}/search?q=YT".format(server.server_address[1])
+    server.shutdown()
+    server.server_close()
+
+
+def test_memory_hit_and_revalidation(page_url):
+    cache = PageCache(directory=None, default_ttl=60)
+    with requests.Session() as session:
+        assert cache.fetch(page_url, session) == PAGE.decode()
+        assert cache.fetch(page_url, session) == PAGE.decode()
+        assert len(EtagHandler.requests_served) == 1
+        cache.ttls[urlsplit(page_url).netloc] = 0
+        assert cache.fetch(page_url, session) == PAGE.decode()
+    assert len(EtagHandler.requests_served) == 2
+    assert cache.stats.misses == 1
+    assert cache.stats.memory_hits == 1
+    assert cache.stats.revalidated == 1
+    assert cache.stats.bytes_downloaded == len(PAGE)
+    assert cache.stats.bytes_saved == 2 * len(PAGE)
+
+
+def test_disk_tier_survives_restart(page_url, tmp_path):
+    with requests.Session() as session:
+        PageCache(directory=str(tmp_path)).fetch(page_url, session)
+        restarted = PageCache(directory=str(tmp_path))
+        assert restarted.fetch(page_url, session) == PAGE.decode()
+    assert len(EtagHandler.requests_served) == 1
+    assert restarted.stats.disk_hits == 1
+    assert restarted.stats.bytes_saved == len(PAGE)
+
+
+def test_lru_eviction():
+    cache = PageCache(directory=None, max_entries=2)
+    for number in range(3):
+        cache._remember(CachedPage(url=str(number), text="", fetched_at=0, size=0))
+    assert cache.lookup("0") == (None, None)
+    assert cache.lookup("2")[1] == "memory"
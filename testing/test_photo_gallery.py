@@ -0,0 +1,82 @@
+import os
+import shutil
+
+import pytest
+from flask import Flask
+
+from photo_gallery import PhotoStore, Photos
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def save_photo(path, width, height, colour=(200, 40, 40)):
+    Image.new("RGB", (width, height), colour).save(path)
+
+
+@pytest.fixture
+def store(tmp_path):
+    with PhotoStore(str(tmp_path / "store"), max_workers=2) as store:
+        yield store
+
+
+@pytest.fixture
+def folder(tmp_path):
+    folder = tmp_path / "capra"
+    folder.mkdir()
+    save_photo(folder / "a.jpg", 2400, 1200)
+    shutil.copy(folder / "a.jpg", folder / "b.jpg")
+    save_photo(folder / "c.png", 100, 50)
+    (folder / "broken.jpg").write_bytes(b"not a photo")
+    (folder / "notes.txt").write_text("not a photo either")
+    return str(folder)
+
+
+def test_ingest_folder(store, folder):
+    report = store.ingest_folder(folder)
+    assert [photo.name for photo in report.photos] == ["a.jpg", "b.jpg", "c.png"]
+    first, copy, small = report.photos
+    assert first.digest == copy.digest  # the same photo is stored once
+    assert report.rendered == 2
+    assert list(report.errors) == [os.path.join(folder, "broken.jpg")]
+    assert (first.width, first.height) == (1920, 960)
+    with Image.open(store.path(first.digest, "small")) as thumbnail:
+        assert thumbnail.size == (320, 160)
+    with Image.open(store.path(small.digest, "large")) as thumbnail:
+        assert thumbnail.size == (100, 50)  # not enlarged
+
+    version = store.gallery_version(folder)
+    assert store.gallery(folder) == report.photos
+    again = store.ingest_folder(folder)
+    assert again.photos == report.photos and again.rendered == 0
+
+    save_photo(os.path.join(folder, "c.png"), 50, 100, (0, 0, 255))
+    os.utime(os.path.join(folder, "c.png"), ns=(1, 1))
+    changed = store.ingest_folder(folder)
+    assert changed.rendered == 1
+    assert changed.photos[2].digest != small.digest and changed.photos[:2] == report.photos[:2]
+    assert store.gallery_version(folder) != version
+    assert store.gallery(os.path.join(folder, "missing")) == []
+
+
+def test_thumbnails_are_served_with_range_and_cache_headers(store, folder):
+    photo = store.ingest_folder(folder).photos[0]
+    app = Flask(__name__)
+    Photos(app, store)
+    client = app.test_client()
+    with app.test_request_context():
+        url = Photos.url(photo, "medium")
+    response = client.get(url)
+    assert response.status_code == 200 and response.mimetype == "image/jpeg"
+    assert "immutable" in response.headers["Cache-Control"]
+    body = response.get_data()
+    with open(store.path(photo.digest, "medium"), "rb") as f:
+        assert body == f.read()
+
+    partial = client.get(url, headers={"Range": "bytes=10-19"})
+    assert partial.status_code == 206
+    assert partial.get_data() == body[10:20]
+    assert partial.headers["Content-Range"] == "bytes 10-19/{}".format(len(body))
+    assert client.get(url, headers={"If-None-Match": response.headers["ETag"]}).status_code == 304
+    assert client.get("/photos/huge/{}.jpg".format(photo.digest)).status_code == 404
+    assert client.get("/photos/small/{}.jpg".format("0" * 64)).status_code == 404
+    assert client.get("/photos/small/..%2Fgalleries.jpg").status_code == 404
@@ -0,0 +1,78 @@
+import pytest
+from flask import Flask, render_template
+from jinja2 import DictLoader
+from markupsafe import Markup
+
+from response_cache import LRUCache, ResponseCache
+
+TEMPLATES = {
+    "page.html": "{{ title }}|{% call cached_fragment('table', version) %}{{ table() }}{% endcall %}",
+}
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.jinja_loader = DictLoader(TEMPLATES)
+    app.versions = {"version": 1}
+    app.renders = []
+    cache = ResponseCache(app)
+    app.cache = cache
+
+    def table():
+        app.renders.append("table")
+        return Markup("<table>")
+
+    @app.route("/page")
+    @cache.page(lambda: app.versions["version"])
+    def page():
+        app.renders.append("page")
+        return render_template("page.html", title="Bike", version=app.versions["version"], table=table)
+
+    return app
+
+
+def test_lru_cache():
+    cache = LRUCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c"), len(cache)) == (1, 3, 2)
+
+
+def test_page_is_cached_by_version(app):
+    client = app.test_client()
+    first = client.get("/page")
+    assert first.data == b"Bike|<table>"
+    assert first.headers["Cache-Control"] == "no-cache"
+    assert client.get("/page").data == first.data
+    assert app.renders == ["page", "table"]
+
+    not_modified = client.get("/page", headers={"If-None-Match": first.headers["ETag"]})
+    assert not_modified.status_code == 304
+    assert app.renders == ["page", "table"]
+
+    app.versions["version"] = 2
+    changed = client.get("/page", headers={"If-None-Match": first.headers["ETag"]})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != first.headers["ETag"]
+    assert app.renders == ["page", "table", "page", "table"]
+
+
+def test_fragment_is_shared_between_pages(app):
+    client = app.test_client()
+    client.get("/page?sort=brand")
+    client.get("/page?sort=model")
+    assert app.renders == ["page", "table", "page"]
+    assert app.cache.fragments.hits == 1
+
+
+def test_disabled_cache(app):
+    app.cache.enabled = False
+    client = app.test_client()
+    response = client.get("/page")
+    client.get("/page")
+    assert "ETag" not in response.headers
+    assert app.renders == ["page", "table"] * 2
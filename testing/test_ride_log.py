@@ -0,0 +1,95 @@
+import io
+
+import pytest
+
+from bike_data import Bike, Hub
+from bike_builder import BikeBuilder
+from ride_log import MAX_RIDE_TYPES, Ride, RideLog, ingest, read_csv, read_gpx
+
+CSV_RIDES = """Date,Ride Type,Distance,Duration,Elevation Gain
+01. 05. 2022,casual,20.5km,1:30,450m
+02. 05. 2022,race,30,2:00,1200
+2022-05-03,bikepark,15,3:00,0
+"""
+
+GPX_RIDE = """<?xml version="1.0" encoding="UTF-8"?>
+<gpx version="1.1" xmlns="http://www.topografix.com/GPX/1/1">
+  <trk><trkseg>
+    <trkpt lat="50.0000" lon="14.0000"><ele>200</ele><time>2022-05-01T10:00:00Z</time></trkpt>
+    <trkpt lat="50.0100" lon="14.0000"><ele>250</ele><time>2022-05-01T10:05:00Z</time></trkpt>
+    <trkpt lat="50.0200" lon="14.0000"><ele>230</ele><time>2022-05-01T10:10:00Z</time></trkpt>
+  </trkseg></trk>
+</gpx>
+"""
+
+
+def test_read_csv_in_chunks():
+    chunks = list(read_csv(io.StringIO(CSV_RIDES), chunk_size=2))
+    assert [len(chunk) for chunk in chunks] == [2, 1]
+    first = chunks[0][0]
+    assert first.distance == 20.5
+    assert first.duration == 90 * 60
+    assert first.elevation == 450
+    assert chunks[0][1].ride_type == "race"
+
+
+def test_read_gpx():
+    ride = read_gpx(io.StringIO(GPX_RIDE))
+    assert round(ride.distance, 2) == 2.22
+    assert ride.duration == 600
+    assert ride.elevation == 50
+
+
+def test_ingest_updates_usage_incrementally():
+    bike = BikeBuilder(Bike(brand="YT", model="Capra")).get_bike()
+    bike.components.wheels.rear_wheel.hub = Hub(brand="DT Swiss")
+    log = RideLog()
+    assert ingest(log, 1, bike, read_csv(io.StringIO(CSV_RIDES), chunk_size=2)) == 3
+    assert bike.total_usage.hours == 6.5
+    assert bike.total_usage.distance == 65.5
+    assert bike.total_usage.races == 1
+    assert bike.components.wheels.rear_wheel.hub.usage.distance == 65.5
+    assert bike.components.fork.usage.hours == 6.5
+
+    ingest(log, 2, BikeBuilder().get_bike(), [[Ride(0.0, "jumps", 1.0, 60.0, 0.0)]])
+    assert bike.total_usage.distance == 65.5
+    assert len(log) == 4
+    assert [ride_id for ride_id, _ in log.rides(bike_id=1, after=0)] == [1, 2]
+    assert log.ride(3).ride_type == "jumps"
+
+
+def test_save_and_load(tmp_path):
+    log = RideLog()
+    ingest(log, 1, BikeBuilder().get_bike(), read_csv(io.StringIO(CSV_RIDES)))
+    log.save(str(tmp_path / "rides.log"))
+    loaded = RideLog.load(str(tmp_path / "rides.log"))
+    assert list(loaded.rides()) == list(log.rides())
+
+
+def test_failed_append_leaves_log_consistent():
+    log = RideLog()
+    log.append_many(1, [Ride(0.0, "casual", 10.0, 3600.0, 100.0)])
+    with pytest.raises(TypeError):
+        log.append_many(1, [Ride(1.0, "race", 5.0, 60.0, 0.0), Ride(2.0, "casual", None, 1.0, 1.0)])
+    assert {len(column) for column in log.columns.values()} == {1}
+    assert log.ride(0).distance == 10.0
+
+    log.ride_types.extend("type {}".format(number) for number in range(MAX_RIDE_TYPES - len(log.ride_types)))
+    with pytest.raises(ValueError):
+        log.append_many(1, [Ride(3.0, "one too many", 1.0, 1.0, 1.0)])
+    assert len(log) == 1 and len(log.ride_types) == MAX_RIDE_TYPES
+    log.append_many(1, [Ride(3.0, "type 200", 1.0, 1.0, 1.0)])
+    assert log.ride(1).ride_type == "type 200"
+
+
+def test_rides_of_bike_are_paged_by_index():
+    log = RideLog()
+    for bike_id in (1, 2, 1, 3, 1):
+        log.append_many(bike_id, [Ride(0.0, "casual", float(bike_id), 60.0, 0.0)])
+    assert list(log.ride_ids(1)) == [0, 2, 4]
+    assert [ride_id for ride_id, _ in log.rides(1, after=0, limit=1)] == [2]
+    assert [ride_id for ride_id, _ in log.rides(1, after=2)] == [4]
+    assert [ride_id for ride_id, _ in log.rides(after=1, limit=2)] == [2, 3]
+    assert list(log.rides(4)) == [] and list(log.rides(1, after=4)) == []
+    log.append_many(1, [Ride(0.0, "casual", 1.0, 60.0, 0.0)])
+    assert [ride_id for ride_id, _ in log.rides(1, after=2)] == [4, 5]
@@ -0,0 +1,100 @@
+from flask import Flask
+
+from api import Api
+from bike_data import Bike, BikeComponents, Fork, Hub, Wheel, Wheels
+from bike_store import BikeStore
+from search_index import Entry, SearchIndex
+from shop_search import SearchResult
+from wishlist_monitor import WishlistItem
+
+
+def make_bike(fork_model="36 Factory", hub_brand="DT Swiss", travel=160):
+    wheels = Wheels(front_wheel=Wheel(), rear_wheel=Wheel(hub=Hub(brand=hub_brand, model="350", boost=True)))
+    return Bike(users_name="enduro", brand="YT", model="Capra",
+                components=BikeComponents(fork=Fork(brand="Fox", model=fork_model, travel=travel), wheels=wheels))
+
+
+def titles(hits) -> list:
+    return [hit.title for hit in hits]
+
+
+def make_index() -> SearchIndex:
+    index = SearchIndex(capacity=2)
+    index.add_many(Entry(("catalog", url), "catalog", title, shop, url) for title, shop, url in (
+        ("RockShox Lyrik Ultimate fork", "Bike24", "https://a/1"),
+        ("RockShox Zeb Select fork", "Bike24 lyrik compatible", "https://a/2"),
+        ("Hope Pro 4 hub", "CRC", "https://a/3"),
+        ("Maxxis Assegai 2.5 WT tyre", "CRC", "https://a/4")))
+    return index
+
+
+def test_prefix_and_typo():
+    index = make_index()
+    assert titles(index.search("rocksh ly")) == ["RockShox Lyrik Ultimate fork", "RockShox Zeb Select fork"]
+    assert titles(index.search("assgai")) == ["Maxxis Assegai 2.5 WT tyre"]  # one deleted character
+    assert titles(index.search("maxxsi")) == ["Maxxis Assegai 2.5 WT tyre"]  # swapped characters
+    assert index.search("r") == []  # single character matches only whole terms
+    assert index.search("hope shimano") == []  # every word has to match
+
+
+def test_title_ranks_over_detail_and_kinds_filter():
+    index = make_index()
+    index.add_wishlist_items([WishlistItem(7, "tom", "Lyrik air spring", "https://shop/lyrik")])
+    assert titles(index.search("lyrik"))[-1] == "RockShox Zeb Select fork"
+    assert titles(index.search("lyrik", kinds=["wishlist"])) == ["Lyrik air spring"]
+    hit = index.search("lyrik air")[0]
+    assert (hit.key, hit.kind, hit.url) == (("wishlist", 7), "wishlist", "https://shop/lyrik")
+    assert titles(index.search("lyrik", limit=1)) == ["Lyrik air spring"]
+
+
+def test_changed_and_removed_entries():
+    index = make_index()
+    index.add_catalog_results([SearchResult("Hope Pro 5 hub", "https://a/3", "CRC")])
+    assert len(index) == 4
+    assert titles(index.search("hope")) == ["Hope Pro 5 hub"]
+    assert index.remove(("catalog", "https://a/4")) and not index.remove(("catalog", "https://a/4"))
+    assert index.search("maxxis") == []
+    for number in range(3000):
+        index.add("temporary", "catalog", "Hope Pro {} hub".format(number))
+    index.compact()
+    assert len(index) == 4
+    assert titles(index.search("hope pro 2999")) == ["Hope Pro 2999 hub"]
+    assert titles(index.search("hope 5")) == ["Hope Pro 5 hub"]
+    assert titles(index.search("zeb")) == ["RockShox Zeb Select fork"]
+
+
+def test_follows_writes_to_store():
+    store = BikeStore(":memory:")
+    first_id = store.add(make_bike())
+    index = SearchIndex()
+    store.subscribe(index.update_bike)
+    second_id = store.add(make_bike(hub_brand="Hope"))
+    assert {hit.key for hit in index.search("fox 36")} == {("component", first_id, "fork"),
+                                                          ("component", second_id, "fork")}
+    assert [hit.key for hit in index.search("hope 350 boost")] == [("component", second_id, "wheels.rear_wheel.hub")]
+    assert len(index.search("fox 160 enduro")) == 2  # specs and name of bike are searchable too
+
+    store.update(first_id, make_bike(fork_model="38 Performance"))
+    assert [hit.key[1] for hit in index.search("fox 36")] == [second_id]
+    assert titles(index.search("fox 38")) == ["Fox 38 Performance"]
+    store.delete(second_id)
+    assert index.search("fox 36") == [] and index.search("hope") == []
+    store.close()
+
+
+def test_api_search():
+    store = BikeStore(":memory:")
+    bike_id = store.add(make_bike())
+    index = make_index()
+    store.subscribe(index.update_bike)
+    app = Flask(__name__)
+    Api(app, store, search_index=index)
+    client = app.test_client()
+    answer = client.get("/api/search?q=fox+fact").get_json()
+    assert answer["query"] == "fox fact"
+    assert [(hit["title"], hit["bike_id"], hit["slot"]) for hit in answer["hits"]] == [("Fox 36 Factory", bike_id,
+                                                                                          "fork")]
+    answer = client.get("/api/search?q=rockshox&kind=catalog&limit=1").get_json()
+    assert [(hit["title"], hit["url"]) for hit in answer["hits"]] == [("RockShox Lyrik Ultimate fork", "https://a/1")]
+    assert client.get("/api/search?q=fox&kind=bikes").status_code == 400
+    store.close()
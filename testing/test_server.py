@@ -0,0 +1,73 @@
+import multiprocessing
+import os
+import signal
+import threading
+import time
+import urllib.request
+
+import pytest
+from flask import Flask
+
+from server import Config, Server
+
+
+def test_config_from_environ():
+    config = Config.from_environ({"BIKE_GARAGE_PORT": "8000", "BIKE_GARAGE_WORKERS": "3",
+                                  "BIKE_GARAGE_WARMUP": "/, /usage", "BIKE_GARAGE_ACCESS_LOG": "yes"})
+    assert config.port == 8000
+    assert config.workers == 3
+    assert config.threads == Config().threads
+    assert config.warmup == ("/", "/usage")
+    assert config.access_log
+    assert not config.debug
+    with pytest.raises(ValueError):
+        Config.from_environ({"BIKE_GARAGE_WORKERS": "0"})
+
+
+def make_app():
+    app = Flask(__name__)
+
+    @app.route("/")
+    def index():
+        return "pid {}".format(os.getpid())
+
+    @app.route("/slow")
+    def slow():
+        time.sleep(0.5)
+        return "done"
+
+    return app
+
+
+def get(url):
+    with urllib.request.urlopen(url, timeout=5) as response:
+        return response.read().decode()
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="pre-fork server needs os.fork")
+def test_server_serves_and_stops_gracefully():
+    app = make_app()
+    server = Server(app, Config(port=0, workers=2, threads=2, warmup=("/",)))
+    server.bind()
+    url = "http://{}:{}".format(*server.address)
+    process = multiprocessing.get_context("fork").Process(target=server.run)
+    process.start()
+    server.listener.close()
+    try:
+        pids = {get(url + "/") for _ in range(20)}
+        assert all(pid.startswith("pid ") for pid in pids)
+        assert "pid {}".format(process.pid) not in pids  # served by workers, not master
+
+        # request in flight is finished after SIGTERM
+        results = []
+        request = threading.Thread(target=lambda: results.append(get(url + "/slow")))
+        request.start()
+        time.sleep(0.2)
+        os.kill(process.pid, signal.SIGTERM)
+        request.join()
+        assert results == ["done"]
+        process.join(10)
+        assert process.exitcode == 0
+    finally:
+        if process.is_alive():
+            process.kill()
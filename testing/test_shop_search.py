@@ -0,0 +1,74 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from bike_data import Bike
+from shop_search import SearchEngine, VitalMtbAdapter
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_html",
+                       "search?cat=Site&page=1&period=all_time&q=YT+CAPRA+2022&section=product")
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    active = 0
+    max_active = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with self.lock:
+            FixtureHandler.active += 1
+            FixtureHandler.max_active = max(FixtureHandler.max_active, FixtureHandler.active)
+        try:
+            if not self.path.startswith("/search"):
+                self.send_error(404)
+                return
+            with open(FIXTURE, "rb") as f:
+                body = f.read()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with self.lock:
+                FixtureHandler.active -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def shop_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield "http://127.0.0.1:{}".format(server.server_address[1])
+    server.shutdown()
+    server.server_close()
+
+
+def test_search_merges_and_deduplicates(shop_url):
+    adapters = [VitalMtbAdapter("shop A", shop_url + "/search?q={}"),
+                VitalMtbAdapter("shop B", shop_url + "/search/?q={}"),
+                VitalMtbAdapter("broken shop", shop_url + "/missing?q={}")]
+    with SearchEngine(adapters, max_workers=4, per_host=1) as engine:
+        report = engine.search(Bike(brand="YT", model="CAPRA 2022"))
+    assert len(report.results) == 9
+    assert {result.shop for result in report.results} == {"shop A"}
+    assert report.results[0].title == "2022 YT Capra MX Launch Edition"
+    assert list(report.errors) == ["broken shop"]
+
+
+def test_search_many_respects_host_limit(shop_url):
+    FixtureHandler.max_active = 0
+    adapters = [VitalMtbAdapter("shop {}".format(number), shop_url + "/search?shop={}&q={{}}".format(number))
+                for number in range(3)]
+    bikes = [Bike(brand="YT", model="CAPRA {}".format(year)) for year in range(2018, 2023)]
+    with SearchEngine(adapters, max_workers=8, per_host=2) as engine:
+        reports = engine.search_many(bikes)
+    assert len(reports) == 5
+    assert all(len(report.results) == 9 and not report.errors for report in reports)
+    assert FixtureHandler.max_active <= 2
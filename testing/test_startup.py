@@ -0,0 +1,49 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# seconds of importing main in deferred startup mode (without start of interpreter), best of three runs
+STARTUP_BUDGET = float(os.environ.get("BIKE_GARAGE_STARTUP_BUDGET", "0.5"))
+HEAVY_MODULES = ("numpy", "requests", "lxml", "bs4", "xml.etree.ElementTree")
+
+STARTUP = """
+import json, sys, time
+start = time.perf_counter()
+import main
+seconds = time.perf_counter() - start
+loaded = [name for name in {heavy!r} if name in sys.modules]
+import bike_builder, shop_search, web_scraper, wishlist_monitor
+scraping = [name for name in {heavy!r} if name in sys.modules]
+status = main.bike_garage.test_client().get("/usage").status_code
+print(json.dumps({{"seconds": seconds, "loaded": loaded, "scraping": scraping, "status": status,
+                  "numpy_after_request": "numpy" in sys.modules}}))
+"""
+
+
+def start(deferred=True) -> dict:
+    environ = dict(os.environ, BIKE_GARAGE_DB=":memory:", BIKE_GARAGE_RIDE_LOG=os.path.join(ROOT, "missing.rides"),
+                   PYTHONPATH=ROOT)
+    if deferred:
+        environ["BIKE_GARAGE_DEFERRED_STARTUP"] = "1"
+    else:
+        environ.pop("BIKE_GARAGE_DEFERRED_STARTUP", None)
+    completed = subprocess.run([sys.executable, "-c", STARTUP.format(heavy=HEAVY_MODULES)], env=environ, cwd=ROOT,
+                               capture_output=True, text=True, check=True)
+    return json.loads(completed.stdout)
+
+
+def test_scraping_and_data_are_loaded_on_first_use():
+    started = start()
+    assert started["loaded"] == []
+    assert started["scraping"] == []  # importing scraping modules does not load their parsers and http client
+    assert started["status"] == 200
+    assert started["numpy_after_request"]
+    assert "numpy" in start(deferred=False)["loaded"]
+
+
+def test_startup_latency_budget():
+    seconds = min(start()["seconds"] for _ in range(3))
+    assert seconds < STARTUP_BUDGET, "import of main took {:.0f} ms, budget is {:.0f} ms".format(
+        seconds * 1000, STARTUP_BUDGET * 1000)
@@ -0,0 +1,70 @@
+import datetime
+
+import numpy as np
+
+from ride_log import Ride, RideLog
+from usage_rollups import UsageRollups, bucket, bucket_start, lttb
+
+
+def timestamp(*args):
+    return datetime.datetime(*args, tzinfo=datetime.timezone.utc).timestamp()
+
+
+def test_buckets():
+    starts = [timestamp(2022, 5, 1, 23), timestamp(2022, 5, 2, 8), timestamp(2022, 6, 30)]
+    days = bucket(starts, "day")
+    assert days[1] - days[0] == 1
+    weeks = bucket(starts, "week")
+    assert weeks[0] != weeks[1]  # 1. 5. 2022 was Sunday, 2. 5. Monday
+    assert bucket_start(weeks[1:2], "week")[0] == timestamp(2022, 5, 2)
+    months = bucket(starts, "month")
+    assert months[0] == months[1] != months[2]
+    assert bucket_start(months[2:], "month")[0] == timestamp(2022, 6, 1)
+    # local day, ride before midnight in UTC+2 belongs to the next day
+    assert bucket(starts[:1], "day", utc_offset=7200)[0] == days[1]
+
+
+def test_incremental_rollups():
+    log = RideLog()
+    log.append_many(1, [Ride(timestamp(2022, 5, 2, 10), "casual", 20.0, 3600, 400),
+                        Ride(timestamp(2022, 5, 2, 18), "race", 10.0, 1800, 100)])
+    log.append_many(2, [Ride(timestamp(2022, 5, 3), "casual", 5.0, 600, 0)])
+    rollups = UsageRollups(utc_offset=0)
+    last = rollups.add_ride_log(log)
+    assert last == 2
+    x, y = rollups.series(1, "day", "distance")
+    assert x.tolist() == [timestamp(2022, 5, 2)]
+    assert y.tolist() == [30.0]
+    assert rollups.series(1, "week", "rides")[1].tolist() == [2]
+
+    log.append_many(1, [Ride(timestamp(2022, 5, 5), "casual", 7.5, 600, 0),
+                        Ride(timestamp(2022, 5, 2, 20), "casual", 2.5, 600, 0)])
+    assert rollups.add_ride_log(log, after=last) == 4
+    assert rollups.add_ride_log(log, after=4) == 4
+    x, y = rollups.series(1, "day", "distance")
+    assert y.tolist() == [32.5, 0, 0, 7.5]  # days without rides are filled with zero
+    assert rollups.series(1, "day", "distance", dense=False)[1].tolist() == [32.5, 7.5]
+    assert rollups.series(1, "month", "elevation")[1].tolist() == [500.0]
+    assert rollups.series(3, "day", "distance")[1].tolist() == []
+    assert rollups.version == 5
+
+
+def test_lttb_keeps_shape():
+    x = np.arange(10000, dtype=float)
+    y = np.sin(x / 500)
+    y[4321] = 50  # single peak has to survive downsampling
+    selected = lttb(x, y, 200)
+    assert len(selected) == 200
+    assert selected[0] == 0 and selected[-1] == 9999
+    assert np.all(np.diff(selected) > 0)
+    assert 4321 in selected
+    assert len(lttb(x[:50], y[:50], 200)) == 50
+
+
+def test_chart_size_is_bounded():
+    rollups = UsageRollups(utc_offset=0)
+    starts = timestamp(2000, 1, 1) + np.arange(7300) * 86400.0
+    rollups.add_rides(np.ones(7300), starts, np.full(7300, 10.0), np.full(7300, 3600.0), np.zeros(7300))
+    chart = rollups.chart(1, "day", "distance", points=100)
+    assert len(chart) == 100
+    assert chart[0] == [timestamp(2000, 1, 1) * 1000, 10.0]
@@ -0,0 +1,150 @@
+import smtplib
+import socketserver
+import threading
+
+import pytest
+
+from component_wear import ServiceNotice
+from user_notifications import (EMAIL, InAppSink, Notification, NotificationScheduler, SmtpSink,
+                                schedule_service_reminders)
+
+
+class DebuggingSmtpHandler(socketserver.StreamRequestHandler):
+    """Just enough of SMTP to receive messages from smtplib"""
+    messages = []
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        self.reply("220 localhost debugging server")
+        while True:
+            line = self.rfile.readline().decode().strip()
+            command = line[:4].upper()
+            if not line or command == "QUIT":
+                self.reply("221 bye")
+                return
+            if command == "DATA":
+                self.reply("354 end data with <CR><LF>.<CR><LF>")
+                data = []
+                for data_line in iter(self.rfile.readline, b".\r\n"):
+                    data.append(data_line.decode())
+                DebuggingSmtpHandler.messages.append("".join(data))
+            self.reply("250 OK")
+
+
+@pytest.fixture
+def smtp_port():
+    DebuggingSmtpHandler.messages = []
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), DebuggingSmtpHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+def test_schedule_coalesce_and_cancel():
+    scheduler = NotificationScheduler()
+    scheduler.schedule(Notification("ladia", "stock", "fork", "Fox 36 in stock"), due=20)
+    scheduler.schedule(Notification("ladia", "stock", "fork", "Fox 36 in stock for 799"), due=10)
+    scheduler.schedule(Notification("ladia", "stock", "fork", "Fox 36 in stock for 749"), due=30)
+    scheduler.schedule(Notification("ladia", "stock", "shock", "Float X2 in stock"), due=15)
+    scheduler.schedule(Notification("honza", "service", "chain", "replace chain"), due=5)
+    assert len(scheduler) == 3
+    assert scheduler.cancel("ladia", "stock", "shock")
+    assert not scheduler.cancel("ladia", "stock", "shock")
+    assert scheduler.next_due() == 5
+
+    assert scheduler.run_pending(now=9) == 1
+    assert scheduler.run_pending(now=100) == 1
+    inbox = scheduler.sinks["in_app"].inbox("ladia")
+    assert [notification.message for notification in inbox] == ["Fox 36 in stock for 749"]
+    assert len(scheduler) == 0
+
+
+def test_batched_email_delivery(smtp_port):
+    scheduler = NotificationScheduler({EMAIL: SmtpSink("127.0.0.1", smtp_port, addresses={"ladia": "l@example.com"})},
+                                      batch_size=2)
+    for key in ("fork", "shock", "chain"):
+        scheduler.schedule(Notification("ladia", "service", key, key + " service", EMAIL), due=0)
+    assert scheduler.run_pending(now=1) == 3
+    assert len(DebuggingSmtpHandler.messages) == 2
+    assert "To: l@example.com" in DebuggingSmtpHandler.messages[0]
+    assert "* fork service" in DebuggingSmtpHandler.messages[0]
+
+
+def test_background_delivery_and_service_reminders():
+    sink = InAppSink()
+    scheduler = NotificationScheduler({"in_app": sink})
+    scheduler.start(poll_interval=5)
+    try:
+        notices = [ServiceNotice(1, "fork", "Fork", "lower leg service", 51.0, 50, True),
+                   ServiceNotice(2, "chain", "Chain", "replace chain", 1400.0, 1500, False)]
+        assert schedule_service_reminders(scheduler, notices, {1: "ladia"}) == 1
+        for _ in range(100):
+            if sink.inbox("ladia"):
+                break
+            threading.Event().wait(0.01)
+    finally:
+        scheduler.stop()
+    assert sink.inbox("ladia")[0].message == "lower leg service of fork on bike 1 is due (51/50)"
+
+
+class FailingSink(InAppSink):
+    """Refuses the first `failures` batches like unreachable SMTP server"""
+
+    def __init__(self, failures=1):
+        super().__init__()
+        self.failures = failures
+
+    def deliver(self, batches: dict):
+        if self.failures:
+            self.failures -= 1
+            raise smtplib.SMTPServerDisconnected("connection unexpectedly closed")
+        super().deliver(batches)
+
+
+def test_failed_delivery_is_retried():
+    email, in_app = FailingSink(), InAppSink()
+    scheduler = NotificationScheduler({EMAIL: email, "in_app": in_app}, retry_delay=60)
+    scheduler.schedule(Notification("ladia", "stock", "zeb", "Zeb in stock", channel=EMAIL), due=10)
+    scheduler.schedule(Notification("ladia", "service", "fork", "service fork"), due=10)
+    scheduler.schedule(Notification("tom", "stock", "zeb", "Zeb in stock", channel="sms"), due=10)
+    assert scheduler.run_pending(now=10) == 1  # other channels are delivered
+    assert [n.message for n in in_app.inbox("ladia")] == ["service fork"]
+    assert len(scheduler) == 2 and scheduler.next_due() == 70
+    assert scheduler.run_pending(now=69) == 0
+    assert scheduler.run_pending(now=70) == 1
+    assert [n.message for n in email.inbox("ladia")] == ["Zeb in stock"]
+    assert len(scheduler) == 1  # unknown channel is kept until its sink is added
+    scheduler.sinks["sms"] = in_app
+    assert scheduler.run_pending(now=130) == 1 and len(scheduler) == 0
+
+
+def test_background_delivery_survives_failing_sink():
+    sink = FailingSink()
+    scheduler = NotificationScheduler({"in_app": sink}, retry_delay=0.05)
+    scheduler.start(poll_interval=0.02)
+    try:
+        scheduler.schedule(Notification("ladia", "stock", "zeb", "Zeb in stock"), due=0)
+        for _ in range(200):
+            if sink.inbox("ladia"):
+                break
+            threading.Event().wait(0.01)
+        assert scheduler._thread.is_alive()
+    finally:
+        scheduler.stop()
+    assert [n.message for n in sink.inbox("ladia")] == ["Zeb in stock"]
+
+
+def test_always_failing_sink_does_not_loop():
+    with pytest.raises(ValueError):
+        NotificationScheduler(retry_delay=0)
+    sink = FailingSink(failures=float("inf"))
+    scheduler = NotificationScheduler({"in_app": sink}, batch_size=2)
+    scheduler.retry_delay = 0  # as if it was not checked, failed batch is due again right away
+    for number in range(5):
+        scheduler.schedule(Notification("ladia", "stock", str(number), "in stock"), due=0)
+    assert scheduler.run_pending(now=0) == 0
+    assert len(scheduler) == 5
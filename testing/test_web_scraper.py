@@ -1,6 +1,10 @@
+import os
 from unittest import mock
 
-from web_scraper import *
+from bike_data import Bike
+from web_scraper import parse_vital_results, search_bike_vital
+
+TEST_HTML = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_html")
 
 
 def test_search_vital():
@@ -25,9 +29,13 @@ def test_search_vital():
                         'https://www.vitalmtb.com/product/guide/Bikes,3/YT/Jeffsy-29-Uncaged-6,35143'],
                        ['2020 YT Capra Elite 29',
                         'https://www.vitalmtb.com/product/guide/Bikes,3/YT/Capra-Elite-29,30869']]
-    with open("test_html/search?cat=Site&page=1&period=all_time&q=YT+CAPRA+2022&section=product") as f:
+    with open(os.path.join(TEST_HTML, "search?cat=Site&page=1&period=all_time&q=YT+CAPRA+2022&section=product")) as f:
         mocked_web_page = f.read()
     with mock.patch('web_scraper.get_page', return_value=mocked_web_page):
         output = search_bike_vital(my_bike)
     assert output == expected_output
 
+
+def test_empty_page_has_no_results():
+    for page in ("", "  \n", "<!-- maintenance -->"):
+        assert parse_vital_results(page, ["YT"]) == []
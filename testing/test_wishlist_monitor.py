@@ -0,0 +1,143 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from user_notifications import NotificationScheduler
+from wishlist_monitor import (DomainRateLimiter, Observation, WishlistItem, WishlistMonitor, parse_product_page,
+                              schedule_change_notifications)
+
+JSON_LD_PAGE = """<html><head><script type="application/ld+json">
+{"@context": "https://schema.org", "@type": "Product", "name": "Fox 36",
+ "offers": {"@type": "Offer", "price": "%s", "priceCurrency": "EUR", "availability": "https://schema.org/%s"}}
+</script></head><body></body></html>"""
+META_PAGE = """<html><head><meta property="product:price:amount" content="49.9">
+<meta property="product:price:currency" content="EUR"><meta property="og:availability" content="instock">
+</head></html>"""
+
+
+class ShopHandler(BaseHTTPRequestHandler):
+    prices = {}
+    served_at = []
+
+    def do_GET(self):
+        ShopHandler.served_at.append(time.monotonic())
+        price, availability = ShopHandler.prices.get(self.path, ("10", "InStock"))
+        body = (JSON_LD_PAGE % (price, availability)).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def shop_url():
+    ShopHandler.prices = {}
+    ShopHandler.served_at = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ShopHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield "http://127.0.0.1:{}".format(server.server_address[1])
+    server.shutdown()
+    server.server_close()
+
+
+def test_parse_product_page():
+    assert parse_product_page(JSON_LD_PAGE % ("799.00", "OutOfStock")) == Observation(799.0, "EUR", False)
+    assert parse_product_page(META_PAGE) == Observation(49.9, "EUR", True)
+    assert parse_product_page("<html><body>nothing</body></html>") is None
+    assert parse_product_page("") is None and parse_product_page(" \n") is None
+
+
+def test_only_changes_are_emitted(shop_url):
+    items = [WishlistItem(number, "ladia", "part {}".format(number), "{}/part/{}".format(shop_url, number))
+             for number in range(4)]
+    with WishlistMonitor(min_interval=0, jitter=0) as monitor:
+        assert monitor.check(items).changes == []
+        assert monitor.check(items).changes == []
+        ShopHandler.prices["/part/2"] = ("8", "InStock")
+        ShopHandler.prices["/part/3"] = ("10", "OutOfStock")
+        report = monitor.check(items)
+    assert [(change.item.item_id, change.current) for change in report.changes] == [
+        (2, Observation(8.0, "EUR", True)), (3, Observation(10.0, "EUR", False))]
+
+    scheduler = NotificationScheduler()
+    assert schedule_change_notifications(scheduler, report.changes, due=0) == 2
+    scheduler.run_pending(now=1)
+    assert [notification.message for notification in scheduler.sinks["in_app"].inbox("ladia")] == [
+        "part 2 price changed from 10.0 to 8.0 EUR", "part 3 is out of stock"]
+
+
+def test_domain_rate_limit_and_deadline(shop_url):
+    items = [WishlistItem(number, "ladia", "part", "{}/part/{}".format(shop_url, number)) for number in range(6)]
+    with WishlistMonitor(max_workers=6, min_interval=0.05, jitter=0.01) as monitor:
+        report = monitor.check(items, max_duration=0.12)
+    assert 2 <= len(ShopHandler.served_at) <= 4
+    assert len(report.skipped) == 6 - len(ShopHandler.served_at)
+    gaps = [later - earlier for earlier, later in zip(ShopHandler.served_at, ShopHandler.served_at[1:])]
+    assert all(gap >= 0.04 for gap in gaps)
+
+
+def test_skipped_items_do_not_take_slots_of_next_check(shop_url):
+    items = [WishlistItem(number, "ladia", "part", "{}/part/{}".format(shop_url, number)) for number in range(50)]
+    with WishlistMonitor(max_workers=4, min_interval=0.05, jitter=0) as monitor:
+        first = monitor.check(items, max_duration=0.12)
+        served = len(ShopHandler.served_at)
+        second = monitor.check(items, max_duration=0.12)
+    assert served >= 2 and len(first.skipped) == 50 - served
+    assert len(ShopHandler.served_at) - served >= 2
+    assert len(second.skipped) == 50 - (len(ShopHandler.served_at) - served)
+
+
+def test_rate_limiter_reserves_slots_per_domain():
+    now = [100.0]
+    limiter = DomainRateLimiter(min_interval=2, jitter=0, intervals={"slow.shop": 10}, clock=lambda: now[0])
+    assert limiter.reserve("https://shop.cz/a") == 100
+    assert limiter.reserve("https://shop.cz/b") == 102
+    assert limiter.reserve("https://other.cz/a") == 100
+    assert limiter.reserve("https://slow.shop/a") == 100
+    assert limiter.reserve("https://slow.shop/b") == 110
+    assert limiter.reserve("https://slow.shop/c", deadline=115) is None
+    assert limiter.reserve("https://slow.shop/c", deadline=125) == 120  # skipped request did not move the slot
+
+
+def test_unexpected_errors_are_reported_and_monitor_keeps_running(shop_url):
+    def parse(html_page):
+        raise KeyError("offers")
+
+    items = [WishlistItem(1, "ladia", "part", shop_url + "/part/1")]
+    with WishlistMonitor(parse=parse, min_interval=0, jitter=0) as monitor:
+        report = monitor.check(items)
+    assert isinstance(report.errors[1], KeyError)
+
+    calls = []
+
+    def get_items():
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            raise TypeError("wishlist is not loaded yet")
+        return items
+
+    with WishlistMonitor(min_interval=0, jitter=0) as monitor:
+        monitor.start(get_items, 0.02, lambda changes: None)
+        for _ in range(200):
+            if monitor.last_seen:
+                break
+            time.sleep(0.01)
+    assert len(calls) >= 2 and "1" in monitor.last_seen  # the first failed check did not end the thread
+
+
+def test_busy_shop_does_not_hold_workers_of_other_shops(shop_url):
+    port = shop_url.rsplit(":", 1)[1]
+    busy = [WishlistItem(number, "ladia", "part", "{}/busy/{}".format(shop_url, number)) for number in range(20)]
+    idle = [WishlistItem(number, "ladia", "part", "http://localhost:{}/idle/{}".format(port, number))
+            for number in range(20, 24)]
+    with WishlistMonitor(max_workers=2, min_interval=0.1, jitter=0) as monitor:
+        report = monitor.check(busy + idle, max_duration=0.45)
+    assert not report.errors
+    skipped = [item.item_id for item in report.skipped]
+    assert not [item_id for item_id in skipped if item_id >= 20]  # idle shop did not wait behind the busy one
+    assert 14 <= len(skipped) <= 17
@@ -0,0 +1,167 @@
+"""
+Rollups of ride history for usage charts
+* distance, duration, elevation and number of rides are summed per bike and day, week (from Monday) and month
+* rides are added incrementally (add_ride_log adds only rides after the last added one), each batch is bucketed
+  and summed in numpy and merged into sorted per bike arrays, so rides are never summed again
+* series longer than wanted number of points are downsampled by Largest-Triangle-Three-Buckets, which keeps
+  peaks and overall shape of the series, so chart payload does not grow with length of history
+"""
+import datetime
+import threading
+
+import numpy as np
+
+PERIODS = ("day", "week", "month")
+METRICS = ("distance", "duration", "elevation", "rides")
+DAY = 86400
+_SHIFT = 1 << 31  # buckets before epoch are negative
+
+
+def _local_offset() -> int:
+    """Offset of local time zone from UTC in seconds, ride starts are bucketed by local days"""
+    return int(datetime.datetime.now().astimezone().utcoffset().total_seconds())
+
+
+def bucket(starts, period: str, utc_offset=0):
+    """Returns index of day / week / month since epoch for every unix timestamp in starts"""
+    days = np.floor_divide(np.asarray(starts, dtype=np.float64) + utc_offset, DAY).astype(np.int64)
+    if period == "day":
+        return days
+    if period == "week":
+        return np.floor_divide(days + 3, 7)  # 1970-01-01 was Thursday, weeks start on Monday
+    if period == "month":
+        return days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+    raise ValueError(period)
+
+
+def bucket_start(buckets, period: str, utc_offset=0):
+    """Unix timestamps of beginnings of buckets made by bucket()"""
+    buckets = np.asarray(buckets, dtype=np.int64)
+    if period == "day":
+        days = buckets
+    elif period == "week":
+        days = buckets * 7 - 3
+    elif period == "month":
+        days = buckets.astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+    else:
+        raise ValueError(period)
+    return days * DAY - utc_offset
+
+
+def lttb(x, y, threshold: int):
+    """
+    Largest-Triangle-Three-Buckets downsampling, returns indexes of at most threshold points of series (x, y)
+    which keep its shape, the first and the last point are always kept
+    """
+    size = len(x)
+    if threshold >= size or threshold < 3:
+        return np.arange(size)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # inner points are split into threshold - 2 buckets, one point is chosen from each of them
+    edges = np.linspace(1, size - 1, threshold - 1).astype(np.int64)
+    # third point of triangle is average of the next bucket (the last point for the last bucket)
+    counts = np.append(np.diff(edges), 1).astype(np.float64)
+    next_x = (np.add.reduceat(x, edges) / counts)[1:].tolist()
+    next_y = (np.add.reduceat(y, edges) / counts)[1:].tolist()
+    edges = edges.tolist()
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = size - 1
+    previous_x, previous_y = float(x[0]), float(y[0])
+    for index in range(threshold - 2):
+        start, end = edges[index], edges[index + 1]
+        average_x, average_y = next_x[index], next_y[index]
+        areas = np.abs((previous_x - average_x) * (y[start:end] - previous_y)
+                       - (previous_x - x[start:end]) * (average_y - previous_y))
+        chosen = start + int(areas.argmax())
+        selected[index + 1] = chosen
+        previous_x, previous_y = float(x[chosen]), float(y[chosen])
+    return selected
+
+
+class _Series:
+    """Sorted buckets of one bike and period with sums of metrics (one column per metric)"""
+
+    def __init__(self):
+        self.buckets = np.zeros(0, dtype=np.int64)
+        self.values = np.zeros((0, len(METRICS)))
+
+    def merge(self, buckets, values):
+        """buckets are unique and sorted, values are added to existing buckets or inserted"""
+        positions = np.searchsorted(self.buckets, buckets)
+        existing = positions < len(self.buckets)
+        existing[existing] = self.buckets[positions[existing]] == buckets[existing]
+        self.values[positions[existing]] += values[existing]
+        new = ~existing
+        if new.any():
+            self.buckets = np.insert(self.buckets, positions[new], buckets[new])
+            self.values = np.insert(self.values, positions[new], values[new], axis=0)
+
+
+class UsageRollups:
+    def __init__(self, utc_offset=None):
+        self.utc_offset = _local_offset() if utc_offset is None else utc_offset
+        self.version = 0  # number of added rides, pages showing rollups are cached by it
+        self._series = {period: {} for period in PERIODS}  # period -> bike id -> _Series
+        self._lock = threading.Lock()
+
+    def add_rides(self, bike_ids, starts, distance, duration, elevation):
+        """Adds rides given as equally long arrays (duration in seconds), in any order of time"""
+        bike_ids = np.asarray(bike_ids, dtype=np.int64)
+        if not len(bike_ids):
+            return
+        values = np.column_stack([distance, duration, elevation, np.ones(len(bike_ids))]).astype(np.float64)
+        with self._lock:
+            for period in PERIODS:
+                # bike id in upper and bucket in lower 32 bits, so sorted keys are ordered by bike and then time
+                keys, inverse = np.unique((bike_ids << 32) + (bucket(starts, period, self.utc_offset) + _SHIFT),
+                                          return_inverse=True)
+                sums = np.column_stack([np.bincount(inverse, weights=values[:, column], minlength=len(keys))
+                                        for column in range(len(METRICS))])
+                key_bikes = keys >> 32
+                key_buckets = (keys & 0xFFFFFFFF) - _SHIFT
+                bikes, first = np.unique(key_bikes, return_index=True)
+                last = np.append(first[1:], len(keys))
+                series = self._series[period]
+                for bike_id, start, end in zip(bikes.tolist(), first, last):
+                    series.setdefault(bike_id, _Series()).merge(key_buckets[start:end], sums[start:end])
+            self.version += len(bike_ids)
+
+    def add_ride_log(self, log, after=-1):
+        """Adds rides of RideLog with id greater than after, returns id of last added ride"""
+        start = after + 1
+        if start >= len(log):
+            return after
+        columns = log.columns
+        self.add_rides(np.frombuffer(columns["bike_id"], dtype=np.dtype(columns["bike_id"].typecode))[start:],
+                       np.frombuffer(columns["start"], dtype=np.float64)[start:],
+                       np.frombuffer(columns["distance"], dtype=np.float32)[start:],
+                       np.frombuffer(columns["duration"], dtype=np.float32)[start:],
+                       np.frombuffer(columns["elevation"], dtype=np.float32)[start:])
+        return len(log) - 1
+
+    def series(self, bike_id: int, period: str, metric: str, dense=True):
+        """
+        Returns (unix timestamps of buckets, sums of metric) of bike ordered by time, with dense also buckets
+        without rides between the first and the last ride (with zero)
+        """
+        if metric not in METRICS:
+            raise ValueError(metric)
+        with self._lock:
+            series = self._series[period].get(bike_id)
+            if series is None:
+                return np.zeros(0), np.zeros(0)
+            buckets, values = series.buckets, series.values[:, METRICS.index(metric)].copy()
+        if dense and len(buckets):
+            all_buckets = np.arange(buckets[0], buckets[-1] + 1)
+            all_values = np.zeros(len(all_buckets))
+            all_values[buckets - buckets[0]] = values
+            buckets, values = all_buckets, all_values
+        return bucket_start(buckets, period, self.utc_offset), values
+
+    def chart(self, bike_id: int, period: str, metric: str, points=200) -> list:
+        """[[milliseconds since epoch, value], ...] of series downsampled to at most points, for ApexCharts"""
+        x, y = self.series(bike_id, period, metric)
+        selected = lttb(x, y, points)
+        return np.column_stack([x[selected] * 1000, np.round(y[selected], 2)]).tolist()
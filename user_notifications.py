@@ -2,4 +2,247 @@
 Classes for notification for user in app or via email
 * components being in stock
 * service intervals
-"""
\ No newline at end of file
+
+Notifications wait in heap ordered by due time, scheduling is O(log n) and cancelling O(1) (entry is only
+marked and dropped once it reaches top of heap). Notification with the same user, kind and key replaces
+the pending one instead of being sent twice. Due notifications are delivered in batches per channel and user,
+batch whose delivery fails goes back to heap and is tried again after retry_delay.
+"""
+import heapq
+import itertools
+import logging
+import smtplib
+import threading
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from email.message import EmailMessage
+
+IN_APP = "in_app"
+EMAIL = "email"
+
+log = logging.getLogger("bike_garage.notifications")
+
+
+@dataclass
+class Notification:
+    user: str
+    kind: str  # "stock", "service", ...
+    key: str  # what the notification is about, duplicates share it
+    message: str
+    channel: str = field(default=IN_APP)
+
+    @property
+    def identity(self):
+        return self.user, self.kind, self.key
+
+
+class InAppSink:
+    """Keeps last notifications of every user in memory, shown in app"""
+
+    def __init__(self, max_per_user=100):
+        self._inboxes = defaultdict(lambda: deque(maxlen=max_per_user))
+        self._lock = threading.Lock()
+
+    def deliver(self, batches: dict):
+        with self._lock:
+            for user, notifications in batches.items():
+                self._inboxes[user].extend(notifications)
+
+    def inbox(self, user) -> list:
+        with self._lock:
+            return list(self._inboxes.get(user, ()))
+
+
+class SmtpSink:
+    """Sends one digest email per user and batch, all of them over single SMTP connection"""
+
+    def __init__(self, host="localhost", port=25, sender="bike-garage@localhost", addresses=None, timeout=10):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.addresses = addresses or {}
+        self.timeout = timeout
+
+    def address(self, user):
+        return self.addresses.get(user, user)
+
+    def deliver(self, batches: dict):
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            for user, notifications in batches.items():
+                message = EmailMessage()
+                message["From"] = self.sender
+                message["To"] = self.address(user)
+                message["Subject"] = "Bike Garage: {} notification{}".format(
+                    len(notifications), "" if len(notifications) == 1 else "s")
+                message.set_content("\n".join("* " + notification.message for notification in notifications))
+                smtp.send_message(message)
+
+
+class NotificationScheduler:
+    def __init__(self, sinks=None, batch_size=500, clock=time.time, retry_delay=300):
+        self.sinks = sinks if sinks is not None else {IN_APP: InAppSink()}
+        self.batch_size = batch_size
+        if retry_delay <= 0:
+            raise ValueError("retry_delay has to be positive, failed notifications would be retried in a loop")
+        self.retry_delay = retry_delay
+        self.clock = clock
+        self._heap = []
+        self._pending = {}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        self._thread = None
+        self._stopping = False
+
+    def __len__(self):
+        return len(self._pending)
+
+    def schedule(self, notification: Notification, due: float):
+        """Schedules notification, pending duplicate is replaced and keeps the earlier due time"""
+        identity = notification.identity
+        with self._lock:
+            previous = self._pending.pop(identity, None)
+            if previous is not None:
+                previous[3] = None
+                due = min(due, previous[0])
+            entry = [due, next(self._counter), identity, notification]
+            self._pending[identity] = entry
+            heapq.heappush(self._heap, entry)
+            self._compact()
+            if self._heap[0] is entry:
+                self._condition.notify()
+
+    def cancel(self, user, kind, key) -> bool:
+        with self._lock:
+            entry = self._pending.pop((user, kind, key), None)
+            if entry is None:
+                return False
+            entry[3] = None
+            self._compact()
+            return True
+
+    def _compact(self):
+        """Drops cancelled entries once they take more than half of heap"""
+        if len(self._heap) > 64 and len(self._heap) > 2 * len(self._pending):
+            self._heap = [entry for entry in self._heap if entry[3] is not None]
+            heapq.heapify(self._heap)
+
+    def next_due(self):
+        with self._lock:
+            self._drop_cancelled()
+            return self._heap[0][0] if self._heap else None
+
+    def _drop_cancelled(self):
+        while self._heap and self._heap[0][3] is None:
+            heapq.heappop(self._heap)
+
+    def pop_due(self, now=None) -> list:
+        """Removes and returns at most batch_size notifications which are due"""
+        now = self.clock() if now is None else now
+        due = []
+        with self._lock:
+            while len(due) < self.batch_size:
+                self._drop_cancelled()
+                if not self._heap or self._heap[0][0] > now:
+                    break
+                entry = heapq.heappop(self._heap)
+                del self._pending[entry[2]]
+                due.append(entry[3])
+        return due
+
+    def deliver(self, notifications) -> list:
+        """Delivers notifications in batches per channel and user, returns those of channels which failed"""
+        batches = defaultdict(lambda: defaultdict(list))
+        for notification in notifications:
+            batches[notification.channel][notification.user].append(notification)
+        failed = []
+        for channel, per_user in batches.items():
+            try:
+                sink = self.sinks[channel]
+                sink.deliver(dict(per_user))
+            except Exception:  # unknown channel, SMTP and network errors, ...
+                log.exception("delivery of notifications to channel %s failed", channel)
+                failed.extend(itertools.chain.from_iterable(per_user.values()))
+        return failed
+
+    def _retry(self, notifications, due):
+        """Puts back notifications whose delivery failed, unless newer duplicate was scheduled in the meantime"""
+        with self._lock:
+            for notification in notifications:
+                identity = notification.identity
+                if identity in self._pending:
+                    continue
+                entry = [due, next(self._counter), identity, notification]
+                self._pending[identity] = entry
+                heapq.heappush(self._heap, entry)
+
+    def run_pending(self, now=None) -> int:
+        """
+        Delivers everything that is due, returns number of delivered notifications, each notification is tried at
+        most once per call
+        """
+        now = self.clock() if now is None else now
+        delivered = 0
+        tried = set()  # identities whose delivery failed in this call
+        while True:
+            notifications = self.pop_due(now)
+            fresh = [notification for notification in notifications if notification.identity not in tried]
+            if len(fresh) < len(notifications):
+                self._retry([notification for notification in notifications if notification.identity in tried],
+                            now + self.retry_delay)
+            if not fresh:
+                return delivered
+            failed = self.deliver(fresh)
+            if failed:
+                tried.update(notification.identity for notification in failed)
+                self._retry(failed, now + self.retry_delay)
+            delivered += len(fresh) - len(failed)
+
+    def _run(self, poll_interval):
+        while True:
+            with self._condition:
+                if self._stopping:
+                    return
+                next_due = self._heap[0][0] if self._heap else None
+                timeout = poll_interval if next_due is None else min(poll_interval, max(0, next_due - self.clock()))
+                self._condition.wait(timeout)
+                if self._stopping:
+                    return
+            try:
+                self.run_pending()
+            except Exception:
+                log.exception("running of pending notifications failed")
+
+    def start(self, poll_interval=60):
+        """Starts background thread which delivers notifications when they become due"""
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, args=(poll_interval,), daemon=True,
+                                        name="notification-scheduler")
+        self._thread.start()
+
+    def stop(self):
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+def schedule_service_reminders(scheduler: NotificationScheduler, notices, users: dict, due=None,
+                               channel=IN_APP) -> int:
+    """Schedules reminder for every ServiceNotice of component_wear, users maps bike id to user"""
+    due = scheduler.clock() if due is None else due
+    count = 0
+    for notice in notices:
+        user = users.get(notice.bike_id)
+        if user is None:
+            continue
+        state = "is due" if notice.due else "will be due soon"
+        message = "{} of {} on bike {} {} ({:.0f}/{})".format(
+            notice.service, notice.slot, notice.bike_id, state, notice.used, notice.interval)
+        key = "{}:{}:{}".format(notice.bike_id, notice.slot, notice.service)
+        scheduler.schedule(Notification(user, "service", key, message, channel), due)
+        count += 1
+    return count
@@ -1,14 +1,96 @@
-from collections import namedtuple
-from flask import Flask, render_template, request
+"""
+Web gui of the garage
+* with BIKE_GARAGE_DEFERRED_STARTUP=1 ride history is loaded and usage rollups and search index (numpy) are built
+  on the first request instead of at import, so short lived processes (CLI, tests, dev server restarts) start fast
+* search index follows every write to the garage, search bar of the header asks /api/search as user types
+* photos of gallery of bike are ingested in background when the bike is written (or its gallery is first shown),
+  gallery page only links thumbnails which are already made
+"""
+import os
+import threading
+
+from flask import Flask, g, render_template, request
+
+from api import Api
+from asset_pipeline import Assets
+from bike_store import BikeStore, components_table
+from photo_gallery import PHOTO_ROOT, Photos, PhotoStore
+from response_cache import ResponseCache
+from ride_log import RideLog
+from web_metrics import WebMetrics
 
 bike_garage = Flask(__name__)
+web_metrics = WebMetrics(bike_garage, profiling=os.environ.get("BIKE_GARAGE_PROFILING", "") in ("1", "true", "yes"))
+assets = Assets(bike_garage)
+
+cache = ResponseCache(bike_garage, extra=assets.manifest)
+bike_garage.jinja_env.globals["components_table"] = components_table
+
+garage = BikeStore(os.environ.get("BIKE_GARAGE_DB", "bike_garage.db"))
+ride_log_path = os.environ.get("BIKE_GARAGE_RIDE_LOG", "bike_garage.rides")
+deferred_startup = os.environ.get("BIKE_GARAGE_DEFERRED_STARTUP", "") in ("1", "true", "yes")
+rides = RideLog()
+api = Api(bike_garage, garage, rides)
+photos = Photos(bike_garage, PhotoStore(os.environ.get("BIKE_GARAGE_PHOTOS", PHOTO_ROOT)))
+rollups = None
+search_index = None
+_loaded = False
+_load_lock = threading.Lock()
+
+CHART_POINTS = 200
+
+
+def load_data():
+    """
+    Loads ride history, builds its usage rollups and search index of the garage, once (at import, or on first
+    request when deferred)
+    """
+    global rides, rollups, search_index, _loaded
+    if _loaded:
+        return
+    with _load_lock:
+        if _loaded:
+            return
+        from search_index import SearchIndex
+        from usage_rollups import UsageRollups
+
+        if os.path.exists(ride_log_path):
+            rides = api.rides = RideLog.load(ride_log_path)
+        loaded = UsageRollups()
+        loaded.add_ride_log(rides)
+        rollups = loaded
+        index = SearchIndex()
+        garage.subscribe(index.update_bike)
+        search_index = api.search_index = index
+        _loaded = True
+
+
+if deferred_startup:
+    bike_garage.before_request(load_data)
+else:
+    load_data()
+
+
+def ingest_gallery(bike_id, bike):
+    """Listener of garage, photos of gallery of written bike are ingested in background"""
+    if bike is not None and bike.path_to_gallery and os.path.isdir(bike.path_to_gallery):
+        photos.store.ingest_in_background(bike.path_to_gallery)
 
-BikeDescriptor = namedtuple("BikeDescriptor", "name color size components")
-Point = namedtuple("Point", "x y")
-Point(x=2, y=4)
-all_bikes = {
-    "1": BikeDescriptor(name='Sean', color='Red', size='22', components={'wheel_size': 22, 'frame_size': 222})
-}
+
+garage.listeners.append(ingest_gallery)
+
+
+def bike_version():
+    """(bike id, version) of bike selected by bike_num argument, pages showing the bike are cached by it"""
+    if "bike_version" not in g:
+        bike_num = request.args.get('bike_num', type=int)
+        g.bike_version = bike_num, garage.version(bike_num) if bike_num else None
+    return g.bike_version
+
+
+def usage_version():
+    """Version of data shown by /usage, rollups change when rides are added"""
+    return bike_version() + (rollups.version,)
 
 
 @bike_garage.route("/")
@@ -19,10 +101,16 @@ def index(bike_num=None):
 
 
 @bike_garage.route("/usage")
+@cache.page(usage_version)
 def usage():
-    chart_data = [10, 41, 35, 51, 49, 62, 69, 2, 148]
-    chart_data2 = [10, 41, 52, 1, 49, 62, 69, 91, 148]
-    chart_xseries = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep']
+    from usage_rollups import PERIODS
+
+    bike_num, _ = bike_version()
+    period = request.args.get("period", "week")
+    if period not in PERIODS:
+        period = "week"
+    # rollups are downsampled, so size of the page does not grow with length of ride history
+    charts = {metric: rollups.chart(bike_num, period, metric, CHART_POINTS) for metric in ("distance", "elevation")}
     ride_data = {
         "Date": "%d. %m. %Y",
         "Ride Type": "casual/high intensity/bikepark/jumps",
@@ -33,22 +121,26 @@ def usage():
     }
     return render_template(
         "usage.html",
-        chart_data=chart_data,
-        chart_data2=chart_data2,
-        chart_xseries=chart_xseries,
+        usage_version=usage_version(),
+        period=period,
+        periods=PERIODS,
+        charts=charts,
         ride_data=ride_data
     )
 
 
 @bike_garage.route("/components/")
+@cache.page(bike_version)
 def components():
-    bike_num = request.args.get('bike_num')
-    if not bike_num or bike_num not in all_bikes:
+    bike_num, version = bike_version()
+    if version is None:
         return render_template("components.html")
-    return render_template("components.html", component_data=all_bikes[bike_num].components)
+    # components of bike are loaded only if the table fragment is not cached
+    return render_template("components.html", bike=garage.get(bike_num), bike_version=version)
 
 
 @bike_garage.route("/setup/")
+@cache.page(bike_version)
 def setup():
     return render_template("setup.html")
 
@@ -56,3 +148,25 @@ def setup():
 @bike_garage.route("/wishlist/")
 def wishlist():
     return render_template("wishlist.html")
+
+
+def gallery_folder():
+    if "gallery_folder" not in g:
+        bike_num, version = bike_version()
+        bike = garage.get(bike_num) if version is not None else None
+        g.gallery_folder = bike.path_to_gallery if bike is not None else None
+    return g.gallery_folder
+
+
+def gallery_version():
+    """Version of data shown by /gallery/, manifest of gallery changes when its photos are ingested"""
+    return bike_version() + (photos.store.gallery_version(gallery_folder()),)
+
+
+@bike_garage.route("/gallery/")
+@cache.page(gallery_version)
+def gallery():
+    folder = gallery_folder()
+    if folder and photos.store.gallery_version(folder) is None and os.path.isdir(folder):
+        photos.store.ingest_in_background(folder)  # page shows the photos once they are ingested
+    return render_template("gallery.html", folder=folder, photos=photos.store.gallery(folder))
@@ -0,0 +1,71 @@
+"""
+Instrumentation of Flask app
+* every request is timed by endpoint, templates rendered during it are timed separately (Flask signals) and
+  time of the view is time of the request without them
+* /metrics returns metrics of all processes of the server in Prometheus text format
+* profiling can be switched on at runtime (profiling attribute, BIKE_GARAGE_PROFILING=1 at start), a request
+  with ?profile=1 is then run under SamplingProfiler and its report is returned instead of the response
+"""
+import time
+
+from flask import Response, before_render_template, g, request, template_rendered
+
+import metrics
+from metrics import RENDER_SECONDS, REQUEST_SECONDS, VIEW_SECONDS, SamplingProfiler
+
+PROMETHEUS_TEXT = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class WebMetrics:
+    def __init__(self, app=None, registry=None, profiling=False):
+        self.registry = registry or metrics.registry
+        self.profiling = profiling
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.before_request(self._before)
+        app.after_request(self._after)
+        before_render_template.connect(self._render_started, app)
+        template_rendered.connect(self._render_finished, app)
+        app.add_url_rule("/metrics", "metrics", self.metrics)
+
+    def _before(self):
+        self.registry.start_export()
+        g.metrics_start = time.perf_counter()
+        g.metrics_renders = []
+        g.metrics_render_seconds = 0.0
+        if self.profiling and request.args.get("profile") == "1":
+            g.metrics_profiler = SamplingProfiler().start()
+
+    @staticmethod
+    def _render_started(sender, template, context, **extra):
+        g.setdefault("metrics_renders", []).append(time.perf_counter())
+
+    @staticmethod
+    def _render_finished(sender, template, context, **extra):
+        renders = g.get("metrics_renders")
+        if not renders:
+            return
+        seconds = time.perf_counter() - renders.pop()
+        RENDER_SECONDS.observe(seconds, template.name)
+        if not renders and "metrics_render_seconds" in g:
+            # template rendered from another one is already part of its time
+            g.metrics_render_seconds += seconds
+
+    def _after(self, response):
+        start = g.pop("metrics_start", None)
+        if start is None:
+            return response
+        seconds = time.perf_counter() - start
+        endpoint = request.endpoint or "unmatched"
+        REQUEST_SECONDS.observe(seconds, endpoint, request.method, str(response.status_code))
+        VIEW_SECONDS.observe(seconds - g.metrics_render_seconds, endpoint)
+        profiler = g.pop("metrics_profiler", None)
+        if profiler is not None:
+            profiler.stop()
+            return Response(profiler.report(), mimetype="text/plain")
+        return response
+
+    def metrics(self):
+        return Response(self.registry.render(), content_type=PROMETHEUS_TEXT)
@@ -3,37 +3,75 @@ This file should contain classes for scraping following information:
 * possible automatic gathering bike information (components, geometry) from provided web pages
 * searching for replacement parts
 * checking the price and availability of parts in wishlist
-"""
-from bs4 import BeautifulSoup
-import lxml
-import requests
 
+lxml and requests are imported on first use, so importing this module (e.g. for search_terms) stays cheap
+"""
 from bike_data import Bike
+from metrics import PARSE_SECONDS
+from page_cache import PageCache
 
 VITAL_MTB_SEARCH = "https://www.vitalmtb.com/search?cat=Site&page=1&period=all_time&q={}&section=product"
 BIKE_PRODUCT_SEPARATORS = [" Bike -", " -"]
+TIMEOUT = 10
+
+page_cache = PageCache(ttls={"www.vitalmtb.com": 3600})
+_session = None
+
+
+def get_session():
+    """Returns requests.Session shared by all requests of this module, so connections to shops are kept alive"""
+    global _session
+    if _session is None:
+        import requests
+
+        _session = requests.Session()
+    return _session
 
 
 def get_page(url_link: str):
-    response = requests.get(VITAL_MTB_SEARCH.format(url_link))
-    response.raise_for_status()
-    return response.text
+    return page_cache.fetch(VITAL_MTB_SEARCH.format(url_link), get_session(), timeout=TIMEOUT)
 
 
-def search_bike_vital(bike: Bike) -> list:
-    search_by = bike.brand.split() + bike.model.split()
-    link_search = "+".join(search_by)
-    html_page = get_page(link_search)
-    soup = BeautifulSoup(html_page, features="lxml")
-    found_items = [found_item.find("a") for found_item in soup.find_all(role="search-result")]
+def search_terms(bike: Bike) -> list:
+    return bike.brand.split() + bike.model.split()
+
 
+SEARCH_RESULT_LINKS = "//*[@role='search-result']/descendant::a[1]"
+
+
+def parse_document(html_page: str):
+    """Returns lxml document of page, None for page without any element (empty, only whitespace or comments)"""
+    import lxml.etree
+    import lxml.html
+
+    try:
+        return lxml.html.fromstring(html_page)
+    except lxml.etree.ParserError:
+        return None
+
+
+def parse_vital_results(html_page: str, search_by: list) -> list:
+    """Returns [product name, link] of search results, only result anchors are turned into python objects"""
+    document = parse_document(html_page)
+    if document is None:
+        return []
+    terms = [term.lower() for term in search_by]
     results = []
-    for item in found_items:
-        text = item.text
-        link = item["href"]
-        if any([x.lower() in text.lower() for x in search_by]):
+    for item in document.xpath(SEARCH_RESULT_LINKS):
+        text = item.text_content()
+        link = item.get("href")
+        lowered = text.lower()
+        if any(term in lowered for term in terms):
             for product_string in BIKE_PRODUCT_SEPARATORS:
                 if product_string in text:
                     results.append([text.split(product_string)[0], link])
                     break
     return results
+
+
+def search_bike_vital(bike: Bike) -> list:
+    search_by = search_terms(bike)
+    link_search = "+".join(search_by)
+    html_page = get_page(link_search)
+    with PARSE_SECONDS.time("vital"):
+        return parse_vital_results(html_page, search_by)
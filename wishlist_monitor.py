@@ -0,0 +1,295 @@
+"""
+Monitoring of price and availability of parts in wishlist
+* shop pages are polled on pool of worker threads
+* requests to one domain are spaced by minimal interval with random jitter, so no shop is hammered, request is
+  handed to worker only once slot of its domain comes, workers never sleep on the limiter
+* last observed price and stock of every item is kept and event is emitted only when it changes
+* whole check has deadline, items which did not fit into it are reported as skipped
+* lxml and requests are imported on first use
+* checked items can be added to SearchIndex
+"""
+import heapq
+import itertools
+import json
+import logging
+import random
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from metrics import PARSE_SECONDS, timed_get
+from user_notifications import Notification
+from web_scraper import parse_document
+
+WishlistItem = namedtuple("WishlistItem", "item_id user name url")
+Observation = namedtuple("Observation", "price currency in_stock")
+PriceChange = namedtuple("PriceChange", "item previous current")
+CheckReport = namedtuple("CheckReport", "changes errors skipped")
+
+log = logging.getLogger("bike_garage.wishlist")
+
+IN_STOCK = ("instock", "in_stock", "in stock", "limitedavailability", "onlineonly")
+
+
+def _offers(data):
+    """Yields offers of every Product found in JSON-LD data"""
+    if isinstance(data, list):
+        for value in data:
+            yield from _offers(value)
+    elif isinstance(data, dict):
+        if "@graph" in data:
+            yield from _offers(data["@graph"])
+        offers = data.get("offers")
+        if isinstance(offers, list):
+            yield from offers
+        elif isinstance(offers, dict):
+            yield offers
+
+
+def _in_stock(availability) -> bool:
+    availability = str(availability or "").rsplit("/", 1)[-1].lower()
+    return availability in IN_STOCK
+
+
+def parse_product_page(html_page: str):
+    """Returns Observation from JSON-LD offer or product meta tags of page, None when page has no price"""
+    document = parse_document(html_page)
+    if document is None:
+        return None
+    for script in document.xpath("//script[@type='application/ld+json']/text()"):
+        try:
+            data = json.loads(script)
+        except ValueError:
+            continue
+        for offer in _offers(data):
+            price = offer.get("price") or offer.get("lowPrice")
+            if price is not None:
+                return Observation(float(price), offer.get("priceCurrency"), _in_stock(offer.get("availability")))
+    meta = {element.get("property"): element.get("content")
+            for element in document.xpath("//meta[starts-with(@property, 'product:') or @property='og:availability']")}
+    if meta.get("product:price:amount"):
+        availability = meta.get("product:availability") or meta.get("og:availability")
+        return Observation(float(meta["product:price:amount"]), meta.get("product:price:currency"),
+                           _in_stock(availability))
+    return None
+
+
+class DomainRateLimiter:
+    """Reserves time slots per domain, consecutive requests are at least min_interval (+ jitter) apart"""
+
+    def __init__(self, min_interval=1.0, jitter=0.5, intervals=None, clock=time.monotonic, sleep=time.sleep):
+        self.min_interval = min_interval
+        self.jitter = jitter
+        self.intervals = dict(intervals or {})
+        self.clock = clock
+        self.sleep = sleep
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def domain(url: str) -> str:
+        return urlsplit(url).netloc.lower()
+
+    def ready_at(self, url: str) -> float:
+        """Returns time of the next free slot of domain of url, without reserving it"""
+        with self._lock:
+            return max(self.clock(), self._next_slot.get(self.domain(url), 0))
+
+    def reserve(self, url: str, deadline=None):
+        """
+        Returns time at which request to url may be sent, None if that would be after deadline (the slot is then
+        left free, so skipped requests do not push later ones away)
+        """
+        domain = self.domain(url)
+        with self._lock:
+            slot = max(self.clock(), self._next_slot.get(domain, 0))
+            if deadline is not None and slot > deadline:
+                return None
+            interval = self.intervals.get(domain, self.min_interval)
+            self._next_slot[domain] = slot + interval + random.uniform(0, self.jitter)
+        return slot
+
+    def wait(self, url: str, deadline=None) -> bool:
+        """Sleeps until request to url may be sent, returns False if that would be after deadline"""
+        slot = self.reserve(url, deadline)
+        if slot is None:
+            return False
+        delay = slot - self.clock()
+        if delay > 0:
+            self.sleep(delay)
+        return True
+
+
+class WishlistMonitor:
+    def __init__(self, parse=parse_product_page, max_workers=16, min_interval=1.0, jitter=0.5, timeout=10,
+                 index=None):
+        """index is optional SearchIndex, names of checked items are added to it"""
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.parse = parse
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.index = index
+        self.limiter = DomainRateLimiter(min_interval, jitter)
+        self.last_seen = {}
+        self.session = requests.Session()
+        pooled = HTTPAdapter(pool_maxsize=max_workers)
+        self.session.mount("http://", pooled)
+        self.session.mount("https://", pooled)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="wishlist-monitor")
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def close(self):
+        self.stop()
+        self._executor.shutdown(wait=True)
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _observe(self, item):
+        response = timed_get(self.session, item.url, timeout=self.timeout)
+        response.raise_for_status()
+        with PARSE_SECONDS.time("product page"):
+            observation = self.parse(response.text)
+        if observation is None:
+            raise ValueError("no price found on {}".format(item.url))
+        return observation
+
+    def _dispatch(self, items, deadline) -> list:
+        """
+        Submits request of every item once slot of its domain comes and worker is free, domains wait in heap ordered
+        by their next slot, so items of idle shops are not stuck behind items of busy one. Returns future of every
+        item, None for items which would be sent after deadline.
+        """
+        limiter = self.limiter
+        futures = [None] * len(items)
+        queues = {}
+        for position, item in enumerate(items):
+            queues.setdefault(limiter.domain(item.url), deque()).append(position)
+        counter = itertools.count()
+        ready = [(limiter.ready_at(items[queue[0]].url), next(counter), queue) for queue in queues.values()]
+        heapq.heapify(ready)
+        free_workers = threading.Semaphore(self.max_workers)
+        while ready:
+            ready_at, _, queue = heapq.heappop(ready)
+            if deadline is not None and ready_at > deadline:
+                continue  # the rest of items of the domain is skipped
+            delay = ready_at - limiter.clock()
+            if delay > 0:
+                limiter.sleep(delay)
+            timeout = None if deadline is None else max(0, deadline - limiter.clock())
+            if not free_workers.acquire(timeout=timeout):
+                break  # no worker got free before deadline, everything left is skipped
+            position = queue[0]
+            slot = limiter.reserve(items[position].url, deadline)
+            if slot is None:
+                free_workers.release()
+                continue
+            delay = slot - limiter.clock()
+            if delay > 0:  # slot was taken in the meantime, e.g. by another check
+                limiter.sleep(delay)
+            queue.popleft()
+            futures[position] = self._executor.submit(self._observe, items[position])
+            futures[position].add_done_callback(lambda _: free_workers.release())
+            if queue:
+                heapq.heappush(ready, (limiter.ready_at(items[queue[0]].url), next(counter), queue))
+        return futures
+
+    def _update(self, item, observation):
+        """Stores observation, returns PriceChange when it differs from the previous one"""
+        with self._lock:
+            previous = self.last_seen.get(str(item.item_id))
+            self.last_seen[str(item.item_id)] = observation
+        if previous is not None and previous != observation:
+            return PriceChange(item, previous, observation)
+        return None
+
+    def check(self, items, max_duration=None) -> CheckReport:
+        """
+        Checks all items once, first observation of item is only remembered and does not emit change, error of item
+        (network, HTTP status, page which does not parse, ...) is reported in errors
+        """
+        deadline = None if max_duration is None else self.limiter.clock() + max_duration
+        items = list(items)
+        if self.index is not None:
+            self.index.add_wishlist_items(items)
+        changes = []
+        errors = {}
+        skipped = []
+        for item, future in zip(items, self._dispatch(items, deadline)):
+            if future is None:
+                skipped.append(item)
+                continue
+            try:
+                observation = future.result()
+            except Exception as error:
+                errors[item.item_id] = error
+                continue
+            change = self._update(item, observation)
+            if change is not None:
+                changes.append(change)
+        return CheckReport(changes, errors, skipped)
+
+    def _run(self, get_items, period, on_changes):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                report = self.check(get_items(), max_duration=period)
+                if report.changes:
+                    on_changes(report.changes)
+            except Exception:
+                log.exception("check of wishlist failed")
+            self._stop.wait(max(0, period - (time.monotonic() - started)))
+
+    def start(self, get_items, period, on_changes):
+        """Checks items returned by get_items every period seconds in background thread"""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(get_items, period, on_changes), daemon=True,
+                                        name="wishlist-monitor")
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def save(self, path):
+        with self._lock:
+            state = {item_id: list(observation) for item_id, observation in self.last_seen.items()}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+
+    def load(self, path):
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+        with self._lock:
+            self.last_seen = {item_id: Observation(*observation) for item_id, observation in state.items()}
+
+
+def change_notification(change: PriceChange, channel="in_app") -> Notification:
+    item, previous, current = change
+    if current.in_stock and not previous.in_stock:
+        message = "{} is back in stock for {} {}".format(item.name, current.price, current.currency or "")
+    elif not current.in_stock and previous.in_stock:
+        message = "{} is out of stock".format(item.name)
+    else:
+        message = "{} price changed from {} to {} {}".format(item.name, previous.price, current.price,
+                                                             current.currency or "")
+    return Notification(item.user, "stock", str(item.item_id), message.strip(), channel)
+
+
+def schedule_change_notifications(scheduler, changes, due=None, channel="in_app") -> int:
+    due = scheduler.clock() if due is None else due
+    for change in changes:
+        scheduler.schedule(change_notification(change, channel), due)
+    return len(changes)